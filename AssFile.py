@@ -0,0 +1,173 @@
+import gzip
+import hashlib
+import os
+from contextlib import contextmanager
+
+# ######################################################################################################################
+
+# Arnold node types of the operator graph, every other node of a look file is part of the shading
+OPERATOR_TYPES = {"merge", "set_parameter", "include_graph", "switch_operator", "disable", "collection",
+                  "set_transform", "string_replace", "materialx", "look_switch", "switch_shader"}
+
+
+# ######################################################################################################################
+
+
+class AssNode:
+    """
+    Node block of an ass file, the body lines are kept as written
+    """
+    __slots__ = ("type", "name", "lines")
+
+    def __init__(self, node_type, name, lines):
+        self.type = node_type
+        self.name = name
+        self.lines = lines
+
+    def is_operator(self):
+        """
+        Check if the node is part of the operator graph
+        :return:
+        """
+        return self.type in OPERATOR_TYPES
+
+    def content_hash(self):
+        """
+        Hash of the type and parameters of the node, independent of the indentation
+        :return:
+        """
+        content_hash = hashlib.sha1(self.type.encode())
+        for line in self.lines:
+            content_hash.update(b" ".join(line.split()))
+            content_hash.update(b"\n")
+        return content_hash.hexdigest()
+
+    def get_param(self, param):
+        """
+        Get the raw value of a single line parameter
+        :param param
+        :return: the value or None
+        """
+        prefix = param.encode() + b" "
+        for line in self.lines:
+            stripped = line.strip()
+            if stripped.startswith(prefix):
+                return stripped[len(prefix):].decode()
+        return None
+
+    def set_param(self, param, value):
+        """
+        Set the raw value of a single line parameter, added if missing
+        :param param
+        :param value
+        :return:
+        """
+        prefix = param.encode() + b" "
+        new_line = b" " + prefix + value.encode() + b"\n"
+        for i, line in enumerate(self.lines):
+            if line.strip().startswith(prefix):
+                self.lines[i] = new_line
+                return
+        self.lines.append(new_line)
+
+    def to_bytes(self):
+        """
+        Get the text of the node block
+        :return:
+        """
+        return self.type.encode() + b"\n{\n" + b"".join(self.lines) + b"}\n"
+
+
+# ######################################################################################################################
+
+
+class AssFile:
+    """
+    Minimal reader and writer of ass files (gzipped or not) : header comments and node blocks
+    """
+
+    @staticmethod
+    @contextmanager
+    def __open(path, mode):
+        """
+        Open an ass file, gzipped if its extension is .gz. Gzip files are written without date, the file under the
+        gzip stream is closed with it
+        :param path
+        :param mode
+        :return:
+        """
+        if not path.endswith(".gz"):
+            with open(path, mode) as f:
+                yield f
+        elif "w" in mode:
+            with open(path, mode) as raw, gzip.GzipFile(filename="", mode=mode, fileobj=raw, mtime=0) as f:
+                yield f
+        else:
+            with gzip.open(path, mode) as f:
+                yield f
+
+    @staticmethod
+    def read(path):
+        """
+        Read an ass file
+        :param path
+        :return:
+        """
+        header = []
+        nodes = []
+        with AssFile.__open(path, "rb") as f:
+            lines = f.readlines()
+        i = 0
+        while i < len(lines):
+            stripped = lines[i].strip()
+            is_node_start = stripped and not stripped.startswith(b"#") and b" " not in stripped \
+                and i + 1 < len(lines) and lines[i + 1].strip() == b"{"
+            if not is_node_start:
+                if len(nodes) == 0:
+                    header.append(lines[i])
+                i += 1
+                continue
+            node_type = stripped.decode()
+            body = []
+            i += 2
+            while i < len(lines) and lines[i].strip() != b"}":
+                body.append(lines[i])
+                i += 1
+            i += 1
+            node = AssNode(node_type, None, body)
+            name = node.get_param("name")
+            node.name = name.strip('"') if name is not None else None
+            nodes.append(node)
+        # The blank lines before the first node are written again with the nodes
+        while len(header) > 0 and header[-1].strip() == b"":
+            header.pop()
+        return AssFile(header, nodes)
+
+    def __init__(self, header, nodes):
+        self.header = header
+        self.nodes = nodes
+
+    def get_node(self, name):
+        """
+        Get a node by its name
+        :param name
+        :return: the node or None
+        """
+        for node in self.nodes:
+            if node.name == name:
+                return node
+        return None
+
+    def write(self, path):
+        """
+        Write the ass file atomically
+        :param path
+        :return:
+        """
+        tmp_path = path + ".tmp" + (".gz" if path.endswith(".gz") else "")
+        with AssFile.__open(tmp_path, "wb") as f:
+            f.writelines(self.header)
+            for node in self.nodes:
+                f.write(b"\n")
+                f.write(node.to_bytes())
+        os.replace(tmp_path, path)
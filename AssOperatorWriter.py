@@ -0,0 +1,118 @@
+import re
+
+from .AssFile import AssNode
+
+# ######################################################################################################################
+
+# Value of the empty displacement shader given to the shadingEngines mixed with displaced ones
+_EMPTY_DISPLACEMENT_COLOR = "0 0 0"
+
+
+# ######################################################################################################################
+
+
+class AssOperatorWriter:
+    """
+    Streaming writer of the operator graph of a look, from the data collected by PublishCore instead of scene nodes :
+    a merge operator targeted by the standin, the optional include_graph of the shader library and one set_parameter
+    per group of meshes. Each node is written as soon as it is built
+    """
+
+    @staticmethod
+    def quote(value):
+        """
+        Quote a string value of an ass file
+        :param value
+        :return:
+        """
+        return '"%s"' % value.replace("\\", "\\\\").replace('"', '\\"')
+
+    @staticmethod
+    def unique_name(name, names):
+        """
+        Make a node name unique the way Maya does, by appending or incrementing a number
+        :param name
+        :param names: names already taken, updated
+        :return:
+        """
+        unique = name
+        if unique in names:
+            base = re.sub(r"[0-9]+$", "", name)
+            counter = 1
+            while "%s%s" % (base, counter) in names:
+                counter += 1
+            unique = "%s%s" % (base, counter)
+        names.add(unique)
+        return unique
+
+    @staticmethod
+    def __array(values, value_type):
+        """
+        Get the text of an array parameter
+        :param values
+        :param value_type
+        :return:
+        """
+        return "%s 1 %s %s" % (len(values), value_type, " ".join(values))
+
+    @staticmethod
+    def __node(node_type, name, params):
+        """
+        Build a node block
+        :param node_type
+        :param name
+        :param params: list of (param, raw value)
+        :return:
+        """
+        lines = [(" name %s\n" % AssOperatorWriter.quote(name)).encode()]
+        for param, value in params:
+            lines.append((" %s %s\n" % (param, value)).encode())
+        return AssNode(node_type, name, lines)
+
+    @staticmethod
+    def iter_nodes(graph):
+        """
+        Build the nodes of an operator graph one by one
+        :param graph: dict of PublishCore.collect_shader_operator
+        :return: generator of AssNode
+        """
+        inputs = []
+        if graph.get("include_graph") is not None:
+            inputs.append(graph["include_graph"]["name"])
+        inputs.extend(set_parameter["name"] for set_parameter in graph["set_parameters"])
+        yield AssOperatorWriter.__node("merge", graph["merge"], [
+            ("inputs", AssOperatorWriter.__array([AssOperatorWriter.quote(name) for name in inputs], "NODE")),
+            ("declare mtoa_constant_is_target", "constant BOOL"),
+            ("mtoa_constant_is_target", "on"),
+        ])
+        if graph.get("include_graph") is not None:
+            yield AssOperatorWriter.__node("include_graph", graph["include_graph"]["name"], [
+                ("filename", AssOperatorWriter.quote(graph["include_graph"]["filename"])),
+            ])
+        for set_parameter in graph["set_parameters"]:
+            assignments = set_parameter["assignments"]
+            yield AssOperatorWriter.__node("set_parameter", set_parameter["name"], [
+                ("selection", AssOperatorWriter.quote(set_parameter["selection"])),
+                ("assignment", AssOperatorWriter.__array(
+                    [AssOperatorWriter.quote(assignment) for assignment in assignments], "STRING")),
+                ("enable_assignment", AssOperatorWriter.__array(["on"] * len(assignments), "BOOL")),
+            ])
+        if graph.get("empty_displacement") is not None:
+            yield AssOperatorWriter.__node("flat", graph["empty_displacement"], [
+                ("color", _EMPTY_DISPLACEMENT_COLOR),
+            ])
+
+    @staticmethod
+    def write(f, graph):
+        """
+        Write an operator graph to an ass file opened in binary mode, after the nodes already written
+        :param f
+        :param graph: dict of PublishCore.collect_shader_operator
+        :return: number of nodes written
+        """
+        count = 0
+        for node in AssOperatorWriter.iter_nodes(graph):
+            f.write(b"\n")
+            f.write(node.to_bytes())
+            count += 1
+        return count
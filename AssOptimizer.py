@@ -0,0 +1,358 @@
+import os
+import re
+import time
+
+from .AssFile import AssFile
+
+# ######################################################################################################################
+
+# Tokens of a parameter line : double quoted string, single quoted name or bare word
+_TOKEN = re.compile(rb'"(?:[^"\\]|\\.)*"|\'[^\']*\'|[^\s"\']+')
+# Names quoted inside a string, like the shaders of the assignments of a set_parameter
+_QUOTED_NAME = re.compile(rb"'([^']*)'")
+_PARAM_START = re.compile(rb"\s*[A-Za-z_][A-Za-z0-9_.\[\]]*(\s|$)")
+_TRUE_VALUES = (b"on", b"true", b"1")
+
+
+# ######################################################################################################################
+
+
+class AssOptimizer:
+    """
+    Optimisation pass over an exported look : removes the shading nodes no operator reaches, the parameters left to
+    their default value (when the Arnold API is available) and merges the structurally identical shading subgraphs,
+    rewriting the references to the merged nodes
+    """
+
+    @staticmethod
+    def __is_root(node):
+        """
+        Check if a node is kept whatever references it (operators, color manager, options)
+        :param node
+        :return:
+        """
+        return node.is_operator() or node.type.startswith("color_manager") or node.type == "options"
+
+    @staticmethod
+    def __candidates(token):
+        """
+        Get the node names a token may reference : the token, its content if quoted, the names quoted in a string,
+        without the output or component of a link (node.r)
+        :param token
+        :return: list of names
+        """
+        if token.startswith(b'"'):
+            inner = token[1:-1]
+            names = [inner] + _QUOTED_NAME.findall(inner)
+        elif token.startswith(b"'"):
+            names = [token[1:-1]]
+        else:
+            names = [token]
+        candidates = []
+        for name in names:
+            candidates.append(name)
+            base = re.split(rb"[./]", name, maxsplit=1)[0]
+            if base != name:
+                candidates.append(base)
+        return candidates
+
+    @staticmethod
+    def __references(node, names):
+        """
+        Get the nodes referenced by a node
+        :param node
+        :param names: set of the node names of the file (bytes)
+        :return: set of names (bytes)
+        """
+        references = set()
+        for line in node.lines:
+            tokens = _TOKEN.findall(line)
+            if len(tokens) == 0 or tokens[0] == b"name":
+                continue
+            for token in tokens[1:]:
+                for candidate in AssOptimizer.__candidates(token):
+                    if candidate in names:
+                        references.add(candidate)
+        return references
+
+    @staticmethod
+    def __rewrite_name(name, renames):
+        """
+        Rewrite a reference to a renamed node, keeping the output or component of a link
+        :param name
+        :param renames: dict old name -> new name (bytes)
+        :return:
+        """
+        base = re.split(rb"[./]", name, maxsplit=1)[0]
+        if base in renames:
+            return renames[base] + name[len(base):]
+        return name
+
+    @staticmethod
+    def __rewrite_token(token, renames):
+        """
+        Rewrite the references of a token to renamed nodes
+        :param token
+        :param renames: dict old name -> new name (bytes)
+        :return:
+        """
+        if token.startswith(b'"'):
+            inner = AssOptimizer.__rewrite_name(token[1:-1], renames)
+            inner = _QUOTED_NAME.sub(lambda m: b"'" + AssOptimizer.__rewrite_name(m.group(1), renames) + b"'", inner)
+            return b'"' + inner + b'"'
+        if token.startswith(b"'"):
+            return b"'" + AssOptimizer.__rewrite_name(token[1:-1], renames) + b"'"
+        return AssOptimizer.__rewrite_name(token, renames)
+
+    @staticmethod
+    def __rewrite(line, renames):
+        """
+        Rewrite the references of a line to renamed nodes
+        :param line
+        :param renames: dict old name -> new name (bytes)
+        :return: the line
+        """
+        stripped = line.lstrip()
+        if stripped.startswith(b"name ") or stripped.startswith(b"declare "):
+            return line
+        indent = line[:len(line) - len(stripped)]
+        first = _TOKEN.match(stripped)
+        if first is None:
+            return line
+        return indent + stripped[:first.end()] + _TOKEN.sub(
+            lambda match: AssOptimizer.__rewrite_token(match.group(0), renames), stripped[first.end():])
+
+    def __init__(self, remove_defaults=True):
+        self.__remove_defaults = remove_defaults
+        self.__arnold = None
+        self.__arnold_begun = False
+        # (node type, param) -> (param type, default value) or None
+        self.__defaults = {}
+
+    def optimize_file(self, path):
+        """
+        Optimise an ass file in place
+        :param path
+        :return: dict of the statistics of the pass
+        """
+        bytes_before = os.path.getsize(path)
+        start = time.time()
+        ass_file = AssFile.read(path)
+        parse_before = time.time() - start
+        stats = self.optimize(ass_file)
+        if stats["unreachable"] + stats["merged"] + stats["params_removed"] == 0:
+            stats.update(bytes_before=bytes_before, bytes_after=bytes_before, parse_before=parse_before,
+                         parse_after=parse_before)
+            return stats
+        ass_file.write(path)
+        start = time.time()
+        AssFile.read(path)
+        stats.update(bytes_before=bytes_before, bytes_after=os.path.getsize(path), parse_before=parse_before,
+                     parse_after=time.time() - start)
+        return stats
+
+    def optimize(self, ass_file):
+        """
+        Optimise the nodes of an ass file
+        :param ass_file
+        :return: dict of the statistics of the pass
+        """
+        stats = {"nodes_before": len(ass_file.nodes), "unreachable": 0, "merged": 0, "params_removed": 0}
+        nodes = [node for node in ass_file.nodes if node.name is not None]
+        if any(node.is_operator() for node in nodes):
+            # Without operator (library files) every shading node is kept
+            ass_file.nodes = self.__remove_unreachable(ass_file.nodes)
+            stats["unreachable"] = stats["nodes_before"] - len(ass_file.nodes)
+        if self.__remove_defaults and self.__begin_arnold():
+            try:
+                for node in ass_file.nodes:
+                    if not AssOptimizer.__is_root(node):
+                        stats["params_removed"] += self.__remove_default_params(node)
+            finally:
+                self.__end_arnold()
+        node_count = len(ass_file.nodes)
+        ass_file.nodes = self.__merge_identical(ass_file.nodes)
+        stats["merged"] = node_count - len(ass_file.nodes)
+        stats["nodes_after"] = len(ass_file.nodes)
+        return stats
+
+    def __remove_unreachable(self, nodes):
+        """
+        Remove the nodes not referenced from the operators, directly or not
+        :param nodes
+        :return: the nodes kept
+        """
+        by_name = {node.name.encode(): node for node in nodes if node.name is not None}
+        names = set(by_name)
+        reached = set()
+        stack = [node for node in nodes if node.name is None or AssOptimizer.__is_root(node)]
+        for node in stack:
+            if node.name is not None:
+                reached.add(node.name.encode())
+        while len(stack) > 0:
+            node = stack.pop()
+            for reference in AssOptimizer.__references(node, names):
+                if reference not in reached:
+                    reached.add(reference)
+                    stack.append(by_name[reference])
+        return [node for node in nodes if node.name is None or node.name.encode() in reached]
+
+    def __merge_identical(self, nodes):
+        """
+        Merge the shading nodes with the same type and parameters, once their inputs are merged, until no more
+        node can be merged. The references to the merged nodes are rewritten
+        :param nodes
+        :return: the nodes kept
+        """
+        shading = [node for node in nodes if node.name is not None and not AssOptimizer.__is_root(node)]
+        names = {node.name.encode() for node in nodes if node.name is not None}
+        # Tokens of each line with whether they reference a node, the name line excluded
+        lines = {}
+        for node in shading:
+            node_lines = []
+            for line in node.lines:
+                tokens = _TOKEN.findall(line)
+                if len(tokens) == 0 or tokens[0] == b"name":
+                    continue
+                node_lines.append([(token, any(c in names for c in AssOptimizer.__candidates(token)))
+                                   for token in tokens])
+            lines[node.name] = node_lines
+        representatives = {node.name.encode(): node.name.encode() for node in shading}
+        while True:
+            signatures = {}
+            new_representatives = {}
+            for node in shading:
+                signature = [node.type.encode()]
+                for tokens in lines[node.name]:
+                    for token, is_reference in tokens:
+                        signature.append(AssOptimizer.__rewrite_token(token, representatives) if is_reference
+                                         else token)
+                    signature.append(b"\n")
+                signature = b" ".join(signature)
+                new_representatives[node.name.encode()] = signatures.setdefault(signature, node.name.encode())
+            if new_representatives == representatives:
+                break
+            representatives = new_representatives
+        renames = {name: representative for name, representative in representatives.items() if name != representative}
+        if len(renames) == 0:
+            return nodes
+        kept = [node for node in nodes if node.name is None or node.name.encode() not in renames]
+        for node in kept:
+            node.lines = [AssOptimizer.__rewrite(line, renames) for line in node.lines]
+        return kept
+
+    def __begin_arnold(self):
+        """
+        Start an Arnold universe to read the default values of the parameters
+        :return: whether the Arnold API is available
+        """
+        try:
+            import arnold
+        except ImportError:
+            return False
+        self.__arnold = arnold
+        self.__arnold_begun = False
+        if not arnold.AiUniverseIsActive():
+            arnold.AiBegin()
+            self.__arnold_begun = True
+        return True
+
+    def __end_arnold(self):
+        """
+        End the Arnold universe started to read the default values
+        :return:
+        """
+        if self.__arnold is not None and self.__arnold_begun:
+            self.__arnold.AiEnd()
+        self.__arnold = None
+
+    def __get_default(self, node_type, param):
+        """
+        Get the default value of a parameter from the Arnold node entries
+        :param node_type
+        :param param
+        :return: (param type, value) or None for parameters not compared (strings, arrays, links, unknown)
+        """
+        key = (node_type, param)
+        if key in self.__defaults:
+            return self.__defaults[key]
+        arnold = self.__arnold
+        default = None
+        try:
+            entry = arnold.AiNodeEntryLookUp(node_type)
+            pentry = arnold.AiNodeEntryLookUpParameter(entry, param) if entry else None
+            if pentry:
+                param_type = arnold.AiParamGetType(pentry)
+                value = arnold.AiParamGetDefault(pentry).contents
+                if param_type in (arnold.AI_TYPE_BYTE, arnold.AI_TYPE_INT, arnold.AI_TYPE_UINT):
+                    default = ("int", (int({arnold.AI_TYPE_BYTE: value.BYTE, arnold.AI_TYPE_INT: value.INT,
+                                            arnold.AI_TYPE_UINT: value.UINT}[param_type]),))
+                elif param_type == arnold.AI_TYPE_BOOLEAN:
+                    default = ("bool", (bool(value.BOOL),))
+                elif param_type == arnold.AI_TYPE_FLOAT:
+                    default = ("float", (value.FLT,))
+                elif param_type == arnold.AI_TYPE_RGB:
+                    default = ("float", (value.RGB.r, value.RGB.g, value.RGB.b))
+                elif param_type == arnold.AI_TYPE_RGBA:
+                    default = ("float", (value.RGBA.r, value.RGBA.g, value.RGBA.b, value.RGBA.a))
+                elif param_type == arnold.AI_TYPE_VECTOR:
+                    default = ("float", (value.VEC.x, value.VEC.y, value.VEC.z))
+                elif param_type == arnold.AI_TYPE_VECTOR2:
+                    default = ("float", (value.VEC2.x, value.VEC2.y))
+                elif param_type == arnold.AI_TYPE_ENUM:
+                    default = ("enum", (arnold.AiEnumGetString(arnold.AiParamGetEnum(pentry), value.INT),))
+        except Exception as e:
+            print("No default value for %s.%s : %s" % (node_type, param, e))
+            default = None
+        self.__defaults[key] = default
+        return default
+
+    def __is_default(self, node_type, param, values):
+        """
+        Check if the value of a parameter line is its default value
+        :param node_type
+        :param param
+        :param values: value tokens of the line
+        :return:
+        """
+        default = self.__get_default(node_type, param)
+        if default is None:
+            return False
+        value_type, default_values = default
+        if len(values) != len(default_values):
+            return False
+        try:
+            if value_type == "float":
+                return all(abs(float(v) - d) <= 1e-6 * max(1.0, abs(d)) for v, d in zip(values, default_values))
+            if value_type == "int":
+                return int(values[0]) == default_values[0]
+            if value_type == "bool":
+                return (values[0].lower() in _TRUE_VALUES) == default_values[0]
+            if value_type == "enum":
+                return values[0].strip(b'"').decode().lower() == str(default_values[0]).lower()
+        except ValueError:
+            # A link or an expression instead of a value
+            return False
+        return False
+
+    def __remove_default_params(self, node):
+        """
+        Remove the single line parameters of a node left to their default value
+        :param node
+        :return: number of parameters removed
+        """
+        kept = []
+        removed = 0
+        for i, line in enumerate(node.lines):
+            is_single_line = _PARAM_START.match(line) is not None and \
+                (i + 1 == len(node.lines) or _PARAM_START.match(node.lines[i + 1]) is not None)
+            tokens = _TOKEN.findall(line)
+            previous = node.lines[i - 1].lstrip() if i > 0 else b""
+            if is_single_line and len(tokens) > 1 and tokens[0] not in (b"name", b"declare") \
+                    and not previous.startswith(b"declare ") \
+                    and self.__is_default(node.type, tokens[0].decode(), tokens[1:]):
+                removed += 1
+                continue
+            kept.append(line)
+        node.lines = kept
+        return removed
@@ -1,24 +1,20 @@
-import os
-import re
-from functools import partial
+import time
+import traceback
 
-import sys
-
-import pymel.core as pm
+import maya.cmds as cmds
 import maya.OpenMayaUI as omui
 
 from PySide2 import QtCore
-from PySide2 import QtGui
-from PySide2 import QtWidgets
-from PySide2.QtWidgets import *
-from PySide2.QtCore import *
-from PySide2.QtGui import *
+from PySide2.QtWidgets import QDialog, QWidget, QDesktopWidget, QVBoxLayout, QGridLayout, QLabel, QFrame, QCheckBox, \
+    QLineEdit, QComboBox, QPushButton, QProgressBar, QMessageBox
+from PySide2.QtCore import Qt, QPoint, QTimer
+from PySide2.QtGui import QShowEvent, QCloseEvent
 
 from shiboken2 import wrapInstance
 
-from common.utils import *
+from common.Prefs import Prefs
 
-from common.Prefs import *
+from .PublishUploader import PublishUploader, STATUS_FAILED
 
 import maya.OpenMaya as OpenMaya
 
@@ -26,106 +22,123 @@ import maya.OpenMaya as OpenMaya
 
 _FILE_NAME_PREFS = "character_publisher"
 
+# Label -> (binary, compressed), resolved to the encodings of PublishCore once it is imported
+_ASS_FORMATS = {
+    "ASCII": (False, False),
+    "Binary": (True, False),
+    "ASCII gzip": (False, True),
+    "Binary gzip": (True, True),
+}
+# Latest uploads of the asset displayed
+_UPLOAD_STATUS_COUNT = 5
+# Interval of the polling of the upload queue in ms
+_UPLOAD_POLL_INTERVAL = 2000
+
 
 # ######################################################################################################################
 
 
 class CharacterPublisher(QDialog):
+    """
+    Dialog of the publish. PublishCore (and pymel with it) is only imported once the dialog is painted
+    """
+
     @staticmethod
     def texture_path_to_output_tx_path(texture_path, color_space, render_color_space):
         """
-        Generate a path corresponding to the output tx
+        Same as PublishCore.texture_path_to_output_tx_path
         :param texture_path
         :param color_space
         :param render_color_space
         :return:
         """
-        texture_path = os.path.normpath(texture_path)
-        dir_path, file_ext = os.path.splitext(texture_path)
-        file_name = os.path.basename(dir_path)
-
-        output_path = os.path.join(
-            os.path.dirname(dir_path),
-            f"{file_name}_{color_space}_{render_color_space}{file_ext}.tx"
-        )
-        output_path_legacy = os.path.splitext(texture_path)[0] + ".tx"
-
-        return output_path, output_path_legacy
-
-    @staticmethod
-    def __check_color_sets(color_set_name):
-        """
-        Check if color sets diffferent from "Pref" exists
-        :param color_set_name
-        :return:
-        """
-        # Get the selected objects
-        selected_objects = pm.selected()
-
-        # Iterate through the selected objects
-        for obj in selected_objects:
-            try:
-                # Get the shapes of the object and its children
-                shapes = obj.getShapes(noIntermediate=True) + \
-                         pm.listRelatives(obj, allDescendents=True, type='mesh', noIntermediate=True)
-
-                # Iterate through the shapes
-                for shape in shapes:
-                    # Get the color sets of the shape
-                    color_sets = pm.polyColorSet(shape, query=True, allColorSets=True)
-
-                    # Check if any color sets are present
-                    if not color_sets:
-                        continue
-                    # Iterate through the color sets
-                    for color_set in color_sets:
-                        # Show a pop-up window if the color set name is not the provided color set name
-                        if color_set != color_set_name:
-                            response = pm.confirmDialog(
-                                title='Warning',
-                                message="Shape '{}' has a color set named '{}' which is "
-                                        "different from '{}'. Continue?".format(shape, color_set, color_set_name),
-                                button=['Continue', 'Cancel'],
-                                defaultButton='Continue',
-                                cancelButton='Cancel',
-                                dismissString='Cancel'
-                            )
-
-                            if response == 'Cancel':
-                                pm.error("Aborted by user")
-                                return
-                            print("Color set found: {} {}".format(color_set_name, shape))
-            except:
-                continue
+        from .PublishCore import PublishCore
+        return PublishCore.texture_path_to_output_tx_path(
+            texture_path, color_space, render_color_space)
 
     @staticmethod
     def get_path_from_texture_node(tex_node):
         """
-        Get the file path attributes from a texture node (File or image here)
+        Same as PublishCore.get_path_from_texture_node
         :param tex_node
         :return:
         """
-        if pm.objectType(tex_node, isType="file"):
-            return tex_node.fileTextureName.get()
-        elif pm.objectType(tex_node, isType="aiImage"):
-            return tex_node.filename.get()
-        else:
-            return None
+        from .PublishCore import PublishCore
+        return PublishCore.get_path_from_texture_node(tex_node)
 
     @staticmethod
     def set_path_to_texture_node(tex_node, path):
         """
-        Set the file path attributes to a texture node (File or image here)
+        Same as PublishCore.set_path_to_texture_node
         :param tex_node
         :param path
         :return:
         """
-        if pm.objectType(tex_node, isType="file"):
-            tex_node.fileTextureName.set(path)
-        elif pm.objectType(tex_node, isType="aiImage"):
-            tex_node.filename.set(path)
+        from .PublishCore import PublishCore
+        return PublishCore.set_path_to_texture_node(tex_node, path)
+
+    @staticmethod
+    def get_tile_pattern_from_texture_node(tex_node):
+        """
+        Same as PublishCore.get_tile_pattern_from_texture_node
+        :param tex_node
+        :return:
+        """
+        from .PublishCore import PublishCore
+        return PublishCore.get_tile_pattern_from_texture_node(tex_node)
 
-    def __init__(self, prnt=wrapInstance(int(omui.MQtUtil.mainWindow()), QWidget)):
+    @staticmethod
+    def __confirm_color_sets(invalid_color_sets):
+        """
+        Ask the user to confirm the publish despite the invalid color sets
+        :param invalid_color_sets
+        :return: whether to continue
+        """
+        msg = "These shapes have color sets different from 'Pref' :\n"
+        # Keep the dialog readable when there are many shapes
+        max_lines = 30
+        for result in invalid_color_sets[:max_lines]:
+            msg += "\n{} : {}".format(result["shape"], ", ".join(result["color_sets"]))
+        if len(invalid_color_sets) > max_lines:
+            msg += "\n... and {} more (see the Script Editor)".format(len(invalid_color_sets) - max_lines)
+        response = cmds.confirmDialog(
+            title='Warning',
+            message=msg + "\n\nContinue?",
+            button=['Continue', 'Cancel'],
+            defaultButton='Continue',
+            cancelButton='Cancel',
+            dismissString='Cancel'
+        )
+        return response != 'Cancel'
+
+    @staticmethod
+    def __confirm_render_cost(report):
+        """
+        Ask the user to confirm the publish despite the render cost over the thresholds
+        :param report: report of RenderCostReport
+        :return: whether to continue
+        """
+        from .RenderCostReport import RenderCostReport
+        msg = RenderCostReport.format_summary(report)
+        # Keep the dialog readable when there are many meshes
+        max_lines = 10
+        if len(report["over_mesh"]) > 0:
+            msg += "\n\nMeshes over the threshold :\n" + "\n".join(report["over_mesh"][:max_lines])
+        if len(report["over_mesh"]) > max_lines:
+            msg += "\n... and {} more (see the Script Editor)".format(len(report["over_mesh"]) - max_lines)
+        response = cmds.confirmDialog(
+            title='Warning',
+            message=msg + "\n\nContinue?",
+            button=['Continue', 'Cancel'],
+            defaultButton='Continue',
+            cancelButton='Cancel',
+            dismissString='Cancel'
+        )
+        return response != 'Cancel'
+
+    def __init__(self, prnt=None):
+        if prnt is None:
+            prnt = wrapInstance(int(omui.MQtUtil.mainWindow()), QWidget)
         super(CharacterPublisher, self).__init__(prnt)
 
         # Common Preferences (common preferences on all tools)
@@ -134,16 +147,27 @@ class CharacterPublisher(QDialog):
         self.__prefs = Prefs(_FILE_NAME_PREFS)
 
         # Model attributes
-        self.__texture_node = []
         self.__selection = []
         self.__asset_dir = ""
         self.__asset_name = None
-        self.__abc_dir = ""
-        self.__abc_name = ""
         self.__publish_uv = True
+        self.__split_model = False
         self.__publish_look = True
         self.__look_name = ""
+        self.__background_export = True
+        self.__ass_format = "ASCII"
+        self.__shader_library = False
+        self.__direct_operators = False
         self.__selection_callback = None
+        self.__selection_dirty = False
+        self.__publish_core = None
+        self.__analysis_scheduled = False
+        # Publish in progress
+        self.__publishing = False
+        self.__publish_cancelled = False
+        self.__publish_stages = []
+        self.__publish_stage_index = 0
+        self.__publish_timings = []
 
         # UI attributes
         self.__ui_width = 350
@@ -161,21 +185,27 @@ class CharacterPublisher(QDialog):
         # Makes the object get deleted from memory, not just hidden, when it is closed.
         self.setAttribute(QtCore.Qt.WA_DeleteOnClose)
 
-        self.__retrieve_dir_and_asset_from_scene_name()
-        if self.__asset_name is not None:
-            self.__retrieve_datas()
-            # Create the layout and refresh the display
-            self.__create_ui()
-            self.__refresh_ui()
-            self.__add_callback()
-        else:
-            self.close()
-            msg = QMessageBox()
-            msg.setWindowTitle("Asset directory and name not found")
-            msg.setIcon(QMessageBox.Warning)
-            msg.setText("Retrieving the asset directory and asset name has failed")
-            msg.setInformativeText('Make sure the opened scene is good and retry')
-            msg.exec_()
+        # Coalesce the selection changes into a single deferred refresh
+        self.__selection_timer = QTimer(self)
+        self.__selection_timer.setSingleShot(True)
+        self.__selection_timer.setInterval(150)
+        self.__selection_timer.timeout.connect(self.__on_selection_timer_timeout)
+
+        # Polling of the background export process
+        self.__background_timer = QTimer(self)
+        self.__background_timer.setInterval(500)
+        self.__background_timer.timeout.connect(self.__on_background_timer_timeout)
+
+        # Polling of the upload queue, only the entries changed since the last poll are read
+        self.__uploader = PublishUploader()
+        self.__upload_timer = QTimer(self)
+        self.__upload_timer.setInterval(_UPLOAD_POLL_INTERVAL)
+        self.__upload_timer.timeout.connect(self.__refresh_upload_status)
+
+        self.__retrieve_selection()
+        # Create the layout and refresh the display, the scene is analysed once the dialog is painted
+        self.__create_ui()
+        self.__refresh_ui()
 
     def __save_prefs(self):
         """
@@ -187,7 +217,12 @@ class CharacterPublisher(QDialog):
         pos = self.pos()
         self.__prefs["window_pos"] = {"x": pos.x(), "y": pos.y()}
         self.__prefs["publish_uv"] = self.__publish_uv
+        self.__prefs["split_model"] = self.__split_model
         self.__prefs["publish_look"] = self.__publish_look
+        self.__prefs["background_export"] = self.__background_export
+        self.__prefs["ass_format"] = self.__ass_format
+        self.__prefs["shader_library"] = self.__shader_library
+        self.__prefs["direct_operators"] = self.__direct_operators
 
     def __retrieve_prefs(self):
         """
@@ -206,19 +241,49 @@ class CharacterPublisher(QDialog):
         if "publish_uv" in self.__prefs:
             self.__publish_uv = self.__prefs["publish_uv"]
 
+        if "split_model" in self.__prefs:
+            self.__split_model = self.__prefs["split_model"]
+
         if "publish_look" in self.__prefs:
             self.__publish_look = self.__prefs["publish_look"]
 
+        if "background_export" in self.__prefs:
+            self.__background_export = self.__prefs["background_export"]
+
+        if "ass_format" in self.__prefs and self.__prefs["ass_format"] in _ASS_FORMATS:
+            self.__ass_format = self.__prefs["ass_format"]
+
+        if "shader_library" in self.__prefs:
+            self.__shader_library = self.__prefs["shader_library"]
+
+        if "direct_operators" in self.__prefs:
+            self.__direct_operators = self.__prefs["direct_operators"]
+
     def showEvent(self, arg__1: QShowEvent) -> None:
-        # Nothing
-        pass
+        """
+        Add callbacks and catch up on the selection changes made while hidden
+        :return:
+        """
+        self.__add_callback()
+        if self.__publish_core is None and not self.__analysis_scheduled:
+            # The paint events of the show are processed before this timer
+            self.__analysis_scheduled = True
+            QTimer.singleShot(0, self.__analyse_scene)
+        elif self.__selection_dirty:
+            self.__selection_timer.start()
+        if self.__publish_core is not None:
+            self.__upload_timer.start()
 
     def hideEvent(self, arg__1: QCloseEvent) -> None:
         """
-        Remove callbacks and save preferences
+        Remove callbacks and save preferences. The selection changes aren't tracked anymore so it is retrieved again
+        on the next show
         :return:
         """
+        self.__selection_timer.stop()
+        self.__upload_timer.stop()
         self.__remove_callback()
+        self.__selection_dirty = True
         self.__save_prefs()
 
     def __add_callback(self):
@@ -226,29 +291,57 @@ class CharacterPublisher(QDialog):
         Add callbacks
         :return:
         """
+        if self.__selection_callback is not None:
+            return
         self.__selection_callback = \
             OpenMaya.MEventMessage.addEventCallback("SelectionChanged", self.__on_selection_changed)
+        if self.__publish_core is not None:
+            self.__publish_core.add_callbacks()
 
     def __remove_callback(self):
         """
-        Remove the selection callback
+        Remove the selection callback and the publish callbacks
         :return:
         """
         if self.__selection_callback is not None:
             OpenMaya.MMessage.removeCallback(self.__selection_callback)
+            self.__selection_callback = None
+        if self.__publish_core is not None:
+            self.__publish_core.remove_callbacks()
 
-    def __retrieve_dir_and_asset_from_scene_name(self):
+    def __analyse_scene(self):
         """
-        Guess the asset directory and name from the current scene name
+        Import the publish logic and analyse the scene : asset of the scene, callbacks of the publish and shading
+        networks of the selection
         :return:
         """
-        scene = pm.system.sceneName()
-        split = scene.split("/")
-        split[0] = split[0] + "\\"
-        for i, s in enumerate(reversed(split)):
-            if s == "assets":
-                self.__asset_dir = os.path.join(*split[0:-(i - 1)])
-                self.__asset_name = split[-i]
+        from .PublishCore import PublishCore
+        start = time.time()
+        self.__asset_dir, self.__asset_name = \
+            PublishCore.retrieve_dir_and_asset_from_scene_name(cmds.file(query=True, sceneName=True))
+        if self.__asset_name is None:
+            self.close()
+            msg = QMessageBox()
+            msg.setWindowTitle("Asset directory and name not found")
+            msg.setIcon(QMessageBox.Warning)
+            msg.setText("Retrieving the asset directory and asset name has failed")
+            msg.setInformativeText('Make sure the opened scene is good and retry')
+            msg.exec_()
+            return
+        self.__publish_core = PublishCore(self.__asset_dir, self.__asset_name)
+        if self.__selection_callback is not None:
+            self.__publish_core.add_callbacks()
+        if self.__selection_dirty:
+            self.__retrieve_selection()
+        self.__publish_core.set_selection(self.__selection)
+        texture_count = self.__publish_core.analyse_selection()
+        print("Scene analysed in %.2fs : %s texture nodes" % (time.time() - start, texture_count))
+        # Uploads interrupted by the end of the previous session are resumed
+        if self.__uploader.has_pending():
+            PublishUploader.start_worker()
+        self.__refresh_upload_status()
+        self.__upload_timer.start()
+        self.__refresh_ui()
 
     def __create_ui(self):
         """
@@ -284,18 +377,63 @@ class CharacterPublisher(QDialog):
 
         self.__ui_uv_publish_cb = QCheckBox("Publish UV")
         self.__ui_uv_publish_cb.stateChanged.connect(self.__on_uv_publish_state_changed)
-        options_lyt.addWidget(self.__ui_uv_publish_cb, 0, 0, 1, 2)
+        options_lyt.addWidget(self.__ui_uv_publish_cb, 0, 0)
+        self.__ui_split_model_cb = QCheckBox("Split model by group")
+        self.__ui_split_model_cb.setToolTip("Export the top level groups in several files concurrently")
+        self.__ui_split_model_cb.stateChanged.connect(self.__on_split_model_state_changed)
+        options_lyt.addWidget(self.__ui_split_model_cb, 0, 1)
         self.__ui_look_publish_cb = QCheckBox("Publish Look")
         self.__ui_look_publish_cb.stateChanged.connect(self.__on_look_publish_state_changed)
         options_lyt.addWidget(self.__ui_look_publish_cb, 1, 0)
         self.__ui_look_name = QLineEdit()
         self.__ui_look_name.setPlaceholderText("Default Look")
+        self.__ui_look_name.setToolTip("Several looks can be published in one pass : look, look=renderLayer, ...")
         self.__ui_look_name.textChanged.connect(self.__on_look_name_changed)
         options_lyt.addWidget(self.__ui_look_name, 1, 1)
 
+        options_lyt.addWidget(QLabel("Look file format"), 2, 0)
+        self.__ui_ass_format_cbb = QComboBox()
+        self.__ui_ass_format_cbb.addItems(list(_ASS_FORMATS.keys()))
+        self.__ui_ass_format_cbb.currentTextChanged.connect(self.__on_ass_format_changed)
+        options_lyt.addWidget(self.__ui_ass_format_cbb, 2, 1)
+
+        self.__ui_shader_library_cb = QCheckBox("Share shaders between looks")
+        self.__ui_shader_library_cb.stateChanged.connect(self.__on_shader_library_state_changed)
+        options_lyt.addWidget(self.__ui_shader_library_cb, 3, 0)
+        self.__ui_direct_operators_cb = QCheckBox("Write operators directly")
+        self.__ui_direct_operators_cb.setToolTip("Write the operators to the look file without creating scene nodes")
+        self.__ui_direct_operators_cb.stateChanged.connect(self.__on_direct_operators_state_changed)
+        options_lyt.addWidget(self.__ui_direct_operators_cb, 3, 1)
+
+        self.__ui_background_export_cb = QCheckBox("Export in background")
+        self.__ui_background_export_cb.stateChanged.connect(self.__on_background_export_state_changed)
+        options_lyt.addWidget(self.__ui_background_export_cb, 4, 0, 1, 2)
+
         self.__ui_publish_btn = QPushButton("Publish")
         self.__ui_publish_btn.clicked.connect(self.__on_publish)
-        options_lyt.addWidget(self.__ui_publish_btn, 2, 0, 1, 2)
+        options_lyt.addWidget(self.__ui_publish_btn, 5, 0, 1, 2)
+
+        self.__ui_progress_bar = QProgressBar()
+        self.__ui_progress_bar.setVisible(False)
+        options_lyt.addWidget(self.__ui_progress_bar, 6, 0)
+        self.__ui_cancel_btn = QPushButton("Cancel")
+        self.__ui_cancel_btn.clicked.connect(self.__on_cancel_publish)
+        self.__ui_cancel_btn.setVisible(False)
+        options_lyt.addWidget(self.__ui_cancel_btn, 6, 1)
+
+        self.__ui_publish_status_lbl = QLabel()
+        self.__ui_publish_status_lbl.setWordWrap(True)
+        self.__ui_publish_status_lbl.setVisible(False)
+        options_lyt.addWidget(self.__ui_publish_status_lbl, 7, 0, 1, 2)
+
+        self.__ui_upload_status_lbl = QLabel()
+        self.__ui_upload_status_lbl.setWordWrap(True)
+        self.__ui_upload_status_lbl.setVisible(False)
+        options_lyt.addWidget(self.__ui_upload_status_lbl, 8, 0, 1, 2)
+        self.__ui_retry_upload_btn = QPushButton("Retry failed uploads")
+        self.__ui_retry_upload_btn.clicked.connect(self.__on_retry_upload)
+        self.__ui_retry_upload_btn.setVisible(False)
+        options_lyt.addWidget(self.__ui_retry_upload_btn, 9, 0, 1, 2)
 
     def __refresh_ui(self):
         """
@@ -304,11 +442,44 @@ class CharacterPublisher(QDialog):
         """
         self.__ui_look_publish_cb.setChecked(self.__publish_look)
         self.__ui_uv_publish_cb.setChecked(self.__publish_uv)
+        self.__ui_split_model_cb.setChecked(self.__split_model)
+        self.__ui_split_model_cb.setEnabled(self.__publish_uv)
+        self.__ui_background_export_cb.setChecked(self.__background_export)
+        self.__ui_ass_format_cbb.setCurrentText(self.__ass_format)
+        self.__ui_ass_format_cbb.setEnabled(self.__publish_look)
+        self.__ui_shader_library_cb.setChecked(self.__shader_library)
+        # Binary look files can't be shared
+        self.__ui_shader_library_cb.setEnabled(self.__publish_look and not _ASS_FORMATS[self.__ass_format][0])
+        self.__ui_direct_operators_cb.setChecked(self.__direct_operators)
+        self.__ui_direct_operators_cb.setEnabled(self.__publish_look)
         self.__ui_look_name.setEnabled(self.__publish_look)
-        self.__ui_character_lbl.setText(self.__asset_name)
+        self.__ui_character_lbl.setText(
+            self.__asset_name if self.__publish_core is not None else "Analysing scene...")
 
         no_empty_sel = len(self.__selection) > 0
-        self.__ui_publish_btn.setEnabled(no_empty_sel and (self.__publish_look or self.__publish_uv))
+        self.__ui_publish_btn.setEnabled(self.__publish_core is not None and not self.__publishing and no_empty_sel
+                                         and (self.__publish_look or self.__publish_uv))
+        self.__ui_cancel_btn.setVisible(self.__publishing)
+        self.__ui_cancel_btn.setEnabled(not self.__publish_cancelled)
+
+    def __refresh_upload_status(self):
+        """
+        Display the status of the latest uploads of the asset
+        :return:
+        """
+        entries = self.__uploader.get_entries(self.__asset_dir)[-_UPLOAD_STATUS_COUNT:]
+        self.__ui_upload_status_lbl.setVisible(len(entries) > 0)
+        self.__ui_upload_status_lbl.setText("\n".join(PublishUploader.format_status(entry) for entry in entries))
+        self.__ui_retry_upload_btn.setVisible(any(entry["status"] == STATUS_FAILED for entry in entries))
+
+    def __on_retry_upload(self):
+        """
+        On retry failed uploads
+        :return:
+        """
+        self.__uploader.retry()
+        PublishUploader.start_worker()
+        self.__refresh_upload_status()
 
     def __on_uv_publish_state_changed(self, state):
         """
@@ -319,6 +490,14 @@ class CharacterPublisher(QDialog):
         self.__publish_uv = state == 2
         self.__refresh_ui()
 
+    def __on_split_model_state_changed(self, state):
+        """
+        On split model checkbox checked
+        :param state
+        :return:
+        """
+        self.__split_model = state == 2
+
     def __on_look_publish_state_changed(self, state):
         """
         On publish look checkbox checked
@@ -328,6 +507,40 @@ class CharacterPublisher(QDialog):
         self.__publish_look = state == 2
         self.__refresh_ui()
 
+    def __on_background_export_state_changed(self, state):
+        """
+        On background export checkbox checked
+        :param state
+        :return:
+        """
+        self.__background_export = state == 2
+        self.__refresh_ui()
+
+    def __on_shader_library_state_changed(self, state):
+        """
+        On share shaders checkbox checked
+        :param state
+        :return:
+        """
+        self.__shader_library = state == 2
+
+    def __on_direct_operators_state_changed(self, state):
+        """
+        On write operators directly checkbox checked
+        :param state
+        :return:
+        """
+        self.__direct_operators = state == 2
+
+    def __on_ass_format_changed(self, value):
+        """
+        On look file format changed
+        :param value
+        :return:
+        """
+        self.__ass_format = value
+        self.__refresh_ui()
+
     def __on_look_name_changed(self, value):
         """
         On Look name changed
@@ -338,284 +551,144 @@ class CharacterPublisher(QDialog):
 
     def __on_selection_changed(self, *args, **kwargs):
         """
-        On scene selection changed
+        On scene selection changed : schedule a refresh
         :param args
         :param kwargs
         :return:
         """
-        self.__retrieve_datas()
-        self.__refresh_ui()
+        self.__selection_dirty = True
+        if self.isVisible():
+            self.__selection_timer.start()
 
-    def __retrieve_datas(self):
+    def __on_selection_timer_timeout(self):
         """
-        Retrieve all the detas (selection, abc dir, abc name and texture nodes)
+        On selection changes settled
         :return:
         """
-        self.__selection = pm.ls(selection=True)
-        self.__retrieve_abc_dir_and_name()
-        self.__texture_node.clear()
-        if len(self.__selection) == 0: return
-        shapes = pm.listRelatives(self.__selection, allDescendents=True, shapes=True)
-        if len(shapes) == 0: return
-        shading_nodes = pm.listConnections(shapes, type='shadingEngine')
-        if len(shading_nodes) == 0: return
-        file_nodes = pm.listHistory(shading_nodes, type="file")
-        if len(file_nodes) == 0: return
-        image_nodes = pm.listHistory(shading_nodes, type="aiImage")
-        if len(image_nodes) == 0: return
-        self.__texture_node = list(dict.fromkeys(file_nodes + image_nodes))
+        self.__retrieve_selection()
+        self.__refresh_ui()
 
-    def __replace_texture_node_to_tx(self):
+    def __retrieve_selection(self):
         """
-        Replace texture path by tx textures
+        Retrieve the selection
         :return:
         """
-        for tex_node in self.__texture_node:
-            tex_path = CharacterPublisher.get_path_from_texture_node(tex_node)
-            if tex_path is None: continue
-
-            color_space = tex_node.colorSpace.get()
-            render_color_space = "ACEScg"
+        self.__selection = cmds.ls(selection=True, long=True)
+        self.__selection_dirty = False
 
-            # Already TX
-            if tex_path.endswith(".tx"): continue
+    def __on_publish(self):
+        """
+        On submit publish : run the publish stages one by one so the UI stays responsive
+        :return:
+        """
+        from .PublishCore import PublishCore, ASS_ENCODING_ASCII, ASS_ENCODING_BINARY, MODEL_CHUNKS
+        if self.__selection_dirty:
+            self.__retrieve_selection()
+        self.__publish_core.set_selection(self.__selection)
+        self.__publish_core.set_publish_uv(self.__publish_uv)
+        self.__publish_core.set_model_chunks(MODEL_CHUNKS if self.__split_model else 1)
+        self.__publish_core.set_publish_look(self.__publish_look)
+        self.__publish_core.set_looks(PublishCore.parse_looks(self.__look_name))
+        self.__publish_core.set_background_export(self.__background_export)
+        binary, compressed = _ASS_FORMATS[self.__ass_format]
+        self.__publish_core.set_ass_encoding(ASS_ENCODING_BINARY if binary else ASS_ENCODING_ASCII, compressed)
+        self.__publish_core.set_shader_library(self.__shader_library)
+        self.__publish_core.set_direct_operators(self.__direct_operators)
+
+        self.__publish_stages = self.__publish_core.get_stages(CharacterPublisher.__confirm_color_sets,
+                                                              CharacterPublisher.__confirm_render_cost)
+        self.__publish_stage_index = 0
+        self.__publish_timings = []
+        self.__publish_cancelled = False
+        self.__publishing = True
+        self.__background_timer.stop()
+        self.__ui_progress_bar.setMaximum(len(self.__publish_stages))
+        self.__ui_progress_bar.setValue(0)
+        self.__ui_progress_bar.setVisible(True)
+        self.__ui_publish_status_lbl.setVisible(True)
+        self.__refresh_ui()
+        QTimer.singleShot(0, self.__run_next_publish_stage)
 
-            tx_path, tx_path_legacy = CharacterPublisher.texture_path_to_output_tx_path(
-                tex_path, color_space, render_color_space)
+    def __on_cancel_publish(self):
+        """
+        On cancel publish : the publish stops before the next stage
+        :return:
+        """
+        self.__publish_cancelled = True
+        self.__refresh_ui()
 
-            if os.path.isfile(tx_path):
-                updated_path = tx_path
-            elif os.path.isfile(tx_path_legacy):
-                updated_path = tx_path_legacy
-            else:
-                # No TX found
-                continue
+    def __refresh_publish_status(self, status):
+        """
+        Display the timings of the stages done and a status
+        :param status
+        :return:
+        """
+        lines = ["%s : %.2fs" % (name, duration) for name, duration in self.__publish_timings]
+        lines.append(status)
+        self.__ui_publish_status_lbl.setText("\n".join(lines))
 
-            tex_node.ignoreColorSpaceFileRules.set(1)
+    def __run_next_publish_stage(self):
+        """
+        Run the next stage of the publish and schedule the following one
+        :return:
+        """
+        if self.__publish_cancelled:
+            self.__end_publish("Publish cancelled")
+            return
+        if self.__publish_stage_index >= len(self.__publish_stages):
+            self.__end_publish("Publish done")
+            return
 
-            CharacterPublisher.set_path_to_texture_node(tex_node, updated_path)
+        name, stage = self.__publish_stages[self.__publish_stage_index]
+        self.__ui_progress_bar.setFormat("%s (%%v/%%m)" % name)
+        self.__refresh_publish_status(name + "...")
+        self.__ui_progress_bar.repaint()
+        self.__ui_publish_status_lbl.repaint()
+
+        start = time.time()
+        try:
+            result = stage()
+        except Exception as e:
+            traceback.print_exc()
+            self.__end_publish("Publish failed at %s : %s" % (name, e))
+            return
+        self.__publish_timings.append((name, time.time() - start))
+        if result is False:
+            self.__end_publish("Publish aborted at %s" % name)
+            return
 
-            print(f"Replace {tex_path} -> {updated_path}")
+        self.__publish_stage_index += 1
+        self.__ui_progress_bar.setValue(self.__publish_stage_index)
+        QTimer.singleShot(0, self.__run_next_publish_stage)
 
-    def __retrieve_abc_dir_and_name(self):
+    def __end_publish(self, status):
         """
-        Retrieve ABC Dir and ABC Name
+        End of the publish
+        :param status
         :return:
         """
-        if len(self.__selection) == 0:
-            return
-
-        self.__abc_dir = os.path.join(self.__asset_dir, "abc")
-        higher_version_file = 0
-        if os.path.exists(self.__abc_dir):
-            for file in os.listdir(self.__abc_dir):
-                if not os.path.isfile(self.__abc_dir + "/" + file):
-                    continue
-                match = re.search(r".*v([0-9]+).abc", file)
-                if not match:
-                    continue
-                version = int(match.group(1))
-                if version > higher_version_file:
-                    higher_version_file = version
-
-        num = higher_version_file + 1
-        num_str = str(num)
-        self.__abc_name = self.__asset_name + "_mod.v" + (3 - len(num_str)) * '0' + num_str + ".abc"
-        while os.path.exists(self.__abc_dir + "/" + self.__abc_name):
-            num_str = str(num)
-            num_str = (3 - len(num_str)) * '0' + num_str
-            self.__abc_name = self.__asset_name + "_mod.v" + num_str + ".abc"
-            num += 1
-
-    def abc_export(self):
-        """
-        Export UV
-        :return:
-        """
-        abc_path = os.path.join(self.__abc_dir, self.__abc_name)
-        abc_path = abc_path.replace("\\", "/")
-        os.makedirs(self.__abc_dir, exist_ok=True)
-        geo_list_to_export = [s.longName() for s in self.__selection]
-        geo_string_to_export = " -root ".join(geo_list_to_export)
-        job = '-frameRange 1 1 -stripNamespaces -uvWrite -writeColorSets -worldSpace -writeFaceSets -dataFormat ogawa -root %s -file "%s"' % (
-            geo_string_to_export, abc_path)
-        pm.AbcExport(j=job)
-
-        standin = pm.createNode("aiStandIn", n=self.__abc_name.split(".")[0] + "Shape")
-        parent = standin.getParent()
-        pm.rename(parent, self.__abc_name.split(".")[0])
-        standin.dso.set(abc_path)
-        return standin
-
-    def __build_shader_operator(self, standin, sel):
-        """
-        Build shader for look
-        :param standin
-        :param sel
-        :return:
-        """
-        # Get the selected objects
-        ai_merge = pm.createNode("aiMerge", n="aiMerge_%s" % standin.getParent().name())
-        empty_displace = None
-        shaders_used = []
-        pm.addAttr(ai_merge, ln="mtoa_constant_is_target", attributeType="bool", defaultValue=True)
-        pm.connectAttr(ai_merge + ".out", standin + ".operators[0]")
-        meshes = pm.listRelatives(sel, allDescendents=True, shapes=True)
-        for m in meshes:
-            if "ShapeOrig" in m.name():
-                meshes.remove(m)
-
-        counter = 0
-        for m in meshes:
-            selection = m
-            namespace = selection.namespace()
-            selection = selection.longName()
-            selection = selection.replace(namespace, "")
-            selection = selection.replace("|", "/")
-            # selection = selection + "*"
-
-            sgs = m.outputs(type='shadingEngine')
-            sgs = list(set(sgs))
-            set_shader = pm.createNode("aiSetParameter", n="setShader_" + m)
-            selection_attr = set_shader.attr("selection")
-            selection_attr.set(selection)
-            pm.connectAttr(set_shader + ".out", ai_merge + ".inputs[%s]" % (counter), f=True)
-            counter += 1
-
-            shader = ""
-            displacement_shader_string = ""
-            all_disp = None
-            shader_maya_disp = None
-            auto_bump = False
-            if len(sgs) == 1:
-                sg = sgs[0]
-                if sg.aiSurfaceShader.isConnected():
-                    shader_maya = sg.aiSurfaceShader.inputs()[0]
-                    shader += "'%s'" % shader_maya
-                    shaders_used.append(shader_maya)
-                elif sg.surfaceShader.isConnected():
-                    shader_maya = sg.surfaceShader.inputs()[0]
-                    shader += "'%s'" % shader_maya
-                    shaders_used.append(shader_maya)
-
-                if sg.displacementShader.isConnected():
-                    shader_maya_disp = sg.displacementShader.inputs()[0]
-                    displacement_shader_string = "'%s'" % shader_maya_disp
-                    shaders_used.append(shader_maya_disp)
-            else:
-                all_disp = [sg.displacementShader for sg in sgs if sg.displacementShader.isConnected()]
-                for sg in sgs:
-                    if sg.aiSurfaceShader.isConnected():
-                        shader_maya = sg.aiSurfaceShader.inputs()[0]
-                        shaders_used.append(shader_maya)
-                        shader += "'%s' " % shader_maya
-                    elif sg.surfaceShader.isConnected():
-                        shader_maya = sg.surfaceShader.inputs()[0]
-                        shaders_used.append(shader_maya)
-                        shader += "'%s' " % (sg.surfaceShader.inputs()[0])
-                    # Check if there is any displacement shader because if there is one, all sg will need a displacement
-                    # So if an object has two shaders one with a displace and one without, we will need to create an empty shaders
-                    # to make the operator per face assignement work
-                    if len(all_disp) > 0:
-                        if sg.displacementShader.isConnected():
-                            shader_maya = sg.displacementShader.inputs()[0]
-                            shaders_used.append(shader_maya)
-                            displacement_shader_string += "'%s' " % (sg.displacementShader.inputs()[0])
-                        else:
-                            if not empty_displace:
-                                empty_displace = pm.shadingNode("displacementShader", asShader=True)
-                            autobump_attr = empty_displace.attr("aiDisplacementAutoBump")
-                            autobump_attr.set(0)
-                            pm.connectAttr(empty_displace.displacement, sg.displacementShader)
-                            shaders_used.append(empty_displace)
-                            displacement_shader_string += "'%s' " % (empty_displace)
-
-            pm.setAttr(set_shader + ".assignment[0]", "shader=%s" % (shader), type="string")
-            if displacement_shader_string != "":
-                pm.setAttr(set_shader + ".assignment[1]", "disp_map=%s" % (displacement_shader_string), type="string")
-                if all_disp:
-                    all_disp[0].inputs()[0].aiDisplacementAutoBump.get()
-
-                else:
-                    if shader_maya_disp.aiDisplacementAutoBump.get() == True:
-                        auto_bump = True
-                if auto_bump:
-                    pm.setAttr(set_shader + ".assignment[2]", "bool disp_autobump=True", type="string")
-
-            # CATCLARK
-            sss_set_name = m.ai_sss_setname.get()
-            ai_disp_height = m.aiDispHeight.get()
-            casts_shadows = m.castsShadows.get()
-            cat_clark_type = m.aiSubdivType.get()
-            cat_clark_subdiv = m.aiSubdivIterations.get()
-            if cat_clark_type > 0 and cat_clark_subdiv > 0:
-                pm.setAttr(set_shader + ".assignment[3]", "subdiv_type='catclark'", type="string")
-                pm.setAttr(set_shader + ".assignment[4]", "subdiv_iterations=%s" % (cat_clark_subdiv), type="string")
-            if sss_set_name != "":
-                pm.setAttr(set_shader + ".assignment[5]", "string ai_sss_setname=\"%s\"" % (sss_set_name),
-                           type="string")
-            if casts_shadows == 0:
-                pm.setAttr(set_shader + ".assignment[6]", "visibility=253", type="string")
-            if ai_disp_height != 1:
-                pm.setAttr(set_shader + ".assignment[7]", "disp_height=%s" % (ai_disp_height), type="string")
-        return shaders_used
-
-    def __export_arnold_graph(self, standin, shaders_used):
-        """
-        Export look
-        :param standin
-        :param shaders_used
-        :return:
-        """
-        look_dir = os.path.join(self.__asset_dir, "publish")
-        # Check if default look or special one
-        if len(self.__look_name) > 0:
-            look_dir = os.path.join(look_dir, "look", self.__look_name)
-        os.makedirs(look_dir, exist_ok=True)
-        if len(self.__look_name) > 0:
-            path = os.path.join(look_dir, self.__asset_name + "_"+ self.__look_name +"_operator.")
-        else:
-            path = os.path.join(look_dir, self.__asset_name + "_operator.")
-        higher_version_file = 0
-        for file in os.listdir(look_dir):
-            if os.path.isfile(look_dir + "/" + file):
-                match = re.search(r".*v([0-9]+).ass", file)
-                if match:
-                    version = int(match.group(1))
-                    if version > higher_version_file:
-                        higher_version_file = version
-        num = higher_version_file + 1
-        num_str = str(num)
-        path_test = path + "v" + (3 - len(num_str)) * '0' + num_str + ".ass"
-
-        while os.path.exists(path_test):
-            num += 1
-            num_str = str(num)
-            num_str = (3 - len(num_str)) * '0' + num_str
-            path_test = path + "v" + num_str + ".ass"
-
-        path = path_test
-        look = pm.listConnections(standin + ".operators")
-        export_list = look + shaders_used
-        pm.other.arnoldExportAss(export_list, f=path, s=True, asciiAss=True, mask=6160, lightLinks=0, shadowLinks=0,
-                                 fullPath=0)
+        self.__publishing = False
+        self.__publish_core.end_publish(status)
+        total = sum(duration for _, duration in self.__publish_timings)
+        status = "%s (%.2fs)" % (status, total)
+        if self.__publish_core.get_background_process() is not None:
+            status += "\nBackground export running..."
+            self.__background_timer.start()
+        self.__refresh_publish_status(status)
+        self.__refresh_ui()
 
-    def __on_publish(self):
+    def __on_background_timer_timeout(self):
         """
-        On submit publish
+        Check if the background export is over
         :return:
         """
-        CharacterPublisher.__check_color_sets("Pref")
-        self.__replace_texture_node_to_tx()
-        sel = self.__selection
-        if self.__publish_uv:
-            standin = self.abc_export()
+        process = self.__publish_core.get_background_process()
+        if process is None or process.poll() is None:
+            return
+        self.__background_timer.stop()
+        lines = self.__ui_publish_status_lbl.text().split("\n")[:-1]
+        if process.returncode == 0:
+            lines.append("Background export done")
         else:
-            standin = pm.createNode("aiStandIn", n="tmp_standin")
-
-        if self.__publish_look:
-            shaders_used = self.__build_shader_operator(standin, sel)
-            self.__export_arnold_graph(standin, shaders_used)
-
-        # if not self.__publish_uv:
-        #     pm.delete(standin.getTransform())
+            lines.append("Background export failed (see %s)" % self.__publish_core.get_background_log())
+        self.__ui_publish_status_lbl.setText("\n".join(lines))
@@ -0,0 +1,51 @@
+import maya.OpenMaya as OpenMaya
+
+
+# ######################################################################################################################
+
+
+class ColorSetChecker:
+    @staticmethod
+    def find_invalid_color_sets(root_names, color_set_name):
+        """
+        Find the color sets different from color_set_name on all the meshes under the roots, in one API pass.
+        Can be used without UI
+        :param root_names
+        :param color_set_name
+        :return: list of {"shape": full path, "color_sets": [invalid color set names]}
+        """
+        results = []
+        visited_shapes = set()
+        sel = OpenMaya.MSelectionList()
+        for root_name in root_names:
+            try:
+                sel.add(root_name)
+            except RuntimeError:
+                continue
+
+        fn_mesh = OpenMaya.MFnMesh()
+        for i in range(sel.length()):
+            root_path = OpenMaya.MDagPath()
+            try:
+                sel.getDagPath(i, root_path)
+            except RuntimeError:
+                continue
+            it = OpenMaya.MItDag(OpenMaya.MItDag.kDepthFirst, OpenMaya.MFn.kMesh)
+            it.reset(root_path, OpenMaya.MItDag.kDepthFirst, OpenMaya.MFn.kMesh)
+            while not it.isDone():
+                shape_path = OpenMaya.MDagPath()
+                it.getPath(shape_path)
+                shape_name = shape_path.fullPathName()
+                # A shape may be reached by several roots
+                if shape_name not in visited_shapes:
+                    visited_shapes.add(shape_name)
+                    fn_mesh.setObject(shape_path)
+                    if not fn_mesh.isIntermediateObject():
+                        color_sets = OpenMaya.MStringArray()
+                        fn_mesh.getColorSetNames(color_sets)
+                        invalid_color_sets = [color_sets[j] for j in range(color_sets.length())
+                                              if color_sets[j] != color_set_name]
+                        if len(invalid_color_sets) > 0:
+                            results.append({"shape": shape_name, "color_sets": invalid_color_sets})
+                it.next()
+        return results
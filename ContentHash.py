@@ -0,0 +1,141 @@
+import array
+import gzip
+import hashlib
+import itertools
+import json
+import os
+import re
+
+import maya.api.OpenMaya as om
+
+# ######################################################################################################################
+
+_HASH_EXT = ".hash"
+
+
+# ######################################################################################################################
+
+
+class ContentHash:
+    """
+    Stable hashes of the published content, stored beside each version to detect unchanged publishes
+    """
+
+    @staticmethod
+    def hash_path(version_path):
+        """
+        Get the path of the hash file of a version
+        :param version_path
+        :return:
+        """
+        return version_path + _HASH_EXT
+
+    @staticmethod
+    def read_hash(version_path):
+        """
+        Read the hash stored beside a version
+        :param version_path
+        :return: the hash or None
+        """
+        try:
+            with open(ContentHash.hash_path(version_path), "r") as f:
+                return json.load(f).get("hash")
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def write_hash(version_path, content_hash):
+        """
+        Store the hash beside a version
+        :param version_path
+        :param content_hash
+        :return:
+        """
+        with open(ContentHash.hash_path(version_path), "w") as f:
+            json.dump({"hash": content_hash, "file": os.path.basename(version_path)}, f)
+
+    @staticmethod
+    def __float_bytes(values, nested=False):
+        """
+        Get the raw buffer of an array of floats, or of an array of points, vectors or colors
+        :param values
+        :param nested: whether the items are points, vectors or colors
+        :return:
+        """
+        if nested:
+            values = itertools.chain.from_iterable(values)
+        return array.array("f", values).tobytes()
+
+    @staticmethod
+    def __int_bytes(values):
+        """
+        Get the raw buffer of an array of ints
+        :param values
+        :return:
+        """
+        return array.array("i", values).tobytes()
+
+    @staticmethod
+    def hash_meshes(root_names):
+        """
+        Hash what the alembic export writes of the meshes under the roots : hierarchy, world space points,
+        topology, normals, UVs, color sets and face sets
+        :param root_names
+        :return:
+        """
+        content_hash = hashlib.sha1()
+        sel = om.MSelectionList()
+        for root_name in root_names:
+            sel.add(root_name)
+        visited_shapes = set()
+        for i in range(sel.length()):
+            it = om.MItDag(om.MItDag.kDepthFirst, om.MFn.kMesh)
+            it.reset(sel.getDagPath(i), om.MItDag.kDepthFirst, om.MFn.kMesh)
+            while not it.isDone():
+                shape_path = it.getPath()
+                it.next()
+                fn_mesh = om.MFnMesh(shape_path)
+                if fn_mesh.isIntermediateObject or shape_path.fullPathName() in visited_shapes:
+                    continue
+                visited_shapes.add(shape_path.fullPathName())
+                # Namespaces are stripped by the export
+                content_hash.update(re.sub(r"[^|:]+:", "", shape_path.fullPathName()).encode())
+                content_hash.update(ContentHash.__float_bytes(fn_mesh.getFloatPoints(om.MSpace.kWorld), True))
+                counts, connects = fn_mesh.getVertices()
+                content_hash.update(ContentHash.__int_bytes(counts))
+                content_hash.update(ContentHash.__int_bytes(connects))
+                # Per face-vertex normals : they carry the hard and soft edges
+                content_hash.update(ContentHash.__float_bytes(fn_mesh.getNormals(om.MSpace.kWorld), True))
+                normal_counts, normal_ids = fn_mesh.getNormalIds()
+                content_hash.update(ContentHash.__int_bytes(normal_counts))
+                content_hash.update(ContentHash.__int_bytes(normal_ids))
+                for uv_set in fn_mesh.getUVSetNames():
+                    content_hash.update(uv_set.encode())
+                    us, vs = fn_mesh.getUVs(uv_set)
+                    content_hash.update(ContentHash.__float_bytes(us))
+                    content_hash.update(ContentHash.__float_bytes(vs))
+                    uv_counts, uv_ids = fn_mesh.getAssignedUVs(uv_set)
+                    content_hash.update(ContentHash.__int_bytes(uv_counts))
+                    content_hash.update(ContentHash.__int_bytes(uv_ids))
+                for color_set in fn_mesh.getColorSetNames():
+                    content_hash.update(color_set.encode())
+                    content_hash.update(ContentHash.__float_bytes(fn_mesh.getColors(color_set), True))
+                shaders, face_shader_ids = fn_mesh.getConnectedShaders(shape_path.instanceNumber())
+                for shader in shaders:
+                    content_hash.update(om.MFnDependencyNode(shader).name().encode())
+                content_hash.update(ContentHash.__int_bytes(face_shader_ids))
+        return content_hash.hexdigest()
+
+    @staticmethod
+    def hash_ass_file(path):
+        """
+        Hash an ass file (gzipped or not) without its comments (they contain the export date)
+        :param path
+        :return:
+        """
+        content_hash = hashlib.sha1()
+        with (gzip.open(path, "rb") if path.endswith(".gz") else open(path, "rb")) as f:
+            for line in f:
+                if not line.lstrip().startswith(b"#"):
+                    content_hash.update(line)
+        return content_hash.hexdigest()
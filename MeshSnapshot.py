@@ -0,0 +1,128 @@
+import maya.OpenMaya as OpenMaya
+
+
+# ######################################################################################################################
+
+
+class MeshRecord:
+    """
+    Attributes of a mesh needed to build its operator and to estimate its render cost
+    """
+    __slots__ = ("name", "long_name", "selection", "sss_set_name", "disp_height", "casts_shadows",
+                 "subdiv_type", "subdiv_iterations", "sg_names", "face_count", "face_vertex_count")
+
+    def __init__(self, name, long_name, selection):
+        self.name = name
+        self.long_name = long_name
+        self.selection = selection
+        self.sss_set_name = ""
+        self.disp_height = 1.0
+        self.casts_shadows = True
+        self.subdiv_type = 0
+        self.subdiv_iterations = 0
+        self.sg_names = ()
+        self.face_count = 0
+        self.face_vertex_count = 0
+
+
+# ######################################################################################################################
+
+
+class MeshSnapshot:
+    """
+    Snapshot of the attributes of all the meshes under some roots, read in one API pass
+    """
+
+    @staticmethod
+    def __read_plug(fn_node, attr_name, getter, default):
+        """
+        Read a plug value, default if the attribute doesn't exist (MtoA attributes for instance)
+        :param fn_node
+        :param attr_name
+        :param getter: name of the MPlug getter (asString, asFloat...)
+        :param default
+        :return:
+        """
+        try:
+            plug = fn_node.findPlug(attr_name, False)
+            return getattr(plug, getter)()
+        except RuntimeError:
+            return default
+
+    def __init__(self, root_names, shading_index):
+        # Records of the meshes to publish
+        self.__records = []
+        # Standin paths of every shape (ShapeOrig, curves and other shapes included)
+        self.__all_selection_paths = []
+        self.__build(root_names, shading_index)
+
+    def get_records(self):
+        """
+        Getter of the mesh records
+        :return:
+        """
+        return self.__records
+
+    def get_all_selection_paths(self):
+        """
+        Getter of the standin paths of every shape
+        :return:
+        """
+        return self.__all_selection_paths
+
+    def __build(self, root_names, shading_index):
+        """
+        Read the attributes of all the meshes and the standin paths of all the shapes : a wildcard must not assign a
+        look to a curve or any other shape which isn't published as a mesh
+        :param root_names
+        :param shading_index
+        :return:
+        """
+        sel = OpenMaya.MSelectionList()
+        for root_name in root_names:
+            try:
+                sel.add(root_name)
+            except RuntimeError:
+                continue
+
+        visited_shapes = set()
+        fn_shape = OpenMaya.MFnDagNode()
+        fn_mesh = OpenMaya.MFnMesh()
+        it = OpenMaya.MItDag(OpenMaya.MItDag.kDepthFirst, OpenMaya.MFn.kShape)
+        for i in range(sel.length()):
+            root_path = OpenMaya.MDagPath()
+            try:
+                sel.getDagPath(i, root_path)
+            except RuntimeError:
+                continue
+            it.reset(root_path, OpenMaya.MItDag.kDepthFirst, OpenMaya.MFn.kShape)
+            while not it.isDone():
+                shape_path = OpenMaya.MDagPath()
+                it.getPath(shape_path)
+                it.next()
+                long_name = shape_path.fullPathName()
+                if long_name in visited_shapes:
+                    continue
+                visited_shapes.add(long_name)
+
+                fn_shape.setObject(shape_path)
+                name = fn_shape.name()
+                namespace = fn_shape.parentNamespace()
+                selection = long_name.replace(namespace + ":", "") if namespace else long_name
+                selection = selection.replace("|", "/")
+                self.__all_selection_paths.append(selection)
+                if "ShapeOrig" in name or not shape_path.hasFn(OpenMaya.MFn.kMesh):
+                    continue
+
+                fn_mesh.setObject(shape_path)
+                record = MeshRecord(name, long_name, selection)
+                read_plug = MeshSnapshot.__read_plug
+                record.sss_set_name = read_plug(fn_mesh, "ai_sss_setname", "asString", "")
+                record.disp_height = read_plug(fn_mesh, "aiDispHeight", "asFloat", 1.0)
+                record.casts_shadows = read_plug(fn_mesh, "castsShadows", "asBool", True)
+                record.subdiv_type = read_plug(fn_mesh, "aiSubdivType", "asInt", 0)
+                record.subdiv_iterations = read_plug(fn_mesh, "aiSubdivIterations", "asInt", 0)
+                record.sg_names = tuple(shading_index.get_shading_engines(long_name))
+                record.face_count = fn_mesh.numPolygons()
+                record.face_vertex_count = fn_mesh.numFaceVertices()
+                self.__records.append(record)
@@ -0,0 +1,1517 @@
+import getpass
+import gzip
+import os
+import re
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import pymel.core as pm
+
+from .TxConverter import TxConverter
+from .TextureResolver import TextureResolver
+from .ShadingNetworkIndex import ShadingNetworkIndex
+from .ColorSetChecker import ColorSetChecker
+from .SelectionTree import SelectionTree
+from .MeshSnapshot import MeshSnapshot
+from .ContentHash import ContentHash
+from .PublishIndex import PublishIndex, KIND_MODEL, KIND_LOOK
+from .PublishManifest import PublishManifest
+from .ShaderLibrary import ShaderLibrary, LIBRARY_PLACEHOLDER
+from .PublishTelemetry import PublishTelemetry
+from .AssOperatorWriter import AssOperatorWriter
+from .AssOptimizer import AssOptimizer
+from .TextureMemoryReport import TextureMemoryReport
+from .PublishUploader import PublishUploader, STATUS_DONE
+from .RenderCostReport import RenderCostReport
+
+
+# ######################################################################################################################
+
+ASS_ENCODING_ASCII = "ascii"
+ASS_ENCODING_BINARY = "binary"
+
+_ABC_JOB_FLAGS = "-frameRange 1 1 -stripNamespaces -uvWrite -writeColorSets -worldSpace -writeFaceSets " \
+                 "-dataFormat ogawa"
+# Number of files and of mayapy processes of a split model export
+MODEL_CHUNKS = 4
+
+
+# ######################################################################################################################
+
+
+class PublishCore:
+    """
+    Publish of a character model and look, without any UI. Used by the CharacterPublisher dialog and by the
+    batch publish command line
+    """
+
+    @staticmethod
+    def texture_path_to_output_tx_path(texture_path, color_space, render_color_space):
+        """
+        Generate a path corresponding to the output tx
+        :param texture_path
+        :param color_space
+        :param render_color_space
+        :return:
+        """
+        texture_path = os.path.normpath(texture_path)
+        dir_path, file_ext = os.path.splitext(texture_path)
+        file_name = os.path.basename(dir_path)
+
+        output_path = os.path.join(
+            os.path.dirname(dir_path),
+            f"{file_name}_{color_space}_{render_color_space}{file_ext}.tx"
+        )
+        output_path_legacy = os.path.splitext(texture_path)[0] + ".tx"
+
+        return output_path, output_path_legacy
+
+    @staticmethod
+    def get_path_from_texture_node(tex_node):
+        """
+        Get the file path attributes from a texture node (File or image here)
+        :param tex_node
+        :return:
+        """
+        if pm.objectType(tex_node, isType="file"):
+            return tex_node.fileTextureName.get()
+        elif pm.objectType(tex_node, isType="aiImage"):
+            return tex_node.filename.get()
+        else:
+            return None
+
+    @staticmethod
+    def set_path_to_texture_node(tex_node, path):
+        """
+        Set the file path attributes to a texture node (File or image here)
+        :param tex_node
+        :param path
+        :return:
+        """
+        if pm.objectType(tex_node, isType="file"):
+            tex_node.fileTextureName.set(path)
+        elif pm.objectType(tex_node, isType="aiImage"):
+            tex_node.filename.set(path)
+
+    @staticmethod
+    def get_tile_pattern_from_texture_node(tex_node):
+        """
+        Get the path with its tile tokens of a texture node. File nodes in UV tiling mode store a single tile
+        in their path so the computed pattern is used instead
+        :param tex_node
+        :return:
+        """
+        if pm.objectType(tex_node, isType="file") and tex_node.uvTilingMode.get() > 0:
+            return tex_node.computedFileTextureNamePattern.get()
+        return PublishCore.get_path_from_texture_node(tex_node)
+
+    @staticmethod
+    def retrieve_dir_and_asset_from_scene_name(scene):
+        """
+        Guess the asset directory and name from a scene name
+        :param scene
+        :return: (asset dir, asset name), the name is None if not found
+        """
+        asset_dir = ""
+        asset_name = None
+        split = scene.split("/")
+        split[0] = split[0] + "\\"
+        for i, s in enumerate(reversed(split)):
+            if s == "assets":
+                asset_dir = os.path.join(*split[0:-(i - 1)])
+                asset_name = split[-i]
+        return asset_dir, asset_name
+
+    @staticmethod
+    def parse_looks(text):
+        """
+        Parse a list of looks written "look, look=renderLayer, ..." (an empty name is the default look)
+        :param text
+        :return: list of (look name, render layer or None for the current layer)
+        """
+        looks = []
+        for entry in text.split(","):
+            name, _, render_layer = entry.partition("=")
+            name = name.strip()
+            if name not in [look[0] for look in looks]:
+                looks.append((name, render_layer.strip() or None))
+        return looks
+
+    @staticmethod
+    def get_current_render_layer():
+        """
+        Get the name of the visible render layer
+        :return:
+        """
+        if pm.mel.eval("mayaHasRenderSetup()"):
+            import maya.app.renderSetup.model.renderSetup as renderSetup
+            return renderSetup.instance().getVisibleRenderLayer().name()
+        return pm.editRenderLayerGlobals(query=True, currentRenderLayer=True)
+
+    @staticmethod
+    def switch_render_layer(layer_name):
+        """
+        Make a render layer visible (render setup layer or legacy render layer)
+        :param layer_name
+        :return:
+        """
+        if pm.mel.eval("mayaHasRenderSetup()"):
+            import maya.app.renderSetup.model.renderSetup as renderSetup
+            render_setup = renderSetup.instance()
+            if layer_name == render_setup.getDefaultRenderLayer().name():
+                render_setup.switchToLayer(render_setup.getDefaultRenderLayer())
+            else:
+                render_setup.switchToLayer(render_setup.getRenderLayer(layer_name))
+        else:
+            pm.editRenderLayerGlobals(currentRenderLayer=layer_name)
+
+    @staticmethod
+    def abc_job(root_names, path):
+        """
+        Get the AbcExport job of the model
+        :param root_names
+        :param path
+        :return:
+        """
+        return '%s -root %s -file "%s"' % (_ABC_JOB_FLAGS, " -root ".join(root_names), path)
+
+    @staticmethod
+    def plan_model_chunks(roots, chunk_count):
+        """
+        Split the model by top level group (the children of the roots) into chunks of balanced face counts.
+        A chunk keeps the full hierarchy of its roots, the groups of the other chunks being pruned, so the split
+        files have the same paths as a single file export
+        :param roots
+        :param chunk_count
+        :return: list of {"roots": root names, "prune": names of the groups to delete}, empty if not splittable
+        """
+        units = []
+        for root in roots:
+            children = root.getChildren(type="transform")
+            units += [(root, child) for child in children] if len(children) > 0 else [(root, None)]
+        chunk_count = min(chunk_count, len(units))
+        if chunk_count < 2:
+            return []
+        weights = []
+        for root, child in units:
+            face_count = pm.polyEvaluate(child or root, face=True)
+            # polyEvaluate returns a message when there is no mesh
+            weights.append(face_count if isinstance(face_count, int) else 0)
+        buckets = [[] for _ in range(chunk_count)]
+        loads = [0] * chunk_count
+        for weight, unit in sorted(zip(weights, units), key=lambda item: -item[0]):
+            i = loads.index(min(loads))
+            buckets[i].append(unit)
+            loads[i] += weight
+        chunks = []
+        for bucket in buckets:
+            bucket_roots = list(dict.fromkeys(root for root, _ in bucket))
+            kept = {child for _, child in bucket if child is not None}
+            prune = [child.longName() for root in bucket_roots for child in root.getChildren(type="transform")
+                     if child not in kept]
+            chunks.append({"roots": [root.longName() for root in bucket_roots], "prune": prune})
+        return chunks
+
+    @staticmethod
+    def save_scene_copy(prefix):
+        """
+        Save a copy of the scene in the temp directory for mayapy processes
+        :param prefix
+        :return: the path of the copy
+        """
+        tmp_name = "%s_%s_%s" % (prefix, os.getpid(), int(time.time() * 1000))
+        tmp_scene = os.path.join(tempfile.gettempdir(), tmp_name + ".ma").replace("\\", "/")
+        pm.exportAll(tmp_scene, type="mayaAscii", preserveReferences=True, force=True)
+        return tmp_scene
+
+    @staticmethod
+    def run_abc_export(job, prune=None):
+        """
+        Run an AbcExport job
+        :param job
+        :param prune: nodes deleted before the export, only in the scene of a mayapy worker
+        :return:
+        """
+        if prune:
+            pm.delete(prune)
+        pm.AbcExport(j=job)
+
+    @staticmethod
+    def run_abc_chunk_exports(export):
+        """
+        Export the chunks of a split model concurrently, one mayapy process per chunk
+        :param export
+        :return:
+        """
+        from .batch_publish import EXIT_OK, find_mayapy, run_export_job
+        mayapy = find_mayapy()
+        if mayapy is None:
+            raise RuntimeError("mayapy is needed to export a split model")
+        tmp_scene = PublishCore.save_scene_copy("character_publisher_chunks")
+        log_prefix = os.path.splitext(tmp_scene)[0]
+        try:
+            with ThreadPoolExecutor(max_workers=len(export["chunks"])) as executor:
+                futures = [executor.submit(run_export_job, {"scene": tmp_scene, "exports": [chunk], "keep_scene": True},
+                                           mayapy, "%s_%02d.log" % (log_prefix, i))
+                           for i, chunk in enumerate(export["chunks"])]
+                results = [future.result() for future in futures]
+        finally:
+            os.remove(tmp_scene)
+        failed = ["%s_%02d.log" % (log_prefix, i) for i, (exit_code, _) in enumerate(results) if exit_code != EXIT_OK]
+        if len(failed) > 0:
+            raise RuntimeError("Model chunk export failed (see %s)" % ", ".join(failed))
+        print("Model exported in %s files in %.2fs" % (len(results), max(duration for _, duration in results)))
+
+    @staticmethod
+    def run_ass_export(export_list, path, encoding=ASS_ENCODING_ASCII, compressed=False, operators=None):
+        """
+        Export nodes to an ass file
+        :param export_list
+        :param path: the .ass path (.ass.gz if compressed)
+        :param encoding: ascii or binary (large arrays binary encoded)
+        :param compressed: whether the file is gzipped
+        :param operators: operator graph of collect_shader_operator, written after the exported nodes
+        :return:
+        """
+        ass_path = path[:-len(".gz")] if compressed else path
+        if len(export_list) > 0:
+            pm.other.arnoldExportAss(export_list, f=ass_path, s=True, asciiAss=encoding == ASS_ENCODING_ASCII,
+                                     mask=6160, lightLinks=0, shadowLinks=0, fullPath=0)
+        else:
+            # Nothing to export : arnoldExportAss would export the whole scene
+            open(ass_path, "wb").close()
+        if operators is not None:
+            with open(ass_path, "ab") as f:
+                count = AssOperatorWriter.write(f, operators)
+            print("%s operator nodes written to %s" % (count, os.path.basename(ass_path)))
+        if compressed:
+            # Compressed here rather than by MtoA to get a gzip without date, so identical looks hash the same
+            with open(ass_path, "rb") as f_in, open(path, "wb") as f_out:
+                with gzip.GzipFile(filename="", mode="wb", fileobj=f_out, mtime=0) as f_gz:
+                    shutil.copyfileobj(f_in, f_gz)
+            os.remove(ass_path)
+
+    @staticmethod
+    def optimize_ass(path, telemetry=None):
+        """
+        Remove the unreachable nodes and the default parameters of an exported look and merge its identical shading
+        subgraphs
+        :param path
+        :param telemetry: PublishTelemetry receiving the counters of the pass
+        :return: the statistics of the pass
+        """
+        start = time.time()
+        stats = AssOptimizer().optimize_file(path)
+        print("Look optimised in %.2fs : %s unreachable nodes removed, %s nodes merged, %s default parameters removed"
+              % (time.time() - start, stats["unreachable"], stats["merged"], stats["params_removed"]))
+        print("Look file %s -> %s bytes, parse %.3fs -> %.3fs" % (stats["bytes_before"], stats["bytes_after"],
+                                                                  stats["parse_before"], stats["parse_after"]))
+        if telemetry is not None:
+            telemetry.count("ass_nodes_unreachable", stats["unreachable"])
+            telemetry.count("ass_nodes_merged", stats["merged"])
+            telemetry.count("ass_params_removed", stats["params_removed"])
+            telemetry.count("ass_bytes_saved", stats["bytes_before"] - stats["bytes_after"])
+        return stats
+
+    @staticmethod
+    def run_exports(exports, telemetry=None):
+        """
+        Run a list of deferred exports
+        :param exports
+        :param telemetry: PublishTelemetry receiving a span per export
+        :return:
+        """
+        if telemetry is None:
+            telemetry = PublishTelemetry()
+        for export in exports:
+            with telemetry.span("Write %s" % export["type"]):
+                PublishCore.__run_export(export, telemetry)
+                for path in [export["path"]] + export.get("layers", []):
+                    # An unchanged look is removed
+                    if os.path.isfile(path):
+                        telemetry.count("files_written")
+                        telemetry.count("bytes_written", os.path.getsize(path))
+
+    @staticmethod
+    def __run_export(export, telemetry):
+        """
+        Run a deferred export
+        :param export
+        :param telemetry: PublishTelemetry of the span of the export
+        :return:
+        """
+        if export["type"] == "abc":
+            PublishCore.run_abc_export(export["job"])
+            ContentHash.write_hash(export["path"], export["hash"])
+            PublishCore.__commit_export(export, export["hash"])
+        elif export["type"] == "abc_chunks":
+            PublishCore.run_abc_chunk_exports(export)
+            ContentHash.write_hash(export["path"], export["hash"])
+            PublishCore.__commit_export(export, export["hash"])
+        elif export["type"] == "abc_chunk":
+            PublishCore.run_abc_export(export["job"], export["prune"])
+        elif export["type"] == "ass":
+            PublishCore.run_ass_export(export["nodes"], export["path"], export.get("encoding", ASS_ENCODING_ASCII),
+                                       export.get("compressed", False), export.get("operators"))
+            if export.get("optimize", False):
+                PublishCore.optimize_ass(export["path"], telemetry)
+            library = export.get("shader_library")
+            if library is not None:
+                _, library_upload = ShaderLibrary(library["asset_dir"], library["asset_name"]).share(
+                    export["path"], library.get("staging", False))
+                if library_upload is not None:
+                    export["requires"] = [library_upload]
+            look_hash = PublishCore.__keep_ass_if_changed(export["path"], export.get("previous_path"),
+                                                           export.get("previous_hash"))
+            if look_hash is not None:
+                PublishCore.__commit_export(export, look_hash)
+
+    @staticmethod
+    def __commit_export(export, content_hash):
+        """
+        Write the manifest of an exported version and record it in the publish index
+        :param export
+        :param content_hash
+        :return:
+        """
+        index = export.get("index")
+        if index is None:
+            return
+        extra = {}
+        if export["type"] == "abc_chunks":
+            extra["layers"] = export["layers"]
+        if export["type"] == "ass":
+            extra["encoding"] = export.get("encoding", ASS_ENCODING_ASCII)
+            extra["compressed"] = export.get("compressed", False)
+        # The texture memory report is only kept in the manifest, not in the index
+        manifest_extra = dict(extra)
+        if "texture_memory" in export:
+            manifest_extra["texture_memory"] = export["texture_memory"]
+        if "render_cost" in export:
+            manifest_extra["render_cost"] = export["render_cost"]
+        upload = export.get("upload")
+        if upload is None:
+            PublishManifest.write(export["path"], export.get("textures", []), kind=index["kind"],
+                                  look_name=index["look_name"], version=index["version"], hash=content_hash,
+                                  **manifest_extra)
+            PublishIndex(index["asset_dir"]).commit(index["kind"], index["look_name"], index["version"],
+                                                    export["path"], content_hash, **extra)
+            return
+        # Staged export : the manifest and the index record are written once the files are uploaded
+        if "layers" in extra:
+            extra["layers"] = manifest_extra["layers"] = upload["layers"]
+        files = list(zip(export.get("layers", []), upload.get("layers", [])))
+        files.append((ContentHash.hash_path(export["path"]), ContentHash.hash_path(upload["path"])))
+        files.append((export["path"], upload["path"]))
+        label = "%s %s v%03d" % (index["kind"], index["look_name"] or "default", index["version"]) \
+            if index["kind"] == KIND_LOOK else "%s v%03d" % (index["kind"], index["version"])
+        PublishUploader().enqueue(label, index["asset_dir"], files, {
+            "manifest": {"path": upload["path"], "textures": export.get("textures", []),
+                         "fields": dict(kind=index["kind"], look_name=index["look_name"], version=index["version"],
+                                        hash=content_hash, **manifest_extra)},
+            "index": {"asset_dir": index["asset_dir"], "kind": index["kind"], "look_name": index["look_name"],
+                      "version": index["version"], "path": upload["path"], "hash": content_hash, "extra": extra}},
+            export.get("requires"))
+
+    @staticmethod
+    def __keep_ass_if_changed(path, previous_path, previous_hash):
+        """
+        Remove a new ass version if its content is identical to the previous version, store its hash otherwise
+        :param path
+        :param previous_path
+        :param previous_hash
+        :return: the hash of the new version, None if it has been removed
+        """
+        look_hash = ContentHash.hash_ass_file(path)
+        if previous_path is not None and previous_hash == look_hash:
+            os.remove(path)
+            print("Look unchanged since %s" % PublishCore.get_version_label(previous_path))
+            return None
+        ContentHash.write_hash(path, look_hash)
+        return look_hash
+
+    @staticmethod
+    def get_version_label(path):
+        """
+        Get the version label (vNNN) of a published file
+        :param path
+        :return:
+        """
+        match = re.search(r"(v[0-9]+)\.[a-z.]+$", os.path.basename(path))
+        return match.group(1) if match else os.path.basename(path)
+
+    def __init__(self, asset_dir, asset_name):
+        self.__asset_dir = asset_dir
+        self.__asset_name = asset_name
+        self.__texture_node = []
+        self.__selection = []
+        self.__abc_dir = ""
+        self.__abc_name = ""
+        self.__previous_abc_name = None
+        self.__previous_abc_hash = None
+        self.__previous_abc_layers = []
+        self.__model_chunks = 1
+        self.__publish_index = PublishIndex(asset_dir)
+        self.__publish_uv = True
+        self.__publish_look = True
+        self.__look_name = ""
+        # (look name, render layer) of the looks to publish
+        self.__looks = [("", None)]
+        # Render layer visible before the publish switched to the layer of a look
+        self.__initial_render_layer = None
+        self.__look_timings = {}
+        self.__mesh_snapshot = None
+        self.__mesh_snapshot_layer = None
+        self.__ass_encoding = ASS_ENCODING_ASCII
+        self.__ass_compressed = False
+        self.__shader_library = False
+        # Operators written to the look file without scene nodes
+        self.__direct_operators = False
+        self.__operators = None
+        # Optimisation pass over the exported look file
+        self.__optimize_ass = True
+        # Publish files written to the local staging directory and uploaded to the asset folder in background
+        self.__staging = True
+        self.__uploader = PublishUploader()
+        # Texture memory budget of a look in GB, the default one if None
+        self.__texture_budget = None
+        self.__texture_report = TextureMemoryReport()
+        self.__texture_memory = None
+        # Polygon thresholds of the render cost precheck, the default ones if None
+        self.__max_mesh_polygons = None
+        self.__max_polygons = None
+        self.__render_cost = None
+        self.__texture_resolver = TextureResolver()
+        self.__shading_index = ShadingNetworkIndex()
+        # Exports are deferred to a mayapy process when publishing in background
+        self.__background_export = False
+        self.__deferred_exports = []
+        self.__background_process = None
+        self.__background_log = None
+        self.__standin = None
+        self.__shaders_used = []
+        self.__manifest_textures = []
+        self.__telemetry = PublishTelemetry()
+        self.__telemetry_path = None
+
+    def set_selection(self, selection):
+        """
+        Setter of the root nodes to publish
+        :param selection: nodes or node names
+        :return:
+        """
+        self.__selection = pm.ls(selection)
+
+    def set_publish_uv(self, publish_uv):
+        """
+        Setter of whether the model is published
+        :param publish_uv
+        :return:
+        """
+        self.__publish_uv = publish_uv
+
+    def set_model_chunks(self, model_chunks):
+        """
+        Setter of the number of files the model is split into (1 for a single file)
+        :param model_chunks
+        :return:
+        """
+        self.__model_chunks = model_chunks
+
+    def set_publish_look(self, publish_look):
+        """
+        Setter of whether the look is published
+        :param publish_look
+        :return:
+        """
+        self.__publish_look = publish_look
+
+    def set_look_name(self, look_name):
+        """
+        Setter of the look name (empty for the default look)
+        :param look_name
+        :return:
+        """
+        self.__look_name = look_name
+        self.__looks = [(look_name, None)]
+
+    def set_looks(self, looks):
+        """
+        Setter of the looks published in one pass
+        :param looks: list of (look name, render layer or None for the current layer)
+        :return:
+        """
+        self.__looks = list(looks) if len(looks) > 0 else [("", None)]
+        self.__look_name = self.__looks[0][0]
+
+    def get_look_timings(self):
+        """
+        Getter of the duration of the operators build and export of each look of the last publish
+        :return: dict look name -> seconds
+        """
+        return self.__look_timings
+
+    def set_ass_encoding(self, encoding, compressed):
+        """
+        Setter of the encoding of the look file
+        :param encoding: ascii or binary
+        :param compressed: whether the look file is gzipped
+        :return:
+        """
+        self.__ass_encoding = encoding
+        self.__ass_compressed = compressed
+
+    def set_shader_library(self, shader_library):
+        """
+        Setter of whether the shading networks are shared between the looks through the asset shader library
+        :param shader_library
+        :return:
+        """
+        self.__shader_library = shader_library
+
+    def __uses_shader_library(self):
+        """
+        Check if the shading networks are moved to the shader library. Binary ass files can't be parsed outside of
+        Arnold, like for the optimisation a binary look stays self-contained
+        :return:
+        """
+        return self.__shader_library and self.__ass_encoding == ASS_ENCODING_ASCII
+
+    def set_optimize_ass(self, optimize_ass):
+        """
+        Setter of whether the exported look files are optimised (unreachable nodes, default parameters, identical
+        subgraphs)
+        :param optimize_ass
+        :return:
+        """
+        self.__optimize_ass = optimize_ass
+
+    def set_staging(self, staging):
+        """
+        Setter of whether the publish files are written to the local staging directory then uploaded, or written
+        directly to the asset folder
+        :param staging
+        :return:
+        """
+        self.__staging = staging
+
+    def set_texture_budget(self, texture_budget):
+        """
+        Setter of the texture memory budget of a look
+        :param texture_budget: in GB, None for the default budget
+        :return:
+        """
+        self.__texture_budget = texture_budget
+
+    def set_render_cost_thresholds(self, max_mesh_polygons, max_polygons):
+        """
+        Setter of the polygons after subdivision over which the render cost precheck warns
+        :param max_mesh_polygons: for a single mesh, the default one if None
+        :param max_polygons: for the whole character, the default one if None
+        :return:
+        """
+        self.__max_mesh_polygons = max_mesh_polygons
+        self.__max_polygons = max_polygons
+
+    def set_direct_operators(self, direct_operators):
+        """
+        Setter of whether the operators are written to the look file directly instead of being created in the scene
+        :param direct_operators
+        :return:
+        """
+        self.__direct_operators = direct_operators
+
+    def set_background_export(self, background_export):
+        """
+        Setter of whether the file exports are run in a background mayapy process
+        :param background_export
+        :return:
+        """
+        self.__background_export = background_export
+
+    def get_background_process(self):
+        """
+        Getter of the background export process of the last publish (None if not in background)
+        :return:
+        """
+        return self.__background_process
+
+    def get_background_log(self):
+        """
+        Getter of the log path of the background export process
+        :return:
+        """
+        return self.__background_log
+
+    def get_telemetry_path(self):
+        """
+        Getter of the path of the telemetry log of the last publish
+        :return:
+        """
+        return self.__telemetry_path
+
+    def add_callbacks(self):
+        """
+        Add the callbacks keeping the shading index up to date
+        :return:
+        """
+        self.__shading_index.add_callbacks()
+
+    def remove_callbacks(self):
+        """
+        Remove the callbacks of the shading index
+        :return:
+        """
+        self.__shading_index.remove_callbacks()
+
+    def check_color_sets(self, color_set_name, confirm_callback=None):
+        """
+        Check if color sets different from color_set_name exist on the selection
+        :param color_set_name
+        :param confirm_callback: called with the list of invalid color sets, returns whether to continue.
+        Without callback the invalid color sets are only reported
+        :return: whether the publish can continue
+        """
+        invalid_color_sets = ColorSetChecker.find_invalid_color_sets(
+            [obj.longName() for obj in self.__selection], color_set_name)
+        self.__telemetry.count("invalid_color_sets", len(invalid_color_sets))
+        if len(invalid_color_sets) == 0:
+            return True
+        msg = "These shapes have color sets different from '{}' :\n".format(color_set_name)
+        for result in invalid_color_sets:
+            msg += "\n{} : {}".format(result["shape"], ", ".join(result["color_sets"]))
+        print(msg)
+        if confirm_callback is None:
+            return True
+        return confirm_callback(invalid_color_sets)
+
+    def check_render_cost(self, confirm_callback=None):
+        """
+        Estimate the polygons and the memory of the meshes once subdivided by Arnold, and report the meshes over the
+        thresholds before the export
+        :param confirm_callback: called with the report when over the thresholds, returns whether to continue.
+        Without callback the meshes are only reported
+        :return: whether the publish can continue
+        """
+        if not RenderCostReport.is_available():
+            print("NumPy not available, render cost precheck skipped")
+            return True
+        start = time.time()
+        snapshot = self.__mesh_snapshot
+        if snapshot is None:
+            snapshot = MeshSnapshot([s.longName() for s in self.__selection], self.__shading_index)
+            # Reused by the looks in the current render layer, the meshes are read again by the looks of the others
+            self.__mesh_snapshot = snapshot
+            self.__mesh_snapshot_layer = PublishCore.get_current_render_layer()
+        records = snapshot.get_records()
+        sg_names = {sg_name for record in records for sg_name in record.sg_names}
+        displaced_sg_names = {sg_name for sg_name in sg_names if pm.PyNode(sg_name).displacementShader.isConnected()}
+        default_max_mesh_polygons, default_max_polygons = RenderCostReport.get_default_thresholds()
+        max_mesh_polygons = self.__max_mesh_polygons or default_max_mesh_polygons
+        max_polygons = self.__max_polygons or default_max_polygons
+        report = RenderCostReport.build(records, displaced_sg_names, max_mesh_polygons, max_polygons)
+        self.__render_cost = report
+        print(RenderCostReport.format_summary(report))
+        print("Render cost estimated in %.3fs" % (time.time() - start))
+        self.__telemetry.count("render_polygons", report["polygons"])
+        self.__telemetry.count("render_meshes_over_threshold", len(report["over_mesh"]))
+        if not report["over_budget"]:
+            return True
+        self.__telemetry.count("render_cost_exceeded")
+        pm.warning("The character has %s polygons after subdivision (max %s), %s meshes over %s polygons" % (
+            format(report["polygons"], ","), format(max_polygons, ","), len(report["over_mesh"]),
+            format(max_mesh_polygons, ",")))
+        if confirm_callback is None:
+            return True
+        return confirm_callback(report)
+
+    def retrieve_datas(self):
+        """
+        Retrieve all the datas needed to publish (abc dir, abc name and texture nodes)
+        :return:
+        """
+        self.retrieve_abc_dir_and_name()
+        self.__texture_node = self.__retrieve_texture_nodes()
+
+    def analyse_selection(self):
+        """
+        Walk the shading networks of the selection ahead of the publish, the shading index keeps them
+        :return: number of texture nodes found
+        """
+        return len(self.__retrieve_texture_nodes())
+
+    def __retrieve_texture_nodes(self):
+        """
+        Retrieve the texture nodes of the shadingEngines of the selection
+        :return:
+        """
+        if len(self.__selection) == 0: return []
+        shapes = pm.listRelatives(self.__selection, allDescendents=True, shapes=True)
+        if len(shapes) == 0: return []
+        shading_nodes = pm.listConnections(shapes, type='shadingEngine')
+        if len(shading_nodes) == 0: return []
+        shading_engines = set(shading_nodes)
+        texture_names = self.__shading_index.get_texture_nodes([sg.name() for sg in shading_engines])
+        self.__telemetry.count("shading_engines", len(shading_engines))
+        self.__telemetry.count("texture_nodes", len(texture_names))
+        return [pm.PyNode(name) for name in texture_names]
+
+    def __switch_look_layer(self, render_layer):
+        """
+        Make the render layer of a look visible
+        :param render_layer: None for the layer visible before the publish
+        :return:
+        """
+        if render_layer is None:
+            render_layer = self.__initial_render_layer
+            if render_layer is None:
+                return
+        current_render_layer = PublishCore.get_current_render_layer()
+        if self.__initial_render_layer is None:
+            self.__initial_render_layer = current_render_layer
+        if render_layer == current_render_layer:
+            return
+        PublishCore.switch_render_layer(render_layer)
+        # Without the DG callbacks (batch) the index doesn't see the assignments of the layer
+        self.__shading_index.clear()
+
+    def __restore_render_layer(self):
+        """
+        Make the render layer visible before the publish visible again
+        :return:
+        """
+        self.__switch_look_layer(None)
+
+    def generate_missing_tx(self):
+        """
+        Generate the tx of the textures that don't have one (or an outdated one)
+        :return:
+        """
+        render_color_space = "ACEScg"
+        converter = TxConverter(texture_resolver=self.__texture_resolver)
+        for tex_node in self.__texture_node:
+            tex_path = PublishCore.get_path_from_texture_node(tex_node)
+            if tex_path is None or tex_path.endswith(".tx"): continue
+
+            color_space = tex_node.colorSpace.get()
+            pattern = PublishCore.get_tile_pattern_from_texture_node(tex_node)
+            for tile_path in self.__texture_resolver.expand_tiles(pattern):
+                tx_path, tx_path_legacy = PublishCore.texture_path_to_output_tx_path(
+                    tile_path, color_space, render_color_space)
+                converter.add_job(tile_path, tx_path, color_space, render_color_space)
+
+        def print_progress(done, total, tx_path):
+            # The directory has changed so its index is outdated
+            self.__texture_resolver.invalidate(os.path.dirname(tx_path))
+            self.__telemetry.count("tx_generated")
+            print(f"TX {done}/{total} : {tx_path}")
+
+        errors = converter.run(print_progress)
+        self.__telemetry.count("tx_errors", len(errors))
+        for tx_path, error in errors.items():
+            print(f"TX generation failed for {tx_path} : {error}")
+
+    def replace_texture_node_to_tx(self):
+        """
+        Replace texture path by tx textures
+        :return:
+        """
+        missing_tiles_by_node = {}
+        for tex_node in self.__texture_node:
+            tex_path = PublishCore.get_path_from_texture_node(tex_node)
+            if tex_path is None: continue
+
+            color_space = tex_node.colorSpace.get()
+            render_color_space = "ACEScg"
+
+            # Already TX
+            if tex_path.endswith(".tx"): continue
+
+            tx_path, tx_path_legacy = PublishCore.texture_path_to_output_tx_path(
+                tex_path, color_space, render_color_space)
+
+            pattern = PublishCore.get_tile_pattern_from_texture_node(tex_node)
+            if TextureResolver.has_tile_token(pattern):
+                missing_tiles = self.__retrieve_missing_tx_tiles(pattern, color_space, render_color_space)
+                if missing_tiles["tx"] and missing_tiles["legacy"]:
+                    # Only switch to TX when the whole tile set is covered
+                    missing_tiles_by_node[tex_node.name()] = missing_tiles["tx"]
+                    continue
+                updated_path = tx_path if not missing_tiles["tx"] else tx_path_legacy
+            else:
+                updated_path = self.__texture_resolver.resolve_tx(tx_path, tx_path_legacy)
+                if updated_path is None:
+                    # No TX found
+                    continue
+
+            tex_node.ignoreColorSpaceFileRules.set(1)
+
+            PublishCore.set_path_to_texture_node(tex_node, updated_path)
+            self.__telemetry.count("textures_replaced")
+
+            print(f"Replace {tex_path} -> {updated_path}")
+
+        self.__telemetry.count("missing_tx_tiles", sum(len(tiles) for tiles in missing_tiles_by_node.values()))
+        if len(missing_tiles_by_node) > 0:
+            msg = "TX tiles missing, these texture nodes keep their source textures :"
+            for node_name, missing_tiles in missing_tiles_by_node.items():
+                msg += f"\n  {node_name} : {len(missing_tiles)} tile(s) missing"
+                for tile_path in missing_tiles:
+                    msg += f"\n    {tile_path}"
+            pm.warning(msg)
+
+    def __retrieve_missing_tx_tiles(self, pattern, color_space, render_color_space):
+        """
+        Check the TX coverage of every tile of a tokenized texture path
+        :param pattern
+        :param color_space
+        :param render_color_space
+        :return: dict of the source tiles without tx for both the "tx" and the "legacy" naming
+        """
+        missing_tiles = {"tx": [], "legacy": []}
+        tiles = self.__texture_resolver.expand_tiles(pattern)
+        if len(tiles) == 0:
+            missing_tiles["tx"].append(pattern)
+            missing_tiles["legacy"].append(pattern)
+        for tile_path in tiles:
+            tx_path, tx_path_legacy = PublishCore.texture_path_to_output_tx_path(
+                tile_path, color_space, render_color_space)
+            if not self.__texture_resolver.exists(tx_path):
+                missing_tiles["tx"].append(tile_path)
+            if not self.__texture_resolver.exists(tx_path_legacy):
+                missing_tiles["legacy"].append(tile_path)
+        return missing_tiles
+
+    def collect_manifest_textures(self):
+        """
+        Collect the textures used by the texture nodes, tiles expanded, for the publish manifest
+        :return: list of {"node": name, "path": path on the node, "files": [file entries]}
+        """
+        textures = []
+        for tex_node in self.__texture_node:
+            tex_path = PublishCore.get_path_from_texture_node(tex_node)
+            if tex_path is None: continue
+            pattern = PublishCore.get_tile_pattern_from_texture_node(tex_node)
+            tile_paths = self.__texture_resolver.expand_tiles(pattern)
+            if len(tile_paths) == 0:
+                # Missing texture, listed anyway so the farm knows about it
+                tile_paths = [pattern]
+            textures.append({"node": tex_node.name(), "path": tex_path.replace("\\", "/"),
+                             "files": [PublishManifest.describe_file(tile_path) for tile_path in tile_paths]})
+        return textures
+
+    def retrieve_abc_dir_and_name(self):
+        """
+        Retrieve ABC Dir and the previous ABC version from the publish index
+        :return:
+        """
+        if len(self.__selection) == 0:
+            return
+
+        self.__abc_dir = os.path.join(self.__asset_dir, "abc")
+        self.__publish_index.load()
+        previous_record = self.__publish_index.get_latest(KIND_MODEL)
+        if previous_record is None:
+            self.__previous_abc_name = None
+            self.__previous_abc_hash = None
+            self.__previous_abc_layers = []
+        else:
+            self.__previous_abc_name = os.path.basename(previous_record["path"])
+            self.__previous_abc_layers = previous_record.get("layers", [])
+            self.__previous_abc_hash = previous_record.get("hash") or \
+                                       ContentHash.read_hash(previous_record["path"])
+
+    def __get_write_path(self, path):
+        """
+        Get the path where a publish file is written : its staging path, the path itself without staging
+        :param path: path in the asset folder
+        :return:
+        """
+        if not self.__staging:
+            return path
+        return self.__uploader.get_staged_path(self.__asset_dir, self.__asset_name, path)
+
+    def abc_export(self):
+        """
+        Export UV
+        :return:
+        """
+        os.makedirs(self.__abc_dir, exist_ok=True)
+        geo_list_to_export = [s.longName() for s in self.__selection]
+
+        # Skip the export if the geometry hasn't changed since the previous version
+        geometry_hash = ContentHash.hash_meshes(geo_list_to_export)
+        if self.__previous_abc_name is not None and self.__previous_abc_hash == geometry_hash:
+            abc_path = os.path.join(self.__abc_dir, self.__previous_abc_name).replace("\\", "/")
+            print("Model unchanged since %s" % PublishCore.get_version_label(abc_path))
+            self.__telemetry.count("unchanged_exports")
+            self.__abc_name = self.__previous_abc_name
+            abc_layers = self.__previous_abc_layers
+        else:
+            version, abc_path = self.__publish_index.reserve_version(
+                KIND_MODEL, "", lambda v: os.path.join(self.__abc_dir, "%s_mod.v%03d.abc" % (self.__asset_name, v)))
+            abc_path = abc_path.replace("\\", "/")
+            self.__abc_name = os.path.basename(abc_path)
+            write_path = self.__get_write_path(abc_path)
+            export = {"type": "abc", "job": PublishCore.abc_job(geo_list_to_export, write_path), "path": write_path,
+                      "hash": geometry_hash, "textures": [],
+                      "index": {"asset_dir": self.__asset_dir, "kind": KIND_MODEL, "look_name": "",
+                                "version": version}}
+            if self.__staging:
+                export["upload"] = {"path": abc_path}
+            abc_layers = []
+            chunks = self.__plan_model_chunks()
+            if len(chunks) > 0:
+                # The first chunk is the version file, the others are layered over it by the standin
+                base_path = os.path.splitext(abc_path)[0]
+                abc_layers = ["%s.layer%02d.abc" % (base_path, i) for i in range(1, len(chunks))]
+                chunk_paths = [write_path] + [self.__get_write_path(layer) for layer in abc_layers]
+                export["type"] = "abc_chunks"
+                export["layers"] = chunk_paths[1:]
+                if self.__staging:
+                    export["upload"]["layers"] = abc_layers
+                export["chunks"] = [{"type": "abc_chunk", "job": PublishCore.abc_job(chunk["roots"], chunk_path),
+                                     "prune": chunk["prune"], "path": chunk_path}
+                                    for chunk, chunk_path in zip(chunks, chunk_paths)]
+            if self.__background_export:
+                self.__deferred_exports.append(export)
+            else:
+                PublishCore.run_exports([export], self.__telemetry)
+
+        standin = pm.createNode("aiStandIn", n=self.__abc_name.split(".")[0] + "Shape")
+        parent = standin.getParent()
+        pm.rename(parent, self.__abc_name.split(".")[0])
+        standin.dso.set(abc_path)
+        if len(abc_layers) > 0:
+            if standin.hasAttr("abcLayers"):
+                standin.abcLayers.set(";".join(abc_layers))
+            else:
+                pm.warning("This MtoA version doesn't support alembic layers, the standin only loads %s" % abc_path)
+        return standin
+
+    def __plan_model_chunks(self):
+        """
+        Plan the chunks of the model if it is split
+        :return: the chunks, empty to export a single file
+        """
+        if self.__model_chunks < 2:
+            return []
+        from .batch_publish import find_mayapy
+        if find_mayapy() is None:
+            print("mayapy not found, the model is exported in a single file")
+            return []
+        chunks = PublishCore.plan_model_chunks(self.__selection, self.__model_chunks)
+        if len(chunks) == 0:
+            print("Not enough top level groups to split the model")
+        return chunks
+
+    def __collect_operators(self, sel, snapshot, empty_displacement_name=None):
+        """
+        Group the meshes of the selection by assignments and compute the selection expression of each group
+        :param sel
+        :param snapshot: MeshSnapshot of the selection, taken here if not given
+        :param empty_displacement_name: name given to the empty displacement shader of the shadingEngines mixed
+        with displaced ones. If None the shader is created in the scene and connected to these shadingEngines
+        :return: (list of (first mesh name, selection expression, assignments by index), names of the shaders used)
+        """
+        empty_displace = None
+        # shadingEngine name -> empty displacement shader name, for the shadingEngines left unconnected
+        empty_displacements = {}
+        shaders_used = []
+        if snapshot is None:
+            snapshot = MeshSnapshot([s.longName() for s in sel], self.__shading_index)
+        meshes = snapshot.get_records()
+        # Every shape path, ShapeOrig included, so that wildcards never match a shape outside of a group
+        all_paths = snapshot.get_all_selection_paths()
+
+        # Meshes grouped by their assignments : signature -> (first mesh name, list of selection paths, assignments)
+        groups = {}
+        for m in meshes:
+            selection = m.selection
+            sgs = [pm.PyNode(sg_name) for sg_name in m.sg_names]
+            assignments = {}
+
+            shader = ""
+            displacement_shader_string = ""
+            all_disp = None
+            shader_maya_disp = None
+            auto_bump = False
+            if len(sgs) == 1:
+                sg = sgs[0]
+                if sg.aiSurfaceShader.isConnected():
+                    shader_maya = sg.aiSurfaceShader.inputs()[0]
+                    shader += "'%s'" % shader_maya
+                    shaders_used.append(str(shader_maya))
+                elif sg.surfaceShader.isConnected():
+                    shader_maya = sg.surfaceShader.inputs()[0]
+                    shader += "'%s'" % shader_maya
+                    shaders_used.append(str(shader_maya))
+
+                if sg.displacementShader.isConnected():
+                    shader_maya_disp = sg.displacementShader.inputs()[0]
+                    displacement_shader_string = "'%s'" % shader_maya_disp
+                    shaders_used.append(str(shader_maya_disp))
+                elif sg.name() in empty_displacements:
+                    displacement_shader_string = "'%s'" % empty_displacements[sg.name()]
+            else:
+                all_disp = [sg.displacementShader for sg in sgs
+                            if sg.displacementShader.isConnected() or sg.name() in empty_displacements]
+                for sg in sgs:
+                    if sg.aiSurfaceShader.isConnected():
+                        shader_maya = sg.aiSurfaceShader.inputs()[0]
+                        shaders_used.append(str(shader_maya))
+                        shader += "'%s' " % shader_maya
+                    elif sg.surfaceShader.isConnected():
+                        shader_maya = sg.surfaceShader.inputs()[0]
+                        shaders_used.append(str(shader_maya))
+                        shader += "'%s' " % (sg.surfaceShader.inputs()[0])
+                    # Check if there is any displacement shader because if there is one, all sg will need a displacement
+                    # So if an object has two shaders one with a displace and one without, we will need to create an empty shaders
+                    # to make the operator per face assignement work
+                    if len(all_disp) > 0:
+                        if sg.displacementShader.isConnected():
+                            shader_maya = sg.displacementShader.inputs()[0]
+                            shaders_used.append(str(shader_maya))
+                            displacement_shader_string += "'%s' " % (sg.displacementShader.inputs()[0])
+                        elif empty_displacement_name is not None:
+                            empty_displacements[sg.name()] = empty_displacement_name
+                            displacement_shader_string += "'%s' " % empty_displacement_name
+                        else:
+                            if not empty_displace:
+                                empty_displace = pm.shadingNode("displacementShader", asShader=True)
+                            autobump_attr = empty_displace.attr("aiDisplacementAutoBump")
+                            autobump_attr.set(0)
+                            pm.connectAttr(empty_displace.displacement, sg.displacementShader)
+                            shaders_used.append(str(empty_displace))
+                            displacement_shader_string += "'%s' " % (empty_displace)
+
+            assignments[0] = "shader=%s" % (shader)
+            if displacement_shader_string != "":
+                assignments[1] = "disp_map=%s" % (displacement_shader_string)
+                if not all_disp and shader_maya_disp is not None \
+                        and shader_maya_disp.aiDisplacementAutoBump.get() == True:
+                    auto_bump = True
+                if auto_bump:
+                    assignments[2] = "bool disp_autobump=True"
+
+            # CATCLARK
+            sss_set_name = m.sss_set_name
+            ai_disp_height = m.disp_height
+            casts_shadows = m.casts_shadows
+            cat_clark_type = m.subdiv_type
+            cat_clark_subdiv = m.subdiv_iterations
+            if cat_clark_type > 0 and cat_clark_subdiv > 0:
+                assignments[3] = "subdiv_type='catclark'"
+                assignments[4] = "subdiv_iterations=%s" % (cat_clark_subdiv)
+            if sss_set_name != "":
+                assignments[5] = "string ai_sss_setname=\"%s\"" % (sss_set_name)
+            if casts_shadows == 0:
+                assignments[6] = "visibility=253"
+            if ai_disp_height != 1:
+                assignments[7] = "disp_height=%s" % (ai_disp_height)
+
+            signature = tuple(sorted(assignments.items()))
+            if signature not in groups:
+                groups[signature] = (m.name, [], assignments)
+            groups[signature][1].append(selection)
+
+        # One operator per group with a compact selection matching exactly its meshes
+        selection_tree = SelectionTree(all_paths)
+        members = {signature: selections for signature, (_, selections, _) in groups.items()}
+        expressions = selection_tree.compact_expressions(members)
+        for signature in SelectionTree.verify(expressions, members, all_paths):
+            print("Grouped selection mismatch for %s, using exact paths" % groups[signature][0])
+            expressions[signature] = " or ".join(members[signature])
+
+        print("%s meshes assigned with %s operators" % (len(meshes), len(groups)))
+        # Shaders are collected per mesh and per shading group
+        shaders_used = list(dict.fromkeys(shaders_used))
+        self.__telemetry.count("meshes", len(meshes))
+        self.__telemetry.count("operators", len(groups))
+        self.__telemetry.count("shaders", len(shaders_used))
+        operators = [(first_mesh, expressions[signature], assignments)
+                     for signature, (first_mesh, _, assignments) in groups.items()]
+        return operators, shaders_used
+
+    def build_shader_operator(self, standin, sel, snapshot=None):
+        """
+        Build shader for look
+        :param standin
+        :param sel
+        :param snapshot: MeshSnapshot of the selection, taken here if not given
+        :return:
+        """
+        # Get the selected objects
+        ai_merge = pm.createNode("aiMerge", n="aiMerge_%s" % standin.getParent().name())
+        pm.addAttr(ai_merge, ln="mtoa_constant_is_target", attributeType="bool", defaultValue=True)
+        pm.connectAttr(ai_merge + ".out", standin + ".operators[0]", f=True)
+        first_input = 0
+        if self.__uses_shader_library():
+            # The library path is set on the exported file once the library version is known
+            include_graph = pm.createNode("aiIncludeGraph", n="includeShaderLibrary_%s" % standin.getParent().name())
+            include_graph.attr("filename").set(LIBRARY_PLACEHOLDER)
+            pm.connectAttr(include_graph + ".out", ai_merge + ".inputs[0]", f=True)
+            first_input = 1
+        operators, shaders_used = self.__collect_operators(sel, snapshot)
+
+        for counter, (first_mesh, expression, assignments) in enumerate(operators):
+            set_shader = pm.createNode("aiSetParameter", n="setShader_" + first_mesh)
+            set_shader.attr("selection").set(expression)
+            pm.connectAttr(set_shader + ".out", ai_merge + ".inputs[%s]" % (first_input + counter), f=True)
+            for index, assignment in assignments.items():
+                pm.setAttr(set_shader + ".assignment[%s]" % index, assignment, type="string")
+        return shaders_used
+
+    def collect_shader_operator(self, standin, sel, snapshot=None):
+        """
+        Collect the operators of the look without creating any scene node, they are written in the look file by
+        AssOperatorWriter after the export of the shaders
+        :param standin
+        :param sel
+        :param snapshot: MeshSnapshot of the selection, taken here if not given
+        :return: (operator graph, names of the shaders used)
+        """
+        parent_name = standin.getParent().name()
+        empty_displacement_name = "emptyDisplacement_%s" % parent_name
+        operators, shaders_used = self.__collect_operators(sel, snapshot, empty_displacement_name)
+        graph = {"merge": "aiMerge_%s" % parent_name, "include_graph": None,
+                 "empty_displacement": None, "set_parameters": []}
+        if self.__uses_shader_library():
+            graph["include_graph"] = {"name": "includeShaderLibrary_%s" % parent_name, "filename": LIBRARY_PLACEHOLDER}
+        if any(empty_displacement_name in assignment
+               for _, _, assignments in operators for assignment in assignments.values()):
+            graph["empty_displacement"] = empty_displacement_name
+        names = set()
+        for first_mesh, expression, assignments in operators:
+            name = AssOperatorWriter.unique_name("setShader_" + first_mesh, names)
+            # Lists rather than dicts with int keys so that the graph survives the json of a background export
+            graph["set_parameters"].append({"name": name, "selection": expression,
+                                            "assignments": [assignments[index] for index in sorted(assignments)]})
+        return graph, shaders_used
+
+    def export_arnold_graph(self, standin, shaders_used, operators=None):
+        """
+        Export look
+        :param standin
+        :param shaders_used
+        :param operators: operator graph of collect_shader_operator, the operators of the standin are exported if None
+        :return:
+        """
+        look_dir = os.path.join(self.__asset_dir, "publish")
+        # Check if default look or special one
+        if len(self.__look_name) > 0:
+            look_dir = os.path.join(look_dir, "look", self.__look_name)
+        os.makedirs(look_dir, exist_ok=True)
+        if len(self.__look_name) > 0:
+            path_prefix = os.path.join(look_dir, self.__asset_name + "_"+ self.__look_name +"_operator.")
+        else:
+            path_prefix = os.path.join(look_dir, self.__asset_name + "_operator.")
+        ass_ext = "ass.gz" if self.__ass_compressed else "ass"
+        self.__publish_index.load()
+        previous_record = self.__publish_index.get_latest(KIND_LOOK, self.__look_name)
+        previous_path = None
+        previous_hash = None
+        if previous_record is not None:
+            previous_path = previous_record["path"]
+            previous_hash = previous_record.get("hash") or ContentHash.read_hash(previous_path)
+        version, path = self.__publish_index.reserve_version(KIND_LOOK, self.__look_name,
+                                                             lambda v: path_prefix + "v%03d.%s" % (v, ass_ext))
+        look = pm.listConnections(standin + ".operators") if operators is None else []
+        export_list = look + shaders_used
+        export = {"type": "ass", "nodes": [str(n) for n in export_list], "path": self.__get_write_path(path),
+                  "previous_path": previous_path, "previous_hash": previous_hash, "textures": self.__manifest_textures,
+                  "encoding": self.__ass_encoding, "compressed": self.__ass_compressed,
+                  "index": {"asset_dir": self.__asset_dir, "kind": KIND_LOOK, "look_name": self.__look_name,
+                            "version": version}}
+        if self.__staging:
+            export["upload"] = {"path": path}
+        if operators is not None:
+            export["operators"] = operators
+        # Binary ass files can't be parsed outside of Arnold
+        if self.__optimize_ass and self.__ass_encoding == ASS_ENCODING_ASCII:
+            export["optimize"] = True
+        if self.__texture_memory is not None:
+            export["texture_memory"] = self.__texture_memory
+        if self.__render_cost is not None:
+            export["render_cost"] = self.__render_cost
+        if self.__uses_shader_library():
+            export["shader_library"] = {"asset_dir": self.__asset_dir, "asset_name": self.__asset_name,
+                                        "staging": self.__staging}
+        if self.__background_export:
+            self.__deferred_exports.append(export)
+        else:
+            PublishCore.run_exports([export], self.__telemetry)
+
+    def __stage_retrieve_datas(self):
+        """
+        Stage retrieving the datas of the selection
+        :return:
+        """
+        self.__texture_resolver.new_pass()
+        self.__deferred_exports = []
+        self.__background_process = None
+        self.__background_log = None
+        self.__standin = None
+        self.__shaders_used = []
+        self.__operators = None
+        self.__texture_report = TextureMemoryReport()
+        self.__texture_memory = None
+        self.__render_cost = None
+        self.__manifest_textures = []
+        self.__initial_render_layer = None
+        self.__look_timings = {}
+        self.__mesh_snapshot = None
+        self.__mesh_snapshot_layer = None
+        render_layers = list(dict.fromkeys(layer for _, layer in self.__looks)) if self.__publish_look else [None]
+        if render_layers == [None]:
+            self.retrieve_datas()
+            return
+        # Textures of the looks of every render layer, converted and replaced once
+        self.retrieve_abc_dir_and_name()
+        texture_nodes = {}
+        for render_layer in render_layers:
+            self.__switch_look_layer(render_layer)
+            for texture_node in self.__retrieve_texture_nodes():
+                texture_nodes[texture_node.name()] = texture_node
+        self.__texture_node = list(texture_nodes.values())
+        self.__restore_render_layer()
+
+    def __stage_replace_texture_node_to_tx(self):
+        """
+        Stage replacing the textures by their tx
+        :return:
+        """
+        self.replace_texture_node_to_tx()
+        self.__manifest_textures = self.collect_manifest_textures()
+        self.__telemetry.count("stat_calls", self.__texture_resolver.get_stat_count())
+        print(f"Texture resolution : {self.__texture_resolver.get_stat_count()} filesystem calls")
+
+    def __stage_export_model(self):
+        """
+        Stage exporting the alembic (or creating a temporary standin if the model isn't published)
+        :return:
+        """
+        if self.__publish_uv:
+            self.__standin = self.abc_export()
+        else:
+            self.__standin = pm.createNode("aiStandIn", n="tmp_standin")
+
+    def __stage_build_shader_operator(self, look_name, render_layer):
+        """
+        Stage building the operators of a look. The meshes are read again when the look is in another render layer
+        than the last read : a layer can override their shadingEngines and their attributes
+        :param look_name
+        :param render_layer
+        :return:
+        """
+        start = time.time()
+        self.__look_name = look_name
+        self.__switch_look_layer(render_layer)
+        current_layer = PublishCore.get_current_render_layer()
+        if self.__mesh_snapshot is None or self.__mesh_snapshot_layer != current_layer:
+            self.__mesh_snapshot = MeshSnapshot([s.longName() for s in self.__selection], self.__shading_index)
+            self.__mesh_snapshot_layer = current_layer
+        if self.__direct_operators:
+            self.__operators, self.__shaders_used = self.collect_shader_operator(
+                self.__standin, self.__selection, self.__mesh_snapshot)
+        else:
+            self.__shaders_used = self.build_shader_operator(self.__standin, self.__selection, self.__mesh_snapshot)
+        self.__look_timings[look_name] = time.time() - start
+
+    def __stage_read_texture_headers(self):
+        """
+        Stage reading the headers of the texture files of the looks
+        :return:
+        """
+        paths = [file_entry["path"] for texture in self.__manifest_textures for file_entry in texture["files"]]
+        header_count = self.__texture_report.read_headers(paths)
+        self.__telemetry.count("texture_headers_read", header_count)
+
+    def build_texture_memory_report(self):
+        """
+        Build the texture memory report of the current look from the texture headers read, and warn if the look is
+        over the budget
+        :return: the report
+        """
+        files_by_node = {texture["node"]: [file_entry["path"] for file_entry in texture["files"]]
+                         for texture in self.__manifest_textures}
+        sg_names = {sg_name for record in self.__mesh_snapshot.get_records() for sg_name in record.sg_names}
+        shaders = {}
+        for sg_name in sg_names:
+            sg = pm.PyNode(sg_name)
+            shader_plugs = [plug for plug in (sg.aiSurfaceShader, sg.surfaceShader) if plug.isConnected()]
+            shader_name = str(shader_plugs[0].inputs()[0]) if len(shader_plugs) > 0 else sg_name
+            paths = shaders.setdefault(shader_name, [])
+            for texture_name in self.__shading_index.get_texture_nodes([sg_name]):
+                paths.extend(files_by_node.get(texture_name, []))
+        budget = self.__texture_budget if self.__texture_budget is not None \
+            else TextureMemoryReport.get_default_budget()
+        report = self.__texture_report.build(shaders, budget)
+        print(TextureMemoryReport.format_summary(report, self.__look_name))
+        self.__telemetry.count("texture_memory_bytes", report["total_bytes"])
+        if report["over_budget"]:
+            self.__telemetry.count("texture_budget_exceeded")
+            pm.warning("Look %s needs %.2f GB of textures, over the budget of %.2f GB" % (
+                self.__look_name or "default", report["total_bytes"] / 1024.0 ** 3, budget))
+        return report
+
+    def __stage_export_arnold_graph(self, look_name):
+        """
+        Stage exporting a look
+        :param look_name
+        :return:
+        """
+        start = time.time()
+        self.__texture_memory = self.build_texture_memory_report()
+        self.export_arnold_graph(self.__standin, self.__shaders_used, self.__operators)
+        self.__look_timings[look_name] += time.time() - start
+        print("Look %s : %.2fs" % (look_name or "default", self.__look_timings[look_name]))
+
+    def __stage_start_background_export(self):
+        """
+        Stage saving a copy of the scene and starting the deferred exports in a mayapy process.
+        Without mayapy the exports are run here
+        :return:
+        """
+        if len(self.__deferred_exports) == 0:
+            return
+        from .batch_publish import find_mayapy, start_export_worker
+        mayapy = find_mayapy()
+        if mayapy is None:
+            print("mayapy not found, exporting in the current session")
+            self.__run_deferred_exports()
+            return
+        tmp_scene = PublishCore.save_scene_copy("character_publisher")
+        self.__background_log = os.path.splitext(tmp_scene)[0] + ".log"
+        self.__background_process = start_export_worker(
+            {"scene": tmp_scene, "exports": self.__deferred_exports, "telemetry": self.__telemetry_path},
+            self.__background_log, mayapy)
+        print("Background export started (log : %s)" % self.__background_log)
+
+    def __stage_start_upload(self):
+        """
+        Stage starting the upload of the staged files in a thread. The files of a background export are uploaded by
+        its mayapy process
+        :return:
+        """
+        if self.__background_process is not None:
+            return
+        entries = [entry for entry in self.__uploader.get_entries(self.__asset_dir) if entry["status"] != STATUS_DONE]
+        self.__telemetry.count("uploads_queued", len(entries))
+        PublishUploader.start_worker()
+
+    def __run_deferred_exports(self):
+        """
+        Run the deferred exports in the current session
+        :return:
+        """
+        PublishCore.run_exports(self.__deferred_exports, self.__telemetry)
+        self.__deferred_exports = []
+
+    def get_stages(self, confirm_color_sets=None, confirm_render_cost=None):
+        """
+        Get the ordered stages of the publish. A stage returning False aborts the publish
+        :param confirm_color_sets: callback to confirm the publish when invalid color sets are found
+        :param confirm_render_cost: callback to confirm the publish when the render cost is over the thresholds
+        :return: list of (stage name, stage function)
+        """
+        stages = [
+            ("Retrieve datas", self.__stage_retrieve_datas),
+            ("Check color sets", partial(self.check_color_sets, "Pref", confirm_color_sets)),
+        ]
+        if self.__publish_look:
+            # The subdivision settings are published by the look operators
+            stages.append(("Check render cost", partial(self.check_render_cost, confirm_render_cost)))
+        stages += [
+            ("Generate TX", self.generate_missing_tx),
+            ("Replace TX", self.__stage_replace_texture_node_to_tx),
+            ("Export model" if self.__publish_uv else "Create standin", self.__stage_export_model),
+        ]
+        if self.__publish_look:
+            if self.__shader_library and not self.__uses_shader_library():
+                print("Shader library not used : binary look files can't be shared")
+            stages.append(("Read texture headers", self.__stage_read_texture_headers))
+            for look_name, render_layer in self.__looks:
+                suffix = " (%s)" % (look_name or "default") if len(self.__looks) > 1 else ""
+                stages.append(("Build operators" + suffix,
+                               partial(self.__stage_build_shader_operator, look_name, render_layer)))
+                stages.append(("Export look" + suffix, partial(self.__stage_export_arnold_graph, look_name)))
+            if any(render_layer is not None for _, render_layer in self.__looks):
+                stages.append(("Restore render layer", self.__restore_render_layer))
+        if self.__background_export:
+            stages.append(("Start background export", self.__stage_start_background_export))
+        if self.__staging:
+            stages.append(("Start upload", self.__stage_start_upload))
+
+        # A new telemetry log for this publish, each stage being a span
+        self.__telemetry = PublishTelemetry()
+        self.__telemetry.set_info(asset_name=self.__asset_name, asset_dir=self.__asset_dir,
+                                  maya_version=pm.about(version=True), publish_model=self.__publish_uv,
+                                  publish_look=self.__publish_look, looks=[look for look, _ in self.__looks],
+                                  model_chunks=self.__model_chunks, ass_encoding=self.__ass_encoding,
+                                  ass_compressed=self.__ass_compressed, shader_library=self.__uses_shader_library(),
+                                  direct_operators=self.__direct_operators, optimize_ass=self.__optimize_ass,
+                                  staging=self.__staging,
+                                  texture_budget=self.__texture_budget or TextureMemoryReport.get_default_budget(),
+                                  max_mesh_polygons=self.__max_mesh_polygons, max_polygons=self.__max_polygons,
+                                  background_export=self.__background_export, stages=[name for name, _ in stages])
+        self.__telemetry_path = os.path.join(
+            PublishTelemetry.log_dir(self.__asset_dir),
+            "%s_%s_%s.json" % (self.__asset_name, time.strftime("%Y%m%d_%H%M%S"), getpass.getuser()))
+        return [(name, partial(self.__run_stage, name, stage)) for name, stage in stages]
+
+    def __run_stage(self, name, stage):
+        """
+        Run a stage in a telemetry span
+        :param name
+        :param stage
+        :return: the result of the stage
+        """
+        with self.__telemetry.span(name):
+            return stage()
+
+    def end_publish(self, status):
+        """
+        Make the render layer visible before the publish visible again (a failed or aborted publish stops on the layer
+        of a look) and write the telemetry log of the publish
+        :param status
+        :return: the path of the log
+        """
+        try:
+            self.__restore_render_layer()
+        except Exception as e:
+            print("Render layer %s not restored : %s" % (self.__initial_render_layer, e))
+        if self.__telemetry_path is None:
+            return None
+        try:
+            self.__telemetry.write(self.__telemetry_path, status)
+        except OSError as e:
+            print("Telemetry log not written : %s" % e)
+            return None
+        print("Telemetry : %s" % self.__telemetry_path)
+        return self.__telemetry_path
+
+    def publish(self, confirm_color_sets=None, confirm_render_cost=None):
+        """
+        Publish the model and/or the look of the selection
+        :param confirm_color_sets: callback to confirm the publish when invalid color sets are found
+        :param confirm_render_cost: callback to confirm the publish when the render cost is over the thresholds
+        :return: whether the publish has been done
+        """
+        for name, stage in self.get_stages(confirm_color_sets, confirm_render_cost):
+            start = time.time()
+            try:
+                result = stage()
+            except Exception as e:
+                self.end_publish("failed at %s : %s" % (name, e))
+                raise
+            if result is False:
+                print("Publish aborted at stage %s" % name)
+                self.end_publish("aborted at %s" % name)
+                return False
+            print("%s : %.2fs" % (name, time.time() - start))
+        self.end_publish("done")
+        return True
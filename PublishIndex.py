@@ -0,0 +1,371 @@
+"""
+Index of the published versions of an asset, stored as an append-only json log in <asset>/publish
+
+Usage :
+    python PublishIndex.py rebuild ASSET_DIR
+    python PublishIndex.py latest ASSET_DIR model|look|library [--look-name NAME]
+"""
+
+import argparse
+import getpass
+import json
+import os
+import re
+import sys
+import time
+
+# ######################################################################################################################
+
+_INDEX_FILE_NAME = "publish_index.jsonl"
+_LOCK_TIMEOUT = 30
+_LOCK_STALE_DELAY = 120
+
+KIND_MODEL = "model"
+KIND_LOOK = "look"
+KIND_LIBRARY = "library"
+
+
+# ######################################################################################################################
+
+
+class PublishIndex:
+    @staticmethod
+    def __key(kind, look_name):
+        """
+        Get the key of a kind of publish
+        :param kind
+        :param look_name
+        :return:
+        """
+        return kind, look_name if kind == KIND_LOOK else ""
+
+    def __init__(self, asset_dir):
+        self.__asset_dir = asset_dir
+        self.__index_path = os.path.join(asset_dir, "publish", _INDEX_FILE_NAME)
+        self.__lock_path = self.__index_path + ".lock"
+        # Bytes of the log already read
+        self.__offset = 0
+        # (kind, look name) -> highest reserved version
+        self.__reserved = {}
+        # (kind, look name) -> {version: publish record}
+        self.__published = {}
+        # (kind, look name) -> latest publish record
+        self.__latest = {}
+
+    def get_index_path(self):
+        """
+        Getter of the path of the log
+        :return:
+        """
+        return self.__index_path
+
+    def exists(self):
+        """
+        Check if the log exists
+        :return:
+        """
+        return os.path.isfile(self.__index_path)
+
+    def load(self):
+        """
+        Load the log, it is created from the published files if it doesn't exist yet
+        :return:
+        """
+        if not self.exists():
+            self.__create()
+        self.__read_new_records()
+
+    def __create(self):
+        """
+        Create the log from the published files if it doesn't exist yet. The check is done under the lock so that an
+        existing log (and the versions reserved in it) is never replaced
+        :return:
+        """
+        os.makedirs(os.path.dirname(self.__index_path), exist_ok=True)
+        self.__acquire_lock()
+        try:
+            if not self.exists():
+                self.__write(self.__build_records())
+        finally:
+            self.__release_lock()
+
+    def __acquire_lock(self):
+        """
+        Acquire the lock of the log, a lock older than the stale delay is considered abandoned
+        :return:
+        """
+        start = time.time()
+        while True:
+            try:
+                fd = os.open(self.__lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.write(fd, ("%s %s" % (getpass.getuser(), os.getpid())).encode())
+                os.close(fd)
+                return
+            except FileExistsError:
+                if self.__break_stale_lock():
+                    continue
+                if time.time() - start > _LOCK_TIMEOUT:
+                    raise TimeoutError("Publish index locked : %s" % self.__lock_path)
+                time.sleep(0.1)
+
+    def __break_stale_lock(self):
+        """
+        Remove the lock if it is older than the stale delay. It is first renamed to a name of this process so that a
+        single process removes it, and given back if it turns out to be a lock taken in between
+        :return: whether the lock can be tried again right away
+        """
+        try:
+            if time.time() - os.path.getmtime(self.__lock_path) <= _LOCK_STALE_DELAY:
+                return False
+            stale_path = "%s.%s.%s.stale" % (self.__lock_path, getpass.getuser(), os.getpid())
+            os.rename(self.__lock_path, stale_path)
+        except OSError:
+            # Released or broken by another process
+            return True
+        try:
+            if time.time() - os.path.getmtime(stale_path) <= _LOCK_STALE_DELAY:
+                print("Publish index lock taken while breaking it, given back : %s" % self.__lock_path)
+                try:
+                    os.link(stale_path, self.__lock_path)
+                except OSError:
+                    pass
+            else:
+                print("Stale publish index lock removed : %s" % self.__lock_path)
+            os.remove(stale_path)
+        except OSError:
+            pass
+        return True
+
+    def __release_lock(self):
+        """
+        Release the lock of the log
+        :return:
+        """
+        try:
+            os.remove(self.__lock_path)
+        except OSError:
+            pass
+
+    def __apply(self, record):
+        """
+        Apply a record of the log to the in-memory index
+        :param record
+        :return:
+        """
+        key = PublishIndex.__key(record["kind"], record.get("look_name", ""))
+        version = record["version"]
+        if version > self.__reserved.get(key, 0):
+            self.__reserved[key] = version
+        if record["event"] == "publish":
+            self.__published.setdefault(key, {})[version] = record
+            if key not in self.__latest or version >= self.__latest[key]["version"]:
+                self.__latest[key] = record
+
+    def __read_new_records(self):
+        """
+        Read the records appended to the log since the last read
+        :return:
+        """
+        if not self.exists():
+            return
+        with open(self.__index_path, "rb") as f:
+            f.seek(self.__offset)
+            data = f.read()
+        # Only complete lines are read
+        end = data.rfind(b"\n") + 1
+        self.__offset += end
+        for line in data[:end].splitlines():
+            if line.strip():
+                self.__apply(json.loads(line))
+
+    def __append(self, record):
+        """
+        Append a record to the log (the lock must be held)
+        :param record
+        :return:
+        """
+        os.makedirs(os.path.dirname(self.__index_path), exist_ok=True)
+        with open(self.__index_path, "ab") as f:
+            f.write((json.dumps(record) + "\n").encode())
+        self.__read_new_records()
+
+    def reserve_version(self, kind, look_name, path_builder):
+        """
+        Reserve atomically the next version of a kind of publish
+        :param kind
+        :param look_name
+        :param path_builder: function giving the path of a version
+        :return: (version, path)
+        """
+        key = PublishIndex.__key(kind, look_name)
+        os.makedirs(os.path.dirname(self.__index_path), exist_ok=True)
+        self.__acquire_lock()
+        try:
+            if not self.exists():
+                self.__write(self.__build_records())
+            self.__read_new_records()
+            version = self.__reserved.get(key, 0) + 1
+            # Files written without the index
+            while os.path.exists(path_builder(version)):
+                version += 1
+            path = path_builder(version)
+            self.__append({"event": "reserve", "kind": key[0], "look_name": key[1], "version": version,
+                           "path": path, "user": getpass.getuser(), "timestamp": time.time()})
+        finally:
+            self.__release_lock()
+        return version, path
+
+    def commit(self, kind, look_name, version, path, content_hash=None, **extra):
+        """
+        Record a published version
+        :param kind
+        :param look_name
+        :param version
+        :param path
+        :param content_hash
+        :param extra: additional fields of the record
+        :return: the record
+        """
+        key = PublishIndex.__key(kind, look_name)
+        record = {"event": "publish", "kind": key[0], "look_name": key[1], "version": version, "path": path,
+                  "size": os.path.getsize(path) if os.path.isfile(path) else 0, "hash": content_hash,
+                  "user": getpass.getuser(), "timestamp": time.time()}
+        record.update(extra)
+        self.__acquire_lock()
+        try:
+            self.__append(record)
+        finally:
+            self.__release_lock()
+        return record
+
+    def get_latest(self, kind, look_name=""):
+        """
+        Get the record of the latest published version
+        :param kind
+        :param look_name
+        :return: the record or None
+        """
+        self.__read_new_records()
+        return self.__latest.get(PublishIndex.__key(kind, look_name))
+
+    def get_version(self, kind, look_name, version):
+        """
+        Get the record of a published version
+        :param kind
+        :param look_name
+        :param version
+        :return: the record or None
+        """
+        self.__read_new_records()
+        return self.__published.get(PublishIndex.__key(kind, look_name), {}).get(version)
+
+    def __scan_published_files(self):
+        """
+        Find the published files of the asset
+        :return: list of (kind, look name, version, path)
+        """
+        found = []
+        abc_dir = os.path.join(self.__asset_dir, "abc")
+        look_dirs = [("", os.path.join(self.__asset_dir, "publish"))]
+        look_root = os.path.join(self.__asset_dir, "publish", "look")
+        if os.path.isdir(look_root):
+            look_dirs += [(name, os.path.join(look_root, name)) for name in sorted(os.listdir(look_root))]
+        library_dir = os.path.join(self.__asset_dir, "publish", "library")
+        for kind, look_name, dir_path, regex in \
+                [(KIND_MODEL, "", abc_dir, r".*v([0-9]+)\.abc$"),
+                 (KIND_LIBRARY, "", library_dir, r".*_shader_library\.v([0-9]+)\.ass(\.gz)?$")] + \
+                [(KIND_LOOK, name, path, r".*_operator\.v([0-9]+)\.ass(\.gz)?$") for name, path in look_dirs]:
+            if not os.path.isdir(dir_path):
+                continue
+            for file in sorted(os.listdir(dir_path)):
+                match = re.match(regex, file)
+                path = os.path.join(dir_path, file)
+                if match and os.path.isfile(path):
+                    found.append((kind, look_name, int(match.group(1)), path))
+        return found
+
+    def __build_records(self):
+        """
+        Build the publish records of the published files
+        :return:
+        """
+        records = []
+        for kind, look_name, version, path in self.__scan_published_files():
+            content_hash = None
+            try:
+                with open(path + ".hash", "r") as f:
+                    content_hash = json.load(f).get("hash")
+            except (OSError, ValueError):
+                pass
+            stat = os.stat(path)
+            record = {"event": "publish", "kind": kind, "look_name": look_name, "version": version,
+                      "path": path, "size": stat.st_size, "hash": content_hash, "user": "",
+                      "timestamp": stat.st_mtime}
+            if kind == KIND_MODEL:
+                # Split model : the files layered over the version file
+                layer_regex = re.escape(os.path.splitext(os.path.basename(path))[0]) + r"\.layer[0-9]+\.abc$"
+                dir_path = os.path.dirname(path)
+                layers = [os.path.join(dir_path, file) for file in sorted(os.listdir(dir_path))
+                          if re.match(layer_regex, file)]
+                if len(layers) > 0:
+                    record["layers"] = layers
+            records.append(record)
+        return records
+
+    def __write(self, records):
+        """
+        Replace the log by records (the lock must be held)
+        :param records
+        :return:
+        """
+        tmp_path = self.__index_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            for record in records:
+                f.write((json.dumps(record) + "\n").encode())
+        os.replace(tmp_path, self.__index_path)
+        self.__offset = 0
+        self.__reserved = {}
+        self.__published = {}
+        self.__latest = {}
+        self.__read_new_records()
+
+    def rebuild(self):
+        """
+        Rebuild the log from the published files, replacing the existing one and the versions reserved in it
+        :return: number of versions found
+        """
+        os.makedirs(os.path.dirname(self.__index_path), exist_ok=True)
+        self.__acquire_lock()
+        try:
+            records = self.__build_records()
+            self.__write(records)
+        finally:
+            self.__release_lock()
+        return len(records)
+
+
+# ######################################################################################################################
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Publish index of an asset")
+    parser.add_argument("command", choices=["rebuild", "latest"])
+    parser.add_argument("asset_dir")
+    parser.add_argument("kind", nargs="?", choices=[KIND_MODEL, KIND_LOOK, KIND_LIBRARY], default=KIND_MODEL)
+    parser.add_argument("--look-name", default="")
+    args = parser.parse_args(argv)
+
+    publish_index = PublishIndex(args.asset_dir)
+    if args.command == "rebuild":
+        print("%s versions indexed in %s" % (publish_index.rebuild(), publish_index.get_index_path()))
+        return 0
+    record = publish_index.get_latest(args.kind, args.look_name)
+    if record is None:
+        print("No %s published" % args.kind)
+        return 1
+    print(json.dumps(record, indent=4))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+import getpass
+import json
+import os
+import time
+
+# ######################################################################################################################
+
+_MANIFEST_EXT = ".manifest.json"
+
+
+# ######################################################################################################################
+
+
+class PublishManifest:
+    """
+    Manifest written beside each published file, listing the textures it depends on
+    """
+
+    @staticmethod
+    def manifest_path(version_path):
+        """
+        Get the path of the manifest of a published file
+        :param version_path
+        :return:
+        """
+        if version_path.endswith(".gz"):
+            version_path = version_path[:-len(".gz")]
+        return os.path.splitext(version_path)[0] + _MANIFEST_EXT
+
+    @staticmethod
+    def describe_file(path):
+        """
+        Get the manifest entry of a file
+        :param path
+        :return:
+        """
+        try:
+            stat = os.stat(path)
+            size, mtime = stat.st_size, stat.st_mtime
+        except OSError:
+            size, mtime = None, None
+        return {"path": path.replace("\\", "/"), "size": size, "mtime": mtime, "tx": path.endswith(".tx")}
+
+    @staticmethod
+    def write(version_path, textures, **extra):
+        """
+        Write the manifest of a published file
+        :param version_path
+        :param textures: list of {"node": name, "path": path on the node, "files": [file entries]}
+        :param extra: additional fields of the manifest
+        :return: the manifest path
+        """
+        manifest = {
+            "file": PublishManifest.describe_file(version_path),
+            "user": getpass.getuser(),
+            "timestamp": time.time(),
+            "textures": textures,
+            "texture_count": sum(len(texture["files"]) for texture in textures),
+            "texture_size": sum(f["size"] or 0 for texture in textures for f in texture["files"]),
+        }
+        manifest.update(extra)
+        path = PublishManifest.manifest_path(version_path)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=4)
+        os.replace(tmp_path, path)
+        return path
+
+    @staticmethod
+    def read(path):
+        """
+        Read a manifest, from its path or from the path of its published file
+        :param path
+        :return:
+        """
+        if not path.endswith(_MANIFEST_EXT):
+            path = PublishManifest.manifest_path(path)
+        with open(path, "r") as f:
+            return json.load(f)
+
+    @staticmethod
+    def get_texture_files(manifest):
+        """
+        Get the unique texture file entries of a manifest
+        :param manifest
+        :return:
+        """
+        files = {}
+        for texture in manifest["textures"]:
+            for file_entry in texture["files"]:
+                files[file_entry["path"]] = file_entry
+        return list(files.values())
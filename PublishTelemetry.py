@@ -0,0 +1,147 @@
+import getpass
+import json
+import os
+import socket
+import time
+from contextlib import contextmanager
+
+# ######################################################################################################################
+
+# Directory of the telemetry logs of every asset, <asset>/publish/telemetry if not set
+TELEMETRY_DIR_ENV = "CHARACTER_PUBLISHER_TELEMETRY_DIR"
+
+
+# ######################################################################################################################
+
+
+class PublishTelemetry:
+    """
+    Timed spans of a publish carrying counters (meshes, texture nodes, bytes written...), written as a json log
+    """
+
+    @staticmethod
+    def log_dir(asset_dir):
+        """
+        Get the directory of the telemetry logs
+        :param asset_dir
+        :return:
+        """
+        return os.environ.get(TELEMETRY_DIR_ENV) or os.path.join(asset_dir, "publish", "telemetry")
+
+    @staticmethod
+    def __read(path):
+        """
+        Read a telemetry log
+        :param path
+        :return: the log, empty if it doesn't exist
+        """
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def __write(path, log):
+        """
+        Write a telemetry log atomically
+        :param path
+        :param log
+        :return:
+        """
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = "%s.%s.tmp" % (path, os.getpid())
+        with open(tmp_path, "w") as f:
+            json.dump(log, f, indent=4)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def append_spans(path, spans):
+        """
+        Add the spans of the background export to a telemetry log
+        :param path
+        :param spans
+        :return:
+        """
+        log = PublishTelemetry.__read(path)
+        log["background_spans"] = log.get("background_spans", []) + spans
+        PublishTelemetry.__write(path, log)
+
+    def __init__(self):
+        self.__start = time.time()
+        self.__info = {"user": getpass.getuser(), "host": socket.gethostname(), "timestamp": self.__start}
+        # Finished spans, in their end order
+        self.__spans = []
+        # Spans in progress, the innermost last
+        self.__stack = []
+
+    def set_info(self, **info):
+        """
+        Add fields describing the publish (asset, options, versions...)
+        :param info
+        :return:
+        """
+        self.__info.update(info)
+
+    @contextmanager
+    def span(self, name):
+        """
+        Time a span of the publish, the counters are added to the innermost span in progress
+        :param name
+        :return:
+        """
+        span = {"name": name, "parent": self.__stack[-1]["name"] if len(self.__stack) > 0 else None,
+                "start": round(time.time() - self.__start, 4), "duration": None, "counters": {}}
+        self.__stack.append(span)
+        start = time.time()
+        try:
+            yield span
+        except Exception as e:
+            span["error"] = str(e)
+            raise
+        finally:
+            span["duration"] = round(time.time() - start, 4)
+            self.__stack.remove(span)
+            self.__spans.append(span)
+
+    def count(self, counter, value=1):
+        """
+        Add to a counter of the span in progress (ignored outside of a span)
+        :param counter
+        :param value
+        :return:
+        """
+        if len(self.__stack) == 0:
+            return
+        counters = self.__stack[-1]["counters"]
+        counters[counter] = counters.get(counter, 0) + value
+
+    def get_spans(self):
+        """
+        Getter of the finished spans
+        :return:
+        """
+        return self.__spans
+
+    def get_totals(self):
+        """
+        Get the sum of each counter over all the spans
+        :return:
+        """
+        totals = {}
+        for span in self.__spans:
+            for counter, value in span["counters"].items():
+                totals[counter] = totals.get(counter, 0) + value
+        return totals
+
+    def write(self, path, status):
+        """
+        Write the log of the publish, keeping the background spans already written
+        :param path
+        :param status
+        :return:
+        """
+        log = PublishTelemetry.__read(path)
+        log.update({"info": self.__info, "status": status, "duration": round(time.time() - self.__start, 4),
+                    "spans": self.__spans, "totals": self.get_totals()})
+        PublishTelemetry.__write(path, log)
@@ -0,0 +1,520 @@
+"""
+Upload of the published files from the local staging directory to the asset folder. Each published version is an
+entry of a queue stored in the staging directory, so the uploads interrupted by a crash or a restart of Maya are
+resumed by the next session
+
+Usage :
+    python -m character_publisher.PublishUploader status [--asset-dir DIR]
+    python -m character_publisher.PublishUploader run
+    python -m character_publisher.PublishUploader retry [ENTRY_ID]
+"""
+
+import argparse
+import getpass
+import hashlib
+import json
+import os
+import socket
+import sys
+import threading
+import time
+
+from .PublishIndex import PublishIndex
+from .PublishManifest import PublishManifest
+
+# ######################################################################################################################
+
+# Local directory where the publish files are written before their upload
+STAGING_DIR_ENV = "CHARACTER_PUBLISHER_STAGING_DIR"
+_DEFAULT_STAGING_DIR = os.path.join(os.path.expanduser("~"), "character_publisher", "staging")
+_QUEUE_DIR_NAME = "queue"
+
+STATUS_PENDING = "pending"
+STATUS_UPLOADING = "uploading"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+_MAX_ATTEMPTS = 5
+# Delay before the first retry in seconds, doubled after each failure
+_RETRY_DELAY = 10
+# An entry locked for longer without progress is considered abandoned by its process
+_LOCK_STALE_DELAY = 300
+_COPY_CHUNK_SIZE = 8 * 1024 * 1024
+# Uploaded entries are listed for a week
+_DONE_KEEP_DELAY = 7 * 24 * 3600
+
+
+# ######################################################################################################################
+
+
+class PublishUploader:
+    """
+    Queue of the uploads of the staged publish files. A file is copied next to its target, the copy is checked
+    against the checksum of the staged file and renamed into place. The version is recorded in the publish index once
+    all its files are uploaded, so a half-written version is never seen as the latest one
+    """
+
+    __worker = None
+    __worker_lock = threading.Lock()
+    __wake_event = threading.Event()
+
+    @staticmethod
+    def get_staging_dir():
+        """
+        Get the staging directory (CHARACTER_PUBLISHER_STAGING_DIR env or default)
+        :return:
+        """
+        return os.environ.get(STAGING_DIR_ENV) or _DEFAULT_STAGING_DIR
+
+    @staticmethod
+    def checksum(path):
+        """
+        Get the sha256 of a file
+        :param path
+        :return:
+        """
+        file_hash = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(_COPY_CHUNK_SIZE), b""):
+                file_hash.update(chunk)
+        return file_hash.hexdigest()
+
+    @staticmethod
+    def format_status(entry):
+        """
+        Get a readable status of an entry
+        :param entry
+        :return:
+        """
+        status = entry["status"]
+        if status == STATUS_UPLOADING or (status == STATUS_PENDING and len(entry["uploaded"]) > 0):
+            status = "uploading %s/%s files" % (len(entry["uploaded"]), len(entry["files"]))
+        elif status == STATUS_PENDING and entry["attempts"] > 0:
+            status = "retry %s/%s (%s)" % (entry["attempts"] + 1, _MAX_ATTEMPTS, entry["error"])
+        elif status == STATUS_FAILED:
+            status = "failed (%s)" % entry["error"]
+        elif status == STATUS_DONE:
+            status = "uploaded"
+        return "%s : %s" % (entry["label"], status)
+
+    @staticmethod
+    def start_worker(staging_dir=None):
+        """
+        Start the thread uploading the queue in the background, or wake it up if it is running. The thread ends once
+        no entry is left to upload
+        :param staging_dir
+        :return:
+        """
+        with PublishUploader.__worker_lock:
+            worker = PublishUploader.__worker
+            if worker is not None and worker.is_alive():
+                PublishUploader.__wake_event.set()
+                return worker
+            uploader = PublishUploader(staging_dir, verbose=False)
+            worker = threading.Thread(target=uploader.__run_worker, name="PublishUploader", daemon=True)
+            PublishUploader.__worker = worker
+            worker.start()
+            return worker
+
+    def __init__(self, staging_dir=None, verbose=True):
+        self.__staging_dir = staging_dir or PublishUploader.get_staging_dir()
+        self.__queue_dir = os.path.join(self.__staging_dir, _QUEUE_DIR_NAME)
+        self.__verbose = verbose
+        # Entry file -> ((inode, mtime, size), entry) of the entries already read. An entry is saved by a rename so
+        # each save changes the inode
+        self.__entry_cache = {}
+
+    def __log(self, message):
+        """
+        Print a message unless the uploader is quiet (background thread)
+        :param message
+        :return:
+        """
+        if self.__verbose:
+            print(message)
+
+    def get_staged_path(self, asset_dir, asset_name, path):
+        """
+        Get the staging path of a file of the asset folder, its directory is created
+        :param asset_dir
+        :param asset_name
+        :param path: path in the asset folder
+        :return:
+        """
+        # Assets of the same name in different projects don't share their staging directory
+        asset_key = "%s_%s" % (asset_name, hashlib.sha1(os.path.normpath(asset_dir).encode()).hexdigest()[:8])
+        staged_path = os.path.join(self.__staging_dir, asset_key, os.path.relpath(path, asset_dir))
+        os.makedirs(os.path.dirname(staged_path), exist_ok=True)
+        return staged_path.replace("\\", "/")
+
+    def __entry_path(self, entry_id):
+        """
+        Get the path of the file of an entry
+        :param entry_id
+        :return:
+        """
+        return os.path.join(self.__queue_dir, entry_id + ".json")
+
+    def __save_entry(self, entry):
+        """
+        Write an entry atomically
+        :param entry
+        :return:
+        """
+        entry["updated"] = time.time()
+        path = self.__entry_path(entry["id"])
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(entry, f, indent=4)
+        os.replace(tmp_path, path)
+
+    def __read_entry(self, entry_id):
+        """
+        Read an entry
+        :param entry_id
+        :return: the entry or None if it doesn't exist
+        """
+        try:
+            with open(self.__entry_path(entry_id), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def enqueue(self, label, asset_dir, files, commit, requires=None):
+        """
+        Add the upload of a published version to the queue
+        :param label: name of the version displayed to the user
+        :param asset_dir
+        :param files: list of (staged path, target path), the version file last so it appears once complete
+        :param commit: {"manifest": {"path", "textures", "fields"}, "index": {"asset_dir", "kind", "look_name",
+        "version", "path", "hash", "extra"}}, written once the files are uploaded
+        :param requires: ids of the entries to upload first (shader library included by a look)
+        :return: the entry
+        """
+        os.makedirs(self.__queue_dir, exist_ok=True)
+        entry_id = "%s_%s_%s" % (time.strftime("%Y%m%d_%H%M%S"), os.getpid(),
+                                 hashlib.sha1(files[-1][1].encode()).hexdigest()[:8])
+        entry = {"id": entry_id, "label": label, "asset_dir": asset_dir, "status": STATUS_PENDING,
+                 "files": [{"staged": staged, "target": target, "size": os.path.getsize(staged),
+                            "checksum": PublishUploader.checksum(staged)} for staged, target in files],
+                 "uploaded": [], "committed": False, "commit": commit, "requires": requires or [], "attempts": 0,
+                 "error": None, "next_attempt": 0, "user": getpass.getuser(), "host": socket.gethostname(),
+                 "created": time.time()}
+        self.__save_entry(entry)
+        self.__log("Upload of %s queued (%s files)" % (label, len(files)))
+        return entry
+
+    def get_entries(self, asset_dir=None):
+        """
+        Get the entries of the queue, oldest first. Only the entry files changed since the last call are read
+        :param asset_dir: only the entries of this asset if given
+        :return:
+        """
+        if not os.path.isdir(self.__queue_dir):
+            return []
+        entries = []
+        entry_cache = {}
+        for dir_entry in os.scandir(self.__queue_dir):
+            if not dir_entry.name.endswith(".json"):
+                continue
+            try:
+                stat = dir_entry.stat()
+            except OSError:
+                continue
+            key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            cached = self.__entry_cache.get(dir_entry.name)
+            if cached is not None and cached[0] == key:
+                entry = cached[1]
+            else:
+                entry = self.__read_entry(dir_entry.name[:-len(".json")])
+                if entry is None:
+                    continue
+            entry_cache[dir_entry.name] = (key, entry)
+            if asset_dir is not None and os.path.normpath(entry["asset_dir"]) != os.path.normpath(asset_dir):
+                continue
+            entries.append(entry)
+        self.__entry_cache = entry_cache
+        entries.sort(key=lambda entry: entry["created"])
+        return entries
+
+    def has_pending(self):
+        """
+        Check if some entries are waiting for their upload
+        :return:
+        """
+        return any(entry["status"] in (STATUS_PENDING, STATUS_UPLOADING) for entry in self.get_entries())
+
+    def retry(self, entry_id=None):
+        """
+        Queue again the failed entries
+        :param entry_id: only this entry if given
+        :return: number of entries queued again
+        """
+        count = 0
+        for entry in self.get_entries():
+            if entry["status"] != STATUS_FAILED or (entry_id is not None and entry["id"] != entry_id):
+                continue
+            entry.update(status=STATUS_PENDING, attempts=0, next_attempt=0)
+            self.__save_entry(entry)
+            count += 1
+        return count
+
+    def process_queue(self, wait=False):
+        """
+        Upload the entries of the queue whose attempt is due
+        :param wait: wait for the retries until no entry is left to upload
+        :return: (number of entries uploaded, number of entries failed)
+        """
+        done = 0
+        failed = 0
+        while True:
+            now = time.time()
+            next_attempt = None
+            entries = self.get_entries()
+            statuses = {entry["id"]: entry["status"] for entry in entries}
+            for entry in entries:
+                if entry["status"] == STATUS_DONE:
+                    if now - entry["updated"] > _DONE_KEEP_DELAY:
+                        try:
+                            os.remove(self.__entry_path(entry["id"]))
+                        except OSError:
+                            pass
+                    continue
+                if entry["status"] == STATUS_FAILED:
+                    continue
+                if entry["next_attempt"] > now:
+                    next_attempt = min(next_attempt or entry["next_attempt"], entry["next_attempt"])
+                    continue
+                # Entries removed from the queue have been uploaded
+                required = [statuses.get(entry_id, STATUS_DONE) for entry_id in entry.get("requires", [])]
+                if STATUS_FAILED in required:
+                    status = self.__fail_entry(entry["id"], "upload of a required version failed")
+                elif any(status != STATUS_DONE for status in required):
+                    next_attempt = min(next_attempt or now + 1, now + 1)
+                    continue
+                else:
+                    status = self.__process_entry(entry["id"])
+                statuses[entry["id"]] = status or STATUS_UPLOADING
+                if status == STATUS_DONE:
+                    done += 1
+                elif status == STATUS_FAILED:
+                    failed += 1
+                elif status == STATUS_PENDING:
+                    next_attempt = now
+                elif status is None:
+                    # Uploaded by another process or thread, checked again in a second
+                    next_attempt = min(next_attempt or now + 1, now + 1)
+            if not wait or next_attempt is None:
+                return done, failed
+            time.sleep(max(0.0, next_attempt - time.time()))
+
+    def __run_worker(self):
+        """
+        Loop of the background thread
+        :return:
+        """
+        while True:
+            PublishUploader.__wake_event.clear()
+            try:
+                self.process_queue()
+            except OSError:
+                # Staging directory unreachable, the entries are resumed later
+                pass
+            entries = [entry for entry in self.get_entries()
+                       if entry["status"] in (STATUS_PENDING, STATUS_UPLOADING)]
+            if len(entries) == 0:
+                with PublishUploader.__worker_lock:
+                    if not PublishUploader.__wake_event.is_set():
+                        PublishUploader.__worker = None
+                        return
+                continue
+            delay = min(entry["next_attempt"] for entry in entries) - time.time()
+            PublishUploader.__wake_event.wait(min(max(delay, 1.0), _RETRY_DELAY))
+
+    def __acquire_entry(self, entry_id):
+        """
+        Lock an entry so a single process uploads it, a lock without progress for too long is considered abandoned
+        :param entry_id
+        :return: whether the lock has been acquired
+        """
+        lock_path = self.__entry_path(entry_id) + ".lock"
+        for _ in range(2):
+            try:
+                fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.write(fd, ("%s %s %s" % (getpass.getuser(), socket.gethostname(), os.getpid())).encode())
+                os.close(fd)
+                return True
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(lock_path) <= _LOCK_STALE_DELAY:
+                        return False
+                    os.remove(lock_path)
+                except OSError:
+                    return False
+        return False
+
+    def __touch_entry_lock(self, entry_id):
+        """
+        Mark the progress of the upload of an entry
+        :param entry_id
+        :return:
+        """
+        try:
+            os.utime(self.__entry_path(entry_id) + ".lock")
+        except OSError:
+            pass
+
+    def __release_entry(self, entry_id):
+        """
+        Unlock an entry
+        :param entry_id
+        :return:
+        """
+        try:
+            os.remove(self.__entry_path(entry_id) + ".lock")
+        except OSError:
+            pass
+
+    def __process_entry(self, entry_id):
+        """
+        Upload the files of an entry and record its version
+        :param entry_id
+        :return: the status of the entry, None if it is locked by another process
+        """
+        if not self.__acquire_entry(entry_id):
+            return None
+        try:
+            # Read again under the lock, another process may have uploaded it
+            entry = self.__read_entry(entry_id)
+            if entry is None or entry["status"] in (STATUS_DONE, STATUS_FAILED):
+                return entry["status"] if entry is not None else STATUS_DONE
+            entry["status"] = STATUS_UPLOADING
+            entry["attempts"] += 1
+            self.__save_entry(entry)
+            try:
+                for file_entry in entry["files"]:
+                    if file_entry["target"] in entry["uploaded"]:
+                        continue
+                    self.__upload_file(entry_id, file_entry)
+                    entry["uploaded"].append(file_entry["target"])
+                    self.__save_entry(entry)
+                if not entry["committed"]:
+                    PublishUploader.__commit(entry["commit"])
+                    entry["committed"] = True
+                    self.__save_entry(entry)
+            except (OSError, ValueError) as e:
+                entry["error"] = str(e)
+                if entry["attempts"] >= _MAX_ATTEMPTS:
+                    entry["status"] = STATUS_FAILED
+                    self.__log("Upload of %s failed : %s" % (entry["label"], e))
+                else:
+                    entry["status"] = STATUS_PENDING
+                    entry["next_attempt"] = time.time() + _RETRY_DELAY * 2 ** (entry["attempts"] - 1)
+                    self.__log("Upload of %s interrupted, retry %s/%s : %s"
+                               % (entry["label"], entry["attempts"] + 1, _MAX_ATTEMPTS, e))
+                self.__save_entry(entry)
+                return entry["status"]
+            for file_entry in entry["files"]:
+                try:
+                    os.remove(file_entry["staged"])
+                except OSError:
+                    pass
+            entry["status"] = STATUS_DONE
+            entry["error"] = None
+            self.__save_entry(entry)
+            self.__log("%s uploaded (%s files, %.1f MB)" % (
+                entry["label"], len(entry["files"]), sum(f["size"] for f in entry["files"]) / 1024.0 ** 2))
+            return STATUS_DONE
+        finally:
+            self.__release_entry(entry_id)
+
+    def __fail_entry(self, entry_id, error):
+        """
+        Mark an entry waiting for its upload as failed
+        :param entry_id
+        :param error
+        :return: the status of the entry, None if it is locked by another process
+        """
+        if not self.__acquire_entry(entry_id):
+            return None
+        try:
+            entry = self.__read_entry(entry_id)
+            if entry is None:
+                return STATUS_DONE
+            if entry["status"] == STATUS_PENDING:
+                entry.update(status=STATUS_FAILED, error=error)
+                self.__save_entry(entry)
+                self.__log("Upload of %s failed : %s" % (entry["label"], error))
+            return entry["status"]
+        finally:
+            self.__release_entry(entry_id)
+
+    def __upload_file(self, entry_id, file_entry):
+        """
+        Copy a staged file next to its target, check the copy and rename it into place
+        :param entry_id
+        :param file_entry
+        :return:
+        """
+        target = file_entry["target"]
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp_path = "%s.upload%s" % (target, os.getpid())
+        try:
+            source_hash = hashlib.sha256()
+            with open(file_entry["staged"], "rb") as f_in, open(tmp_path, "wb") as f_out:
+                for chunk in iter(lambda: f_in.read(_COPY_CHUNK_SIZE), b""):
+                    source_hash.update(chunk)
+                    f_out.write(chunk)
+                    self.__touch_entry_lock(entry_id)
+                f_out.flush()
+                os.fsync(f_out.fileno())
+            if source_hash.hexdigest() != file_entry["checksum"]:
+                raise ValueError("Staged file modified since its export : %s" % file_entry["staged"])
+            # The copy is read back from the share
+            if PublishUploader.checksum(tmp_path) != file_entry["checksum"]:
+                raise ValueError("Checksum mismatch of the copy of %s" % os.path.basename(target))
+            os.replace(tmp_path, target)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    @staticmethod
+    def __commit(commit):
+        """
+        Write the manifest of an uploaded version and record it in the publish index
+        :param commit
+        :return:
+        """
+        manifest = commit.get("manifest")
+        if manifest is not None:
+            PublishManifest.write(manifest["path"], manifest["textures"], **manifest["fields"])
+        index = commit.get("index")
+        if index is not None:
+            PublishIndex(index["asset_dir"]).commit(index["kind"], index["look_name"], index["version"],
+                                                    index["path"], index["hash"], **index["extra"])
+
+
+# ######################################################################################################################
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Upload queue of the staged publish files")
+    parser.add_argument("command", choices=["status", "run", "retry"])
+    parser.add_argument("entry_id", nargs="?", default=None, help="entry to queue again (retry)")
+    parser.add_argument("--asset-dir", default=None, help="only the entries of this asset (status)")
+    args = parser.parse_args(argv)
+
+    uploader = PublishUploader()
+    if args.command == "status":
+        for entry in uploader.get_entries(args.asset_dir):
+            print("%s  %s" % (entry["id"], PublishUploader.format_status(entry)))
+        return 0
+    if args.command == "retry":
+        print("%s entries queued again" % uploader.retry(args.entry_id))
+    done, failed = uploader.process_queue(wait=True)
+    print("%s versions uploaded, %s failed" % (done, failed))
+    return 0 if failed == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+import os
+
+try:
+    import numpy as np
+except ImportError:
+    # Not shipped with every mayapy version
+    np = None
+
+# ######################################################################################################################
+
+# Polygons after subdivision over which the publish warns, for a single mesh and for the whole character
+MAX_MESH_POLYGONS_ENV = "CHARACTER_PUBLISHER_MAX_MESH_POLYGONS"
+MAX_POLYGONS_ENV = "CHARACTER_PUBLISHER_MAX_POLYGONS"
+_DEFAULT_MAX_MESH_POLYGONS = 10 * 1000 ** 2
+_DEFAULT_MAX_POLYGONS = 100 * 1000 ** 2
+# Arnold subdivision types (aiSubdivType)
+SUBDIV_NONE = 0
+SUBDIV_CATCLARK = 1
+SUBDIV_LINEAR = 2
+# Estimated memory of a tessellated quad : a vertex (position, normal, uv) and the vertex, normal and uv indices of
+# its 4 corners
+_BYTES_PER_POLYGON = 80
+# Most expensive meshes listed in the report
+_WORST_COUNT = 20
+_GB = 1024 ** 3
+
+
+# ######################################################################################################################
+
+
+class RenderCostReport:
+    """
+    Render cost of the meshes of a character : polygons once tessellated by Arnold (subdivision iterations) and their
+    estimated memory, per mesh and for the whole character, computed on NumPy arrays and compared to thresholds
+    """
+
+    @staticmethod
+    def is_available():
+        """
+        Check if NumPy can be imported
+        :return:
+        """
+        return np is not None
+
+    @staticmethod
+    def get_default_thresholds():
+        """
+        Get the polygon thresholds (CHARACTER_PUBLISHER_MAX_MESH_POLYGONS and CHARACTER_PUBLISHER_MAX_POLYGONS env or
+        defaults)
+        :return: (max polygons of a mesh, max polygons of the character)
+        """
+        thresholds = []
+        for env, default in ((MAX_MESH_POLYGONS_ENV, _DEFAULT_MAX_MESH_POLYGONS),
+                             (MAX_POLYGONS_ENV, _DEFAULT_MAX_POLYGONS)):
+            try:
+                thresholds.append(int(float(os.environ.get(env, default))))
+            except ValueError:
+                thresholds.append(default)
+        return tuple(thresholds)
+
+    @staticmethod
+    def compute_polygons(face_counts, face_vertex_counts, subdiv_types, subdiv_iterations):
+        """
+        Get the polygons of meshes after subdivision. The first iteration splits each face in as many quads as it has
+        vertices, the next ones split each quad in 4
+        :param face_counts: array of the face counts
+        :param face_vertex_counts: array of the face-vertex counts (sum of the vertices of each face)
+        :param subdiv_types: array of the aiSubdivType
+        :param subdiv_iterations: array of the aiSubdivIterations
+        :return: float array of the polygon counts
+        """
+        iterations = np.maximum(subdiv_iterations, 0)
+        subdivided = (subdiv_types != SUBDIV_NONE) & (iterations > 0)
+        # Float to keep the extreme iteration counts from overflowing
+        split = face_vertex_counts * np.power(4.0, np.maximum(iterations - 1, 0))
+        return np.where(subdivided, split, face_counts.astype(np.float64))
+
+    @staticmethod
+    def build(records, displaced_sg_names, max_mesh_polygons, max_polygons):
+        """
+        Build the report of the meshes of a character
+        :param records: MeshRecord of the meshes
+        :param displaced_sg_names: shadingEngines with a displacement shader
+        :param max_mesh_polygons
+        :param max_polygons
+        :return: dict of the report
+        """
+        count = len(records)
+        names = np.array([record.long_name for record in records], dtype=object)
+        face_counts = np.fromiter((record.face_count for record in records), dtype=np.int64, count=count)
+        face_vertex_counts = np.fromiter((record.face_vertex_count for record in records), dtype=np.int64,
+                                         count=count)
+        subdiv_types = np.fromiter((record.subdiv_type for record in records), dtype=np.int32, count=count)
+        subdiv_iterations = np.fromiter((record.subdiv_iterations for record in records), dtype=np.int32,
+                                        count=count)
+        displaced = np.fromiter((record.disp_height != 0 and any(sg in displaced_sg_names for sg in record.sg_names)
+                                 for record in records), dtype=bool, count=count)
+
+        polygons = RenderCostReport.compute_polygons(face_counts, face_vertex_counts, subdiv_types, subdiv_iterations)
+        subdivided = (subdiv_types != SUBDIV_NONE) & (subdiv_iterations > 0)
+        total = int(polygons.sum())
+        over_mesh = np.flatnonzero(polygons > max_mesh_polygons)
+        worst = np.argsort(-polygons, kind="stable")[:_WORST_COUNT]
+        return {
+            "meshes": count,
+            "faces": int(face_counts.sum()),
+            "polygons": total,
+            "bytes": total * _BYTES_PER_POLYGON,
+            "max_mesh_polygons": max_mesh_polygons,
+            "max_polygons": max_polygons,
+            "over_budget": total > max_polygons or len(over_mesh) > 0,
+            "subdivided": int(np.count_nonzero(subdivided)),
+            "displaced": int(np.count_nonzero(displaced)),
+            # Displacement of the base faces only, usually a forgotten subdivision
+            "displaced_without_subdiv": names[displaced & ~subdivided].tolist(),
+            "over_mesh": names[over_mesh[np.argsort(-polygons[over_mesh], kind="stable")]].tolist(),
+            "worst": [{"mesh": names[i], "faces": int(face_counts[i]), "subdiv_type": int(subdiv_types[i]),
+                       "subdiv_iterations": int(subdiv_iterations[i]), "polygons": int(polygons[i]),
+                       "bytes": int(polygons[i]) * _BYTES_PER_POLYGON} for i in worst if polygons[i] > 0],
+        }
+
+    @staticmethod
+    def format_summary(report):
+        """
+        Get a readable summary of a report
+        :param report
+        :return:
+        """
+        lines = ["Render cost of %s meshes : %s faces, %s polygons after subdivision (max %s), about %.2f GB" % (
+            report["meshes"], format(report["faces"], ","), format(report["polygons"], ","),
+            format(report["max_polygons"], ","), report["bytes"] / _GB)]
+        for entry in report["worst"][:5]:
+            lines.append("  %s : %s faces, subdiv %s x%s -> %s polygons, %.2f GB" % (
+                entry["mesh"], format(entry["faces"], ","), entry["subdiv_type"], entry["subdiv_iterations"],
+                format(entry["polygons"], ","), entry["bytes"] / _GB))
+        if len(report["over_mesh"]) > 0:
+            lines.append("  %s meshes over %s polygons" % (len(report["over_mesh"]),
+                                                          format(report["max_mesh_polygons"], ",")))
+        if len(report["displaced_without_subdiv"]) > 0:
+            lines.append("  %s displaced meshes without subdivision" % len(report["displaced_without_subdiv"]))
+        return "\n".join(lines)
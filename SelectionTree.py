@@ -0,0 +1,221 @@
+import re
+
+
+# ######################################################################################################################
+
+
+class SelectionNode:
+    """
+    Node of a SelectionTree
+    """
+    __slots__ = ("children", "path_count", "is_path", "member_counts", "member_children", "groups")
+
+    def __init__(self):
+        # Children by name
+        self.children = {}
+        # Number of paths under the node, itself included
+        self.path_count = 0
+        # Whether the node is itself one of the paths
+        self.is_path = False
+        # Group -> number of its members under the node, itself included
+        self.member_counts = {}
+        # Group -> (name, child) of the children holding its members
+        self.member_children = {}
+        # Groups of which the node is a member
+        self.groups = set()
+
+
+# ######################################################################################################################
+
+
+class SelectionTree:
+    """
+    Prefix tree over "/" separated paths used to compute compact Arnold selection expressions matching exactly a
+    subset of the paths : a node whose descendants are all members of a group is matched by "node/*"
+    """
+
+    @staticmethod
+    def __normalize(path):
+        """
+        Get a path with a single leading "/"
+        :param path
+        :return:
+        """
+        return "/" + path.strip("/")
+
+    @staticmethod
+    def expression_to_regex(expression):
+        """
+        Convert an Arnold selection expression (paths and * wildcards joined by "or") to a regex
+        :param expression
+        :return:
+        """
+        patterns = [re.escape(part).replace("\\*", ".*") for part in expression.split(" or ")]
+        return re.compile("^(?:" + "|".join(patterns) + ")$")
+
+    @staticmethod
+    def verify(expressions_by_group, members_by_group, paths):
+        """
+        Check that each expression matches exactly the members of its group among the paths. The exact paths and the
+        "path/*" terms are looked up on the ancestors of each path, the other expressions are matched as regex
+        :param expressions_by_group
+        :param members_by_group
+        :param paths
+        :return: list of the groups whose expression doesn't match their members
+        """
+        # Term -> groups using it
+        exact_terms = {}
+        prefix_terms = {}
+        regex_groups = {}
+        for group, expression in expressions_by_group.items():
+            for term in expression.split(" or "):
+                if "*" not in term:
+                    exact_terms.setdefault(SelectionTree.__normalize(term), set()).add(group)
+                elif term.endswith("/*") and "*" not in term[:-2]:
+                    prefix_terms.setdefault(SelectionTree.__normalize(term[:-2]) if term != "/*" else "",
+                                            set()).add(group)
+                else:
+                    regex_groups[group] = SelectionTree.expression_to_regex(expression)
+        group_by_member = {}
+        for group, members in members_by_group.items():
+            for member in members:
+                group_by_member[SelectionTree.__normalize(member)] = group
+
+        invalid_groups = set()
+        matched_counts = dict.fromkeys(expressions_by_group, 0)
+        for path in dict.fromkeys(SelectionTree.__normalize(path) for path in paths):
+            matched = set(exact_terms.get(path, ()))
+            position = path.rfind("/")
+            while position >= 0:
+                matched.update(prefix_terms.get(path[:position], ()))
+                position = path.rfind("/", 0, position)
+            matched.update(group for group, regex in regex_groups.items() if regex.match(path))
+            expected = group_by_member.get(path)
+            for group in matched:
+                matched_counts[group] += 1
+                if group != expected:
+                    invalid_groups.add(group)
+            if expected is not None and expected not in matched:
+                invalid_groups.add(expected)
+        # Members missing from the paths
+        for group in expressions_by_group:
+            if matched_counts[group] != len(set(members_by_group[group])):
+                invalid_groups.add(group)
+        return [group for group in expressions_by_group if group in invalid_groups]
+
+    def __init__(self, paths):
+        self.__root = SelectionNode()
+        for path in paths:
+            self.__add(path)
+
+    def __add(self, path):
+        """
+        Add a path to the tree
+        :param path
+        :return:
+        """
+        node = self.__root
+        node.path_count += 1
+        for name in path.strip("/").split("/"):
+            child = node.children.get(name)
+            if child is None:
+                child = node.children[name] = SelectionNode()
+            node = child
+            node.path_count += 1
+        node.is_path = True
+
+    def __find(self, path):
+        """
+        Find the node of a path
+        :param path
+        :return: the node or None
+        """
+        node = self.__root
+        for name in path.strip("/").split("/"):
+            node = node.children.get(name)
+            if node is None:
+                return None
+        return node
+
+    def __count_members(self, members_by_group):
+        """
+        Count the members of every group under each node, each member being added once to its ancestors
+        :param members_by_group
+        :return: the nodes holding members
+        """
+        counted = []
+        for group, members in members_by_group.items():
+            # In the order of the members so that the expression is the same from one publish to the next
+            for member in dict.fromkeys(members):
+                member_node = self.__find(member)
+                if member_node is None or not member_node.is_path:
+                    continue
+                member_node.groups.add(group)
+                parent = None
+                node = self.__root
+                for name in [None] + member.strip("/").split("/"):
+                    if name is not None:
+                        parent, node = node, node.children[name]
+                    if len(node.member_counts) == 0:
+                        counted.append(node)
+                    if group not in node.member_counts:
+                        node.member_counts[group] = 0
+                        if parent is not None:
+                            parent.member_children.setdefault(group, []).append((name, node))
+                    node.member_counts[group] += 1
+        return counted
+
+    def __collect(self, node, node_path, group, expressions):
+        """
+        Collect the terms of the highest nodes whose descendants are all members of a group
+        :param node
+        :param node_path
+        :param group
+        :param expressions
+        :return:
+        """
+        count = node.member_counts.get(group, 0)
+        if count == 0:
+            return
+        is_member = group in node.groups
+        if is_member:
+            expressions.append(node_path)
+        below_paths = node.path_count - (1 if node.is_path else 0)
+        below_members = count - (1 if is_member else 0)
+        if below_paths == 0 or below_members == 0:
+            return
+        # A single path is kept exact
+        if below_members == below_paths and below_paths > 1:
+            expressions.append(node_path + "/*")
+            return
+        for name, child in node.member_children[group]:
+            self.__collect(child, node_path + "/" + name, group, expressions)
+
+    def compact_expressions(self, members_by_group):
+        """
+        Get the expressions matching exactly the members of each group among the paths of the tree.
+        Members must be paths of the tree
+        :param members_by_group: dict group -> member paths
+        :return: dict group -> expression
+        """
+        counted = self.__count_members(members_by_group)
+        try:
+            expressions = {}
+            for group in members_by_group:
+                terms = []
+                self.__collect(self.__root, "", group, terms)
+                expressions[group] = " or ".join(terms)
+            return expressions
+        finally:
+            for node in counted:
+                node.member_counts = {}
+                node.member_children = {}
+                node.groups = set()
+
+    def compact_expression(self, members):
+        """
+        Get the expression matching exactly some members among the paths of the tree
+        :param members
+        :return:
+        """
+        return self.compact_expressions({None: members})[None]
@@ -0,0 +1,130 @@
+import os
+
+from .AssFile import AssFile
+from .ContentHash import ContentHash
+from .PublishIndex import PublishIndex, KIND_LIBRARY
+from .PublishUploader import PublishUploader, STATUS_PENDING, STATUS_UPLOADING
+
+# ######################################################################################################################
+
+# Filename of the include_graph operator until the library version is known
+LIBRARY_PLACEHOLDER = "__SHADER_LIBRARY__"
+
+
+# ######################################################################################################################
+
+
+class ShaderLibrary:
+    """
+    Versioned ass file of the shading networks shared by the looks of an asset, in <asset>/publish/library.
+    A look file keeps only its operators and includes a library version with an include_graph operator.
+    A look whose networks differ from the latest library (new or edited shaders) writes a new library version
+    with its networks replacing the previous ones : the looks already published keep their own library version
+    """
+
+    @staticmethod
+    def __is_look_node(node):
+        """
+        Check if a node stays in the look file
+        :param node
+        :return:
+        """
+        return node.is_operator() or node.type.startswith("color_manager")
+
+    def __init__(self, asset_dir, asset_name):
+        self.__asset_dir = asset_dir
+        self.__asset_name = asset_name
+        self.__library_dir = os.path.join(asset_dir, "publish", "library")
+
+    def __library_path(self, version, compressed):
+        """
+        Get the path of a library version
+        :param version
+        :param compressed
+        :return:
+        """
+        ext = "ass.gz" if compressed else "ass"
+        return os.path.join(self.__library_dir, "%s_shader_library.v%03d.%s" % (self.__asset_name, version, ext))
+
+    def __get_latest_library(self, publish_index, staging):
+        """
+        Get the latest library version, with staging the staged versions still waiting for their upload included :
+        they are only recorded in the index once uploaded
+        :param publish_index
+        :param staging
+        :return: (path of the version, path to read it from, id of its upload entry if pending) or None
+        """
+        latest_record = publish_index.get_latest(KIND_LIBRARY)
+        latest = None
+        if latest_record is not None:
+            latest = (latest_record["version"], latest_record["path"], latest_record["path"], None)
+        for entry in PublishUploader().get_entries(self.__asset_dir) if staging else []:
+            index = entry["commit"].get("index") or {}
+            if index.get("kind") != KIND_LIBRARY or entry["status"] not in (STATUS_PENDING, STATUS_UPLOADING):
+                continue
+            if latest is None or index["version"] > latest[0]:
+                # The staged file is removed once uploaded
+                staged_path = entry["files"][-1]["staged"]
+                read_path = staged_path if os.path.isfile(staged_path) else index["path"]
+                latest = (index["version"], index["path"], read_path, entry["id"])
+        return latest[1:] if latest is not None else None
+
+    def share(self, look_path, staging=False):
+        """
+        Move the shading networks of an exported look file to the library and include the library in the look
+        :param look_path
+        :param staging: write a new library version to the staging directory and queue its upload
+        :return: (the path of the library version included, the id of its upload entry if it isn't uploaded yet)
+        """
+        look = AssFile.read(look_path)
+        include_nodes = [node for node in look.nodes
+                         if node.type == "include_graph" and LIBRARY_PLACEHOLDER in (node.get_param("filename") or "")]
+        if len(include_nodes) == 0:
+            print("No shader library include in %s, look kept self-contained" % look_path)
+            return None, None
+        look_shaders = [node for node in look.nodes if not ShaderLibrary.__is_look_node(node)]
+
+        publish_index = PublishIndex(self.__asset_dir)
+        publish_index.load()
+        latest = self.__get_latest_library(publish_index, staging)
+        library_nodes = []
+        upload_id = None
+        if latest is not None and os.path.isfile(latest[1]):
+            library_nodes = AssFile.read(latest[1]).nodes
+        library_hashes = {node.name: node.content_hash() for node in library_nodes}
+        changed = [node for node in look_shaders if library_hashes.get(node.name) != node.content_hash()]
+
+        if latest is not None and len(library_hashes) > 0 and len(changed) == 0:
+            library_path, _, upload_id = latest
+            print("Shader library %s reused (%s nodes)" % (os.path.basename(library_path), len(look_shaders)))
+        else:
+            # The networks of the look replace the ones of the same name
+            look_names = {node.name for node in look_shaders}
+            nodes = [node for node in library_nodes if node.name not in look_names] + look_shaders
+            compressed = look_path.endswith(".gz")
+            os.makedirs(self.__library_dir, exist_ok=True)
+            version, library_path = publish_index.reserve_version(
+                KIND_LIBRARY, "", lambda v: self.__library_path(v, compressed))
+            uploader = PublishUploader() if staging else None
+            write_path = library_path if uploader is None else \
+                uploader.get_staged_path(self.__asset_dir, self.__asset_name, library_path)
+            AssFile(look.header, nodes).write(write_path)
+            library_hash = ContentHash.hash_ass_file(write_path)
+            ContentHash.write_hash(write_path, library_hash)
+            extra = {"node_count": len(nodes), "compressed": compressed}
+            if uploader is None:
+                publish_index.commit(KIND_LIBRARY, "", version, library_path, library_hash, **extra)
+            else:
+                # Recorded in the index once uploaded, the looks including it are uploaded after it
+                files = [(ContentHash.hash_path(write_path), ContentHash.hash_path(library_path)),
+                         (write_path, library_path)]
+                upload_id = uploader.enqueue("library v%03d" % version, self.__asset_dir, files, {
+                    "index": {"asset_dir": self.__asset_dir, "kind": KIND_LIBRARY, "look_name": "", "version": version,
+                              "path": library_path, "hash": library_hash, "extra": extra}})["id"]
+            print("Shader library v%03d written : %s nodes, %s new or changed" % (version, len(nodes), len(changed)))
+
+        for node in include_nodes:
+            node.set_param("filename", '"%s"' % library_path.replace("\\", "/"))
+        look.nodes = [node for node in look.nodes if ShaderLibrary.__is_look_node(node)]
+        look.write(look_path)
+        return library_path, upload_id
@@ -0,0 +1,212 @@
+import maya.OpenMaya as OpenMaya
+
+# ######################################################################################################################
+
+_TEXTURE_NODE_TYPES = ("file", "aiImage")
+
+
+# ######################################################################################################################
+
+
+class ShadingNetworkIndex:
+    """
+    Index of the texture nodes upstream of each shadingEngine and of the shadingEngines of each shape.
+    Entries are computed lazily with dependency graph iterators and kept up to date with DG callbacks so only
+    the shadingEngines touched by a change are walked again
+    """
+
+    @staticmethod
+    def __get_mobject(name):
+        """
+        Get the MObject of a node by its name
+        :param name
+        :return: the MObject or None
+        """
+        sel = OpenMaya.MSelectionList()
+        try:
+            sel.add(name)
+        except RuntimeError:
+            return None
+        obj = OpenMaya.MObject()
+        sel.getDependNode(0, obj)
+        return obj
+
+    @staticmethod
+    def __get_name(obj):
+        """
+        Get the unique name of a node (full path for dag nodes)
+        :param obj
+        :return:
+        """
+        if obj.hasFn(OpenMaya.MFn.kDagNode):
+            return OpenMaya.MFnDagNode(obj).fullPathName()
+        return OpenMaya.MFnDependencyNode(obj).name()
+
+    def __init__(self):
+        # shadingEngine hash -> list of texture node handles
+        self.__textures_by_sg = {}
+        # shape hash -> list of shadingEngine handles
+        self.__sgs_by_shape = {}
+        self.__callbacks = []
+
+    def clear(self):
+        """
+        Clear the whole index
+        :return:
+        """
+        self.__textures_by_sg.clear()
+        self.__sgs_by_shape.clear()
+
+    def add_callbacks(self):
+        """
+        Add the DG callbacks keeping the index up to date. As changes may have been missed without them,
+        the index is cleared
+        :return:
+        """
+        if len(self.__callbacks) > 0:
+            return
+        self.clear()
+        self.__callbacks = [
+            OpenMaya.MDGMessage.addNodeAddedCallback(self.__on_node_added, "shadingEngine"),
+            OpenMaya.MDGMessage.addNodeRemovedCallback(self.__on_node_removed, "shadingEngine"),
+            OpenMaya.MDGMessage.addNodeRemovedCallback(self.__on_node_removed, "mesh"),
+            OpenMaya.MDGMessage.addConnectionCallback(self.__on_connection_changed),
+        ]
+
+    def remove_callbacks(self):
+        """
+        Remove the DG callbacks
+        :return:
+        """
+        for callback in self.__callbacks:
+            OpenMaya.MMessage.removeCallback(callback)
+        self.__callbacks = []
+
+    def __on_node_added(self, node, client_data):
+        """
+        On shadingEngine added : make sure no stale entry remains for it
+        :param node
+        :param client_data
+        :return:
+        """
+        self.__textures_by_sg.pop(OpenMaya.MObjectHandle(node).hashCode(), None)
+
+    def __on_node_removed(self, node, client_data):
+        """
+        On shadingEngine or mesh removed
+        :param node
+        :param client_data
+        :return:
+        """
+        node_hash = OpenMaya.MObjectHandle(node).hashCode()
+        self.__textures_by_sg.pop(node_hash, None)
+        self.__sgs_by_shape.pop(node_hash, None)
+
+    def __on_connection_changed(self, src_plug, dst_plug, made, client_data):
+        """
+        On connection made or broken : invalidate the shape of the source and the shadingEngines downstream
+        :param src_plug
+        :param dst_plug
+        :param made
+        :param client_data
+        :return:
+        """
+        src_node = src_plug.node()
+        if src_node.hasFn(OpenMaya.MFn.kDagNode):
+            self.__sgs_by_shape.pop(OpenMaya.MObjectHandle(src_node).hashCode(), None)
+        if len(self.__textures_by_sg) == 0:
+            return
+        dst_node = dst_plug.node()
+        if dst_node.hasFn(OpenMaya.MFn.kShadingEngine):
+            self.__textures_by_sg.pop(OpenMaya.MObjectHandle(dst_node).hashCode(), None)
+            return
+        if dst_node.hasFn(OpenMaya.MFn.kDagNode):
+            return
+        it = OpenMaya.MItDependencyGraph(dst_node, OpenMaya.MFn.kShadingEngine,
+                                         OpenMaya.MItDependencyGraph.kDownstream,
+                                         OpenMaya.MItDependencyGraph.kBreadthFirst,
+                                         OpenMaya.MItDependencyGraph.kNodeLevel)
+        while not it.isDone():
+            self.__textures_by_sg.pop(OpenMaya.MObjectHandle(it.currentItem()).hashCode(), None)
+            it.next()
+
+    def __compute_textures(self, sg_obj):
+        """
+        Walk the upstream graph of a shadingEngine to find its texture nodes
+        :param sg_obj
+        :return: list of texture node handles
+        """
+        textures = []
+        fn_node = OpenMaya.MFnDependencyNode()
+        it = OpenMaya.MItDependencyGraph(sg_obj, OpenMaya.MFn.kInvalid,
+                                         OpenMaya.MItDependencyGraph.kUpstream,
+                                         OpenMaya.MItDependencyGraph.kDepthFirst,
+                                         OpenMaya.MItDependencyGraph.kNodeLevel)
+        while not it.isDone():
+            node = it.currentItem()
+            # Geometry is upstream of the shadingEngine through its members, it is not part of the shading
+            if node.hasFn(OpenMaya.MFn.kDagNode):
+                it.prune()
+            else:
+                fn_node.setObject(node)
+                if fn_node.typeName() in _TEXTURE_NODE_TYPES:
+                    textures.append(OpenMaya.MObjectHandle(node))
+            it.next()
+        return textures
+
+    def __compute_shading_engines(self, shape_obj):
+        """
+        Find the shadingEngines connected to a shape
+        :param shape_obj
+        :return: list of shadingEngine handles
+        """
+        sgs = []
+        sg_hashes = set()
+        plugs = OpenMaya.MPlugArray()
+        OpenMaya.MFnDependencyNode(shape_obj).getConnections(plugs)
+        for i in range(plugs.length()):
+            dst_plugs = OpenMaya.MPlugArray()
+            plugs[i].connectedTo(dst_plugs, False, True)
+            for j in range(dst_plugs.length()):
+                dst_node = dst_plugs[j].node()
+                if not dst_node.hasFn(OpenMaya.MFn.kShadingEngine):
+                    continue
+                handle = OpenMaya.MObjectHandle(dst_node)
+                if handle.hashCode() not in sg_hashes:
+                    sg_hashes.add(handle.hashCode())
+                    sgs.append(handle)
+        return sgs
+
+    def get_texture_nodes(self, sg_names):
+        """
+        Get the texture nodes upstream of shadingEngines, only the changed shadingEngines are walked
+        :param sg_names
+        :return: list of unique texture node names
+        """
+        texture_names = {}
+        for sg_name in sg_names:
+            sg_obj = ShadingNetworkIndex.__get_mobject(sg_name)
+            if sg_obj is None:
+                continue
+            sg_hash = OpenMaya.MObjectHandle(sg_obj).hashCode()
+            if sg_hash not in self.__textures_by_sg:
+                self.__textures_by_sg[sg_hash] = self.__compute_textures(sg_obj)
+            for handle in self.__textures_by_sg[sg_hash]:
+                if handle.isValid():
+                    texture_names[ShadingNetworkIndex.__get_name(handle.object())] = None
+        return list(texture_names)
+
+    def get_shading_engines(self, shape_name):
+        """
+        Get the shadingEngines connected to a shape
+        :param shape_name
+        :return: list of shadingEngine names
+        """
+        shape_obj = ShadingNetworkIndex.__get_mobject(shape_name)
+        if shape_obj is None:
+            return []
+        shape_hash = OpenMaya.MObjectHandle(shape_obj).hashCode()
+        if shape_hash not in self.__sgs_by_shape:
+            self.__sgs_by_shape[shape_hash] = self.__compute_shading_engines(shape_obj)
+        return [ShadingNetworkIndex.__get_name(handle.object())
+                for handle in self.__sgs_by_shape[shape_hash] if handle.isValid()]
@@ -0,0 +1,119 @@
+"""
+Warm a local texture cache from publish manifests, before a render job starts
+
+Usage :
+    python TextureCache.py MANIFEST [MANIFEST ...] --cache-dir DIR [--workers 8]
+"""
+
+import argparse
+import os
+import shutil
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+try:
+    from .PublishManifest import PublishManifest
+except ImportError:
+    # Run as a script on the render nodes
+    from PublishManifest import PublishManifest
+
+# ######################################################################################################################
+
+_DEFAULT_WORKERS = 8
+
+
+# ######################################################################################################################
+
+
+class TextureCache:
+    def __init__(self, cache_dir):
+        self.__cache_dir = cache_dir
+
+    def get_cache_path(self, path):
+        """
+        Get the path of a texture in the cache (the source path without its drive or share root)
+        :param path
+        :return:
+        """
+        path = path.replace("\\", "/")
+        drive, path = os.path.splitdrive(path)
+        return os.path.join(self.__cache_dir, drive.replace(":", "").strip("/"), path.lstrip("/"))
+
+    def is_cached(self, file_entry):
+        """
+        Check if a texture is already in the cache with the same size and mtime
+        :param file_entry
+        :return:
+        """
+        try:
+            stat = os.stat(self.get_cache_path(file_entry["path"]))
+        except OSError:
+            return False
+        return stat.st_size == file_entry["size"] and int(stat.st_mtime) == int(file_entry["mtime"])
+
+    def __copy(self, file_entry):
+        """
+        Copy a texture to the cache atomically
+        :param file_entry
+        :return: (path, error or None)
+        """
+        cache_path = self.get_cache_path(file_entry["path"])
+        tmp_path = cache_path + ".%s.tmp" % os.getpid()
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            shutil.copy2(file_entry["path"], tmp_path)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return file_entry["path"], str(e)
+        return file_entry["path"], None
+
+    def warm(self, manifests, workers=_DEFAULT_WORKERS, progress_callback=None):
+        """
+        Copy the textures of manifests missing from the cache
+        :param manifests
+        :param workers
+        :param progress_callback: called with (done, total, path)
+        :return: (number of copied files, dict of the errors by path)
+        """
+        files = {}
+        for manifest in manifests:
+            for file_entry in PublishManifest.get_texture_files(manifest):
+                if file_entry["size"] is not None:
+                    files[file_entry["path"]] = file_entry
+        to_copy = [file_entry for file_entry in files.values() if not self.is_cached(file_entry)]
+        errors = {}
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            futures = [executor.submit(self.__copy, file_entry) for file_entry in to_copy]
+            for done, future in enumerate(as_completed(futures), start=1):
+                path, error = future.result()
+                if error is not None:
+                    errors[path] = error
+                if progress_callback is not None:
+                    progress_callback(done, len(to_copy), path)
+        return len(to_copy) - len(errors), errors
+
+
+# ######################################################################################################################
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Warm a local texture cache from publish manifests")
+    parser.add_argument("manifests", nargs="+", help="manifests or published files")
+    parser.add_argument("--cache-dir", required=True)
+    parser.add_argument("--workers", type=int, default=_DEFAULT_WORKERS)
+    args = parser.parse_args(argv)
+
+    manifests = [PublishManifest.read(path) for path in args.manifests]
+    copied, errors = TextureCache(args.cache_dir).warm(manifests, args.workers)
+    for path, error in errors.items():
+        print("Copy failed for %s : %s" % (path, error))
+    print("%s textures copied to %s, %s failed" % (copied, args.cache_dir, len(errors)))
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,267 @@
+import math
+import struct
+
+# ######################################################################################################################
+
+# TIFF tags
+_TIFF_WIDTH = 256
+_TIFF_HEIGHT = 257
+_TIFF_BITS_PER_SAMPLE = 258
+_TIFF_SAMPLES_PER_PIXEL = 277
+_TIFF_TILE_WIDTH = 322
+# Size of each TIFF field type
+_TIFF_TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 6: 1, 7: 1, 8: 2, 9: 4, 10: 8, 11: 4, 12: 8, 16: 8, 17: 8, 18: 8}
+# Sub images read at most, a 64k TX has 17 mip levels
+_TIFF_MAX_LEVELS = 64
+
+_EXR_MAGIC = 20000630
+_EXR_PIXEL_BYTES = {0: 4, 1: 2, 2: 4}
+_EXR_ONE_LEVEL = 0
+_EXR_MIPMAP_LEVELS = 1
+_EXR_RIPMAP_LEVELS = 2
+# Headers larger than this are not read (very large custom metadata)
+_EXR_MAX_HEADER = 1 << 20
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+_PNG_CHANNELS = {0: 1, 2: 3, 3: 3, 4: 2, 6: 4}
+
+# JPEG start of frame markers (baseline, progressive...), not DHT / JPG / DAC
+_JPEG_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+# ######################################################################################################################
+
+
+class TextureHeader:
+    """
+    Reader of the headers of the texture files (TX/TIFF, EXR, PNG, JPEG) : resolution, channels, bit depth and the
+    resolution of each stored mip level. Only the header bytes are read
+    """
+
+    @staticmethod
+    def read(path):
+        """
+        Read the header of a texture file
+        :param path
+        :return: dict {"format", "width", "height", "channels", "bits", "levels": [(width, height)], "tiled"},
+        None if the format isn't supported
+        :raise OSError, ValueError if the file can't be read
+        """
+        with open(path, "rb") as f:
+            magic = f.read(8)
+            f.seek(0)
+            if magic[:4] in (b"II*\x00", b"MM\x00*", b"II+\x00", b"MM\x00+"):
+                return TextureHeader.__read_tiff(f)
+            if len(magic) >= 4 and struct.unpack("<i", magic[:4])[0] == _EXR_MAGIC:
+                return TextureHeader.__read_exr(f)
+            if magic == _PNG_SIGNATURE:
+                return TextureHeader.__read_png(f)
+            if magic[:2] == b"\xff\xd8":
+                return TextureHeader.__read_jpeg(f)
+        return None
+
+    @staticmethod
+    def get_bytes(header):
+        """
+        Get the memory needed by all the stored levels of a texture once decoded
+        :param header
+        :return:
+        """
+        pixel_bytes = header["channels"] * max(1, header["bits"] // 8)
+        return sum(width * height for width, height in header["levels"]) * pixel_bytes
+
+    @staticmethod
+    def __unpack(f, fmt, size):
+        """
+        Read and unpack bytes
+        :param f
+        :param fmt
+        :param size
+        :return:
+        """
+        data = f.read(size)
+        if len(data) < size:
+            raise ValueError("Truncated header")
+        return struct.unpack(fmt, data)
+
+    @staticmethod
+    def __read_tiff(f):
+        """
+        Read the directories of a TIFF (or BigTIFF) file, maketx stores each mip level in its own directory
+        :param f
+        :return:
+        """
+        order = "<" if f.read(2) == b"II" else ">"
+        version = TextureHeader.__unpack(f, order + "H", 2)[0]
+        big = version == 43
+        if big:
+            TextureHeader.__unpack(f, order + "HH", 4)
+            offset = TextureHeader.__unpack(f, order + "Q", 8)[0]
+        else:
+            offset = TextureHeader.__unpack(f, order + "I", 4)[0]
+        count_fmt, count_size = ("Q", 8) if big else ("H", 2)
+        entry_fmt, entry_size = ("HHQ8s", 20) if big else ("HHI4s", 12)
+        inline_size = 8 if big else 4
+        directories = []
+        while offset != 0 and len(directories) < _TIFF_MAX_LEVELS:
+            f.seek(offset)
+            entry_count = TextureHeader.__unpack(f, order + count_fmt, count_size)[0]
+            entries = f.read(entry_count * entry_size)
+            tags = {}
+            for i in range(entry_count):
+                tag, field_type, count, value = struct.unpack_from(order + entry_fmt, entries, i * entry_size)
+                if tag not in (_TIFF_WIDTH, _TIFF_HEIGHT, _TIFF_BITS_PER_SAMPLE, _TIFF_SAMPLES_PER_PIXEL,
+                               _TIFF_TILE_WIDTH):
+                    continue
+                value_size = _TIFF_TYPE_SIZES.get(field_type, 1)
+                if value_size * count > inline_size:
+                    # Only the first value is needed (all the samples have the same depth in a texture)
+                    position = f.tell()
+                    f.seek(struct.unpack(order + ("Q" if big else "I"), value)[0])
+                    value = f.read(value_size)
+                    f.seek(position)
+                value_fmt = {1: "B", 3: "H", 4: "I", 16: "Q"}.get(field_type, "I")
+                tags[tag] = struct.unpack_from(order + value_fmt, value.ljust(8, b"\x00"))[0]
+            directories.append(tags)
+            offset = TextureHeader.__unpack(f, order + ("Q" if big else "I"), 8 if big else 4)[0]
+        if len(directories) == 0 or _TIFF_WIDTH not in directories[0]:
+            raise ValueError("No image in the TIFF file")
+        first = directories[0]
+        return {"format": "tiff", "width": first[_TIFF_WIDTH], "height": first.get(_TIFF_HEIGHT, 1),
+                "channels": first.get(_TIFF_SAMPLES_PER_PIXEL, 1), "bits": first.get(_TIFF_BITS_PER_SAMPLE, 8),
+                "levels": [(tags.get(_TIFF_WIDTH, 1), tags.get(_TIFF_HEIGHT, 1)) for tags in directories],
+                "tiled": _TIFF_TILE_WIDTH in first}
+
+    @staticmethod
+    def __read_exr(f):
+        """
+        Read the header attributes of an EXR file (first part of a multipart file)
+        :param f
+        :return:
+        """
+        f.seek(8)
+        data = f.read(_EXR_MAX_HEADER)
+        position = 0
+        attributes = {}
+        while True:
+            end = data.index(b"\x00", position)
+            name = data[position:end].decode("latin-1")
+            if name == "":
+                break
+            type_end = data.index(b"\x00", end + 1)
+            size = struct.unpack_from("<i", data, type_end + 1)[0]
+            value_start = type_end + 5
+            attributes[name] = data[value_start:value_start + size]
+            position = value_start + size
+        if "channels" not in attributes or "dataWindow" not in attributes:
+            raise ValueError("Incomplete EXR header")
+
+        channels = 0
+        bits = 0
+        chlist = attributes["channels"]
+        position = 0
+        while position < len(chlist) and chlist[position:position + 1] != b"\x00":
+            end = chlist.index(b"\x00", position)
+            pixel_type = struct.unpack_from("<i", chlist, end + 1)[0]
+            channels += 1
+            bits = max(bits, _EXR_PIXEL_BYTES.get(pixel_type, 4) * 8)
+            position = end + 17
+
+        x_min, y_min, x_max, y_max = struct.unpack_from("<iiii", attributes["dataWindow"])
+        width = x_max - x_min + 1
+        height = y_max - y_min + 1
+        level_mode = _EXR_ONE_LEVEL
+        round_up = False
+        if "tiles" in attributes:
+            mode = struct.unpack_from("<IIB", attributes["tiles"])[2]
+            level_mode = mode & 0x0F
+            round_up = (mode >> 4) == 1
+        widths = TextureHeader.__level_sizes(width, round_up, level_mode != _EXR_ONE_LEVEL)
+        heights = TextureHeader.__level_sizes(height, round_up, level_mode != _EXR_ONE_LEVEL)
+        if level_mode == _EXR_RIPMAP_LEVELS:
+            levels = [(w, h) for w in widths for h in heights]
+        elif level_mode == _EXR_MIPMAP_LEVELS:
+            count = TextureHeader.__level_count(max(width, height), round_up)
+            levels = [(TextureHeader.__level_size(width, i, round_up), TextureHeader.__level_size(height, i, round_up))
+                      for i in range(count)]
+        else:
+            levels = [(width, height)]
+        return {"format": "exr", "width": width, "height": height, "channels": channels, "bits": bits,
+                "levels": levels, "tiled": "tiles" in attributes}
+
+    @staticmethod
+    def __level_count(size, round_up):
+        """
+        Get the number of mip levels of an EXR
+        :param size
+        :param round_up
+        :return:
+        """
+        log = math.log2(max(1, size))
+        return (math.ceil(log) if round_up else math.floor(log)) + 1
+
+    @staticmethod
+    def __level_size(size, level, round_up):
+        """
+        Get the size of an EXR mip level
+        :param size
+        :param level
+        :param round_up
+        :return:
+        """
+        divided = (size + (1 << level) - 1) >> level if round_up else size >> level
+        return max(1, divided)
+
+    @staticmethod
+    def __level_sizes(size, round_up, mipmapped):
+        """
+        Get the sizes of the levels of an EXR along one axis
+        :param size
+        :param round_up
+        :param mipmapped
+        :return:
+        """
+        if not mipmapped:
+            return [size]
+        count = TextureHeader.__level_count(size, round_up)
+        return [TextureHeader.__level_size(size, i, round_up) for i in range(count)]
+
+    @staticmethod
+    def __read_png(f):
+        """
+        Read the IHDR chunk of a PNG file
+        :param f
+        :return:
+        """
+        f.seek(16)
+        width, height, bit_depth, color_type = TextureHeader.__unpack(f, ">IIBB", 10)
+        # Palettes are expanded to RGB, depths under 8 bits to 8 bits
+        bits = 8 if color_type == 3 else max(8, bit_depth)
+        return {"format": "png", "width": width, "height": height, "channels": _PNG_CHANNELS.get(color_type, 4),
+                "bits": bits, "levels": [(width, height)], "tiled": False}
+
+    @staticmethod
+    def __read_jpeg(f):
+        """
+        Read the start of frame segment of a JPEG file
+        :param f
+        :return:
+        """
+        f.seek(2)
+        while True:
+            marker_start = f.read(1)
+            if marker_start == b"":
+                raise ValueError("No frame in the JPEG file")
+            if marker_start != b"\xff":
+                continue
+            marker = f.read(1)
+            while marker == b"\xff":
+                marker = f.read(1)
+            if marker == b"" or marker[0] in (0xD8, 0x01) or 0xD0 <= marker[0] <= 0xD7:
+                continue
+            length = TextureHeader.__unpack(f, ">H", 2)[0]
+            if marker[0] in _JPEG_SOF_MARKERS:
+                bits, height, width, channels = TextureHeader.__unpack(f, ">BHHB", 6)
+                return {"format": "jpeg", "width": width, "height": height, "channels": channels, "bits": bits,
+                        "levels": [(width, height)], "tiled": False}
+            f.seek(length - 2, 1)
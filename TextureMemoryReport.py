@@ -0,0 +1,146 @@
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+
+from .TextureHeader import TextureHeader
+
+# ######################################################################################################################
+
+# Texture memory budget of a look in GB, over it the publish warns
+TEXTURE_BUDGET_ENV = "CHARACTER_PUBLISHER_TEXTURE_BUDGET_GB"
+_DEFAULT_TEXTURE_BUDGET_GB = 16.0
+_DEFAULT_MAX_WORKERS = 16
+# Largest textures listed in the report
+_LARGEST_COUNT = 20
+_GB = 1024 ** 3
+
+
+# ######################################################################################################################
+
+
+class TextureMemoryReport:
+    """
+    Texture memory needed by a look, from the headers of its texture files (read in parallel) : per shader and
+    for the whole look, with the largest textures, compared to a budget
+    """
+
+    @staticmethod
+    def get_default_budget():
+        """
+        Get the texture budget of a look in GB (CHARACTER_PUBLISHER_TEXTURE_BUDGET_GB env or default)
+        :return:
+        """
+        try:
+            return float(os.environ.get(TEXTURE_BUDGET_ENV, _DEFAULT_TEXTURE_BUDGET_GB))
+        except ValueError:
+            return _DEFAULT_TEXTURE_BUDGET_GB
+
+    @staticmethod
+    def __read_header(path):
+        """
+        Read the header of a texture file
+        :param path
+        :return: (path, header or None, error or None)
+        """
+        try:
+            header = TextureHeader.read(path)
+        except (OSError, ValueError, struct.error) as e:
+            return path, None, str(e)
+        if header is None:
+            return path, None, "unsupported format"
+        return path, header, None
+
+    def __init__(self, max_workers=_DEFAULT_MAX_WORKERS):
+        self.__max_workers = max(1, max_workers)
+        # path -> header, None if unreadable
+        self.__headers = {}
+        self.__errors = {}
+
+    def read_headers(self, paths):
+        """
+        Read the headers of texture files not read yet, in parallel
+        :param paths
+        :return: number of headers read
+        """
+        paths = [path for path in dict.fromkeys(paths) if path not in self.__headers]
+        if len(paths) == 0:
+            return 0
+        with ThreadPoolExecutor(max_workers=min(self.__max_workers, len(paths))) as executor:
+            for path, header, error in executor.map(TextureMemoryReport.__read_header, paths):
+                self.__headers[path] = header
+                if error is not None:
+                    self.__errors[path] = error
+        return len(paths)
+
+    def build(self, shaders, budget_gb):
+        """
+        Build the report of a look
+        :param shaders: dict shader name -> list of texture file paths (tiles expanded)
+        :param budget_gb
+        :return: dict of the report
+        """
+        shader_entries = []
+        look_paths = set()
+        for shader, paths in shaders.items():
+            paths = set(paths)
+            look_paths.update(paths)
+            shader_entries.append({"shader": shader, "textures": len(paths),
+                                   "bytes": sum(self.__get_bytes(path) for path in paths)})
+        shader_entries.sort(key=lambda entry: entry["bytes"], reverse=True)
+
+        files = []
+        for path in look_paths:
+            header = self.__headers.get(path)
+            if header is None:
+                continue
+            files.append({"path": path, "format": header["format"], "width": header["width"],
+                          "height": header["height"], "channels": header["channels"], "bits": header["bits"],
+                          "levels": len(header["levels"]), "tiled": header["tiled"],
+                          "bytes": TextureHeader.get_bytes(header)})
+        files.sort(key=lambda entry: entry["bytes"], reverse=True)
+
+        total = sum(entry["bytes"] for entry in files)
+        budget = int(budget_gb * _GB)
+        return {
+            "total_bytes": total,
+            "budget_bytes": budget,
+            "over_budget": total > budget,
+            "textures": len(look_paths),
+            # Loaded whole by the renderer : no mip level stored or not tiled
+            "untiled": sorted(entry["path"] for entry in files if entry["levels"] == 1 or not entry["tiled"]),
+            "unreadable": {path: self.__errors.get(path, "not read") for path in sorted(look_paths)
+                           if self.__headers.get(path) is None},
+            "shaders": shader_entries,
+            "largest": files[:_LARGEST_COUNT],
+        }
+
+    def __get_bytes(self, path):
+        """
+        Get the memory of a texture file, 0 if its header couldn't be read
+        :param path
+        :return:
+        """
+        header = self.__headers.get(path)
+        return TextureHeader.get_bytes(header) if header is not None else 0
+
+    @staticmethod
+    def format_summary(report, look_name=""):
+        """
+        Get a readable summary of a report
+        :param report
+        :param look_name
+        :return:
+        """
+        lines = ["Texture memory of look %s : %.2f GB for %s textures (budget %.2f GB)" % (
+            look_name or "default", report["total_bytes"] / _GB, report["textures"], report["budget_bytes"] / _GB)]
+        for entry in report["shaders"][:5]:
+            lines.append("  %s : %.2f GB (%s textures)" % (entry["shader"], entry["bytes"] / _GB, entry["textures"]))
+        for entry in report["largest"][:5]:
+            lines.append("  %s : %sx%s %s channels %s bits, %.2f GB" % (
+                os.path.basename(entry["path"]), entry["width"], entry["height"], entry["channels"], entry["bits"],
+                entry["bytes"] / _GB))
+        if len(report["untiled"]) > 0:
+            lines.append("  %s textures without mip levels or tiles" % len(report["untiled"]))
+        if len(report["unreadable"]) > 0:
+            lines.append("  %s textures unreadable" % len(report["unreadable"]))
+        return "\n".join(lines)
@@ -0,0 +1,176 @@
+import os
+import re
+
+# ######################################################################################################################
+
+# Tile tokens (lowercase) and the regex matching their values in a file name
+_TILE_TOKENS = {
+    "<udim>": r"\d{4}",
+    # Maya <UVTILE> (u1_v1), Arnold <tile> (_u1_v1)
+    "<uvtile>": r"u\d+_v\d+",
+    "<tile>": r"_u\d+_v\d+",
+    "<u>": r"\d+",
+    "<v>": r"\d+",
+    "_mapid_": r"_\d+_",
+}
+_TILE_TOKEN_REGEX = re.compile("(" + "|".join(re.escape(token) for token in _TILE_TOKENS) + ")", re.IGNORECASE)
+
+
+# ######################################################################################################################
+
+
+class TextureResolver:
+    """
+    Resolve texture files against an in-memory index of their directories. Each directory is listed once
+    and only listed again when its mtime changes. The mtimes of the files are read once per pass
+    """
+
+    @staticmethod
+    def has_tile_token(path):
+        """
+        Check if a texture path contains a tile token (<UDIM>, <UVTILE>, u<U>_v<V>, _MAPID_)
+        :param path
+        :return:
+        """
+        return _TILE_TOKEN_REGEX.search(os.path.basename(path)) is not None
+
+    @staticmethod
+    def __tile_regex(file_name):
+        """
+        Build the regex matching all the tiles of a tokenized file name
+        :param file_name
+        :return:
+        """
+        parts = _TILE_TOKEN_REGEX.split(file_name)
+        # Odd parts are the tokens
+        regex = "".join(_TILE_TOKENS[part.lower()] if i % 2 == 1 else re.escape(part) for i, part in enumerate(parts))
+        return re.compile(regex + "$", re.IGNORECASE if os.name == "nt" else 0)
+
+    def __init__(self):
+        # Directory -> (mtime, set of normalized file names)
+        self.__dir_index = {}
+        # Directory -> {normalized file name: mtime}, the files whose mtime has been read during the current pass
+        self.__file_mtimes = {}
+        # Directories already checked during the current pass
+        self.__validated_dirs = set()
+        self.__stat_count = 0
+
+    def get_stat_count(self):
+        """
+        Getter of the number of filesystem calls (stat and listdir) done since the last reset
+        :return:
+        """
+        return self.__stat_count
+
+    def new_pass(self):
+        """
+        Start a new resolution pass (a publish) : each directory will be checked again once
+        :return:
+        """
+        self.__validated_dirs.clear()
+        self.__file_mtimes.clear()
+        self.__stat_count = 0
+
+    def invalidate(self, dir_path=None):
+        """
+        Forget a directory or the whole index
+        :param dir_path
+        :return:
+        """
+        if dir_path is None:
+            self.__dir_index.clear()
+            self.__validated_dirs.clear()
+            self.__file_mtimes.clear()
+        else:
+            dir_path = os.path.normcase(os.path.normpath(dir_path))
+            self.__dir_index.pop(dir_path, None)
+            self.__validated_dirs.discard(dir_path)
+            self.__file_mtimes.pop(dir_path, None)
+
+    def list_dir(self, dir_path):
+        """
+        Get the normalized names of the files in a directory
+        :param dir_path
+        :return:
+        """
+        dir_path = os.path.normcase(os.path.normpath(dir_path))
+        cached = self.__dir_index.get(dir_path)
+        if dir_path in self.__validated_dirs and cached is not None:
+            return cached[1]
+        self.__validated_dirs.add(dir_path)
+
+        self.__stat_count += 1
+        try:
+            mtime = os.stat(dir_path).st_mtime
+        except OSError:
+            self.__dir_index[dir_path] = (None, frozenset())
+            return self.__dir_index[dir_path][1]
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+        self.__stat_count += 1
+        self.__file_mtimes.pop(dir_path, None)
+        try:
+            with os.scandir(dir_path) as it:
+                names = frozenset(os.path.normcase(entry.name) for entry in it)
+        except OSError:
+            names = frozenset()
+        self.__dir_index[dir_path] = (mtime, names)
+        return names
+
+    def exists(self, path):
+        """
+        Check if a file exists according to the index
+        :param path
+        :return:
+        """
+        dir_path, file_name = os.path.split(os.path.normpath(path))
+        return os.path.normcase(file_name) in self.list_dir(dir_path)
+
+    def get_mtime(self, path):
+        """
+        Get the mtime of a file, read once per pass. A file missing from the index isn't stat
+        :param path
+        :return: the mtime or None if the file doesn't exist
+        """
+        dir_path, file_name = os.path.split(os.path.normpath(path))
+        dir_path = os.path.normcase(dir_path)
+        file_name = os.path.normcase(file_name)
+        if file_name not in self.list_dir(dir_path):
+            return None
+        mtimes = self.__file_mtimes.setdefault(dir_path, {})
+        if file_name not in mtimes:
+            self.__stat_count += 1
+            try:
+                mtimes[file_name] = os.stat(os.path.join(dir_path, file_name)).st_mtime
+            except OSError:
+                mtimes[file_name] = None
+        return mtimes[file_name]
+
+    def expand_tiles(self, path):
+        """
+        Get the existing files of a texture path, all its tiles if it contains a tile token
+        The directory is only scanned once
+        :param path
+        :return: sorted list of existing paths
+        """
+        path = os.path.normpath(path)
+        if not TextureResolver.has_tile_token(path):
+            return [path] if self.exists(path) else []
+        dir_path, file_name = os.path.split(path)
+        tile_regex = TextureResolver.__tile_regex(os.path.normcase(file_name))
+        tiles = [name for name in self.list_dir(dir_path) if tile_regex.match(name)]
+        return [os.path.join(dir_path, name) for name in sorted(tiles)]
+
+    def resolve_tx(self, tx_path, tx_path_legacy):
+        """
+        Get the first existing tx between the colorspace one and the legacy one
+        :param tx_path
+        :param tx_path_legacy
+        :return: the existing path or None
+        """
+        if self.exists(tx_path):
+            return tx_path
+        if self.exists(tx_path_legacy):
+            return tx_path_legacy
+        return None
@@ -0,0 +1,140 @@
+import os
+import shutil
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# ######################################################################################################################
+
+_MAKETX_ENV = "MAKETX_PATH"
+_MAKETX_NAME = "maketx.exe" if os.name == "nt" else "maketx"
+_DEFAULT_MAX_WORKERS = max(1, (os.cpu_count() or 2) // 2)
+
+
+# ######################################################################################################################
+
+
+class TxConverter:
+    @staticmethod
+    def find_maketx():
+        """
+        Find the maketx executable (MAKETX_PATH env, then MtoA install, then PATH)
+        :return: the path of maketx or None
+        """
+        env_path = os.environ.get(_MAKETX_ENV)
+        if env_path and os.path.isfile(env_path):
+            return env_path
+        mtoa_path = os.environ.get("MTOA_PATH")
+        if mtoa_path:
+            mtoa_maketx = os.path.join(mtoa_path, "bin", _MAKETX_NAME)
+            if os.path.isfile(mtoa_maketx):
+                return mtoa_maketx
+        return shutil.which(_MAKETX_NAME)
+
+    @staticmethod
+    def is_up_to_date(src_path, tx_path, texture_resolver=None):
+        """
+        Check if the tx exists and is newer than its source
+        :param src_path
+        :param tx_path
+        :param texture_resolver: TextureResolver reading the mtimes, the missing tx aren't stat
+        :return:
+        """
+        if texture_resolver is not None:
+            tx_mtime = texture_resolver.get_mtime(tx_path)
+            if tx_mtime is None:
+                return False
+            src_mtime = texture_resolver.get_mtime(src_path)
+            return src_mtime is not None and tx_mtime >= src_mtime
+        try:
+            return os.path.getmtime(tx_path) >= os.path.getmtime(src_path)
+        except OSError:
+            return False
+
+    def __init__(self, maketx_path=None, max_workers=_DEFAULT_MAX_WORKERS, ocio_config=None, texture_resolver=None):
+        self.__maketx_path = maketx_path if maketx_path is not None else TxConverter.find_maketx()
+        self.__max_workers = max(1, max_workers)
+        self.__ocio_config = ocio_config if ocio_config is not None else os.environ.get("OCIO")
+        self.__texture_resolver = texture_resolver
+        # List of (src_path, tx_path, color_space, render_color_space)
+        self.__jobs = []
+        # Tx paths of the jobs
+        self.__tx_paths = set()
+
+    def is_available(self):
+        """
+        Getter of whether maketx has been found
+        :return:
+        """
+        return self.__maketx_path is not None
+
+    def add_job(self, src_path, tx_path, color_space, render_color_space):
+        """
+        Add a texture to convert. Jobs with the same output are only added once
+        :param src_path
+        :param tx_path
+        :param color_space
+        :param render_color_space
+        :return:
+        """
+        if tx_path in self.__tx_paths:
+            return
+        self.__tx_paths.add(tx_path)
+        self.__jobs.append((src_path, tx_path, color_space, render_color_space))
+
+    def __build_command(self, src_path, tx_path, color_space, render_color_space):
+        """
+        Build the maketx command line of a job
+        :param src_path
+        :param tx_path
+        :param color_space
+        :param render_color_space
+        :return:
+        """
+        cmd = [self.__maketx_path, "-v", "-u", "--oiio", "--monochrome-detect", "--opaque-detect",
+               "--constant-color-detect", "--unpremult", "--attrib", "tiff:half", "1"]
+        if self.__ocio_config and color_space and color_space != render_color_space:
+            cmd += ["--colorconfig", self.__ocio_config, "--colorconvert", color_space, render_color_space]
+        cmd += [src_path, "-o", tx_path]
+        return cmd
+
+    def __convert(self, job):
+        """
+        Convert one texture. Runs in a worker thread, the work itself is done by a maketx process
+        :param job
+        :return: (tx_path, error or None)
+        """
+        src_path, tx_path, color_space, render_color_space = job
+        cmd = self.__build_command(src_path, tx_path, color_space, render_color_space)
+        try:
+            result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                    universal_newlines=True)
+        except OSError as e:
+            return tx_path, str(e)
+        if result.returncode != 0:
+            return tx_path, result.stdout.strip()
+        return tx_path, None
+
+    def run(self, progress_callback=None):
+        """
+        Convert all the jobs that are not up to date, with at most max_workers maketx processes at once
+        :param progress_callback: called with (done, total, tx_path) after each conversion
+        :return: dict of the errors by tx path
+        """
+        jobs = [job for job in self.__jobs if not TxConverter.is_up_to_date(job[0], job[1], self.__texture_resolver)]
+        errors = {}
+        total = len(jobs)
+        if total == 0:
+            return errors
+        if not self.is_available():
+            for job in jobs:
+                errors[job[1]] = "maketx not found"
+            return errors
+        with ThreadPoolExecutor(max_workers=self.__max_workers) as executor:
+            futures = [executor.submit(self.__convert, job) for job in jobs]
+            for done, future in enumerate(as_completed(futures), start=1):
+                tx_path, error = future.result()
+                if error is not None:
+                    errors[tx_path] = error
+                if progress_callback is not None:
+                    progress_callback(done, total, tx_path)
+        return errors
@@ -0,0 +1,436 @@
+"""
+Headless batch publish of many assets with a pool of mayapy workers
+
+Usage :
+    python batch_publish.py jobs.json [--workers 4] [--mayapy PATH] [--log-dir DIR] [--retry-failed] [--force]
+    python batch_publish.py --scene A.ma --scene B.ma --root char_GRP [--no-model] [--no-look] [--look-name NAME]
+
+The jobs file is a json list of {"scene": path, "roots": [nodes], "model": bool, "look": bool, "look_name": str,
+"ass_encoding": "ascii" or "binary", "ass_compressed": bool, "shader_library": bool, "model_chunks": int,
+"direct_operators": bool, "texture_budget": GB, "optimize_ass": bool, "staging": bool,
+"max_mesh_polygons": int, "max_polygons": int}.
+Several looks are published in one pass with a look_name "look, look=renderLayer, ..."
+The state of each job is stored beside the jobs file (<jobs>.state.json) so an interrupted run can be resumed :
+done jobs are skipped unless --force is given, failed jobs are only rerun with --retry-failed
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# ######################################################################################################################
+
+EXIT_OK = 0
+EXIT_PUBLISH_FAILED = 1
+EXIT_USAGE = 2
+EXIT_BAD_SCENE = 3
+
+_PACKAGE_NAME = "character_publisher"
+_PACKAGE_PARENT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# ######################################################################################################################
+
+
+def find_mayapy():
+    """
+    Find the mayapy executable from MAYA_LOCATION
+    :return: the path of mayapy or None
+    """
+    maya_location = os.environ.get("MAYA_LOCATION")
+    if not maya_location:
+        return None
+    mayapy = os.path.join(maya_location, "bin", "mayapy.exe" if os.name == "nt" else "mayapy")
+    return mayapy if os.path.isfile(mayapy) else None
+
+
+def job_key(job):
+    """
+    Get the key identifying a job in the state file
+    :param job
+    :return:
+    """
+    return "%s|%s|%s" % (os.path.normpath(job["scene"]), ",".join(job["roots"]), job.get("look_name", ""))
+
+
+def normalize_job(job):
+    """
+    Fill the optional fields of a job
+    :param job
+    :return:
+    """
+    return {
+        "scene": job["scene"],
+        "roots": list(job["roots"]),
+        "model": job.get("model", True),
+        "look": job.get("look", True),
+        "look_name": job.get("look_name", ""),
+        "ass_encoding": job.get("ass_encoding", "ascii"),
+        "ass_compressed": job.get("ass_compressed", False),
+        "shader_library": job.get("shader_library", False),
+        "model_chunks": job.get("model_chunks", 1),
+        "direct_operators": job.get("direct_operators", False),
+        "texture_budget": job.get("texture_budget"),
+        "optimize_ass": job.get("optimize_ass", True),
+        "staging": job.get("staging", True),
+        "max_mesh_polygons": job.get("max_mesh_polygons"),
+        "max_polygons": job.get("max_polygons"),
+    }
+
+
+def load_state(state_path):
+    """
+    Load the state of the jobs
+    :param state_path
+    :return:
+    """
+    if state_path is None or not os.path.isfile(state_path):
+        return {}
+    with open(state_path, "r") as f:
+        return json.load(f)
+
+
+def save_state(state_path, state):
+    """
+    Save the state of the jobs atomically
+    :param state_path
+    :param state
+    :return:
+    """
+    if state_path is None:
+        return
+    tmp_path = state_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f, indent=4)
+    os.replace(tmp_path, state_path)
+
+
+def _worker_env():
+    """
+    Get the environment of the mayapy workers, with this package importable
+    :return:
+    """
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [_PACKAGE_PARENT_DIR, env.get("PYTHONPATH")]))
+    return env
+
+
+def _load_plugins():
+    """
+    Load the plugins needed to publish
+    :return:
+    """
+    import pymel.core as pm
+    for plugin in ("mtoa", "AbcExport"):
+        if not pm.pluginInfo(plugin, query=True, loaded=True):
+            pm.loadPlugin(plugin, quiet=True)
+
+
+def write_job_file(job, log_path):
+    """
+    Write a job to a json file next to the log of its worker : a job (texture lists, operators) doesn't fit in a
+    command line
+    :param job
+    :param log_path
+    :return: the path of the file
+    """
+    job_path = "%s.%s.job.json" % (os.path.splitext(log_path)[0], os.getpid())
+    with open(job_path, "w") as f:
+        json.dump(job, f)
+    return job_path
+
+
+def read_job_file(job_path):
+    """
+    Read and delete a job file
+    :param job_path
+    :return: the job
+    """
+    with open(job_path, "r") as f:
+        job = json.load(f)
+    try:
+        os.remove(job_path)
+    except OSError:
+        pass
+    return job
+
+
+def run_job(job, mayapy, log_path):
+    """
+    Run a job in a mayapy worker process
+    :param job
+    :param mayapy
+    :param log_path
+    :return: (exit code, duration)
+    """
+    job_path = write_job_file(job, log_path)
+    cmd = [mayapy, "-m", _PACKAGE_NAME + ".batch_publish", "--worker-job-file", job_path]
+    start = time.time()
+    try:
+        with open(log_path, "w") as log:
+            exit_code = subprocess.call(cmd, stdout=log, stderr=subprocess.STDOUT, env=_worker_env())
+    finally:
+        # Left by a worker which failed to start
+        if os.path.exists(job_path):
+            os.remove(job_path)
+    return exit_code, time.time() - start
+
+
+def run_export_job(export_job, mayapy, log_path):
+    """
+    Run deferred exports in a mayapy worker process and wait for it
+    :param export_job: {"scene": scene to open, "exports": list of deferred exports, "keep_scene": bool}
+    :param mayapy
+    :param log_path
+    :return: (exit code, duration)
+    """
+    job_path = write_job_file(export_job, log_path)
+    cmd = [mayapy, "-m", _PACKAGE_NAME + ".batch_publish", "--export-job-file", job_path]
+    start = time.time()
+    try:
+        with open(log_path, "w") as log:
+            exit_code = subprocess.call(cmd, stdout=log, stderr=subprocess.STDOUT, env=_worker_env())
+    finally:
+        # Left by a worker which failed to start
+        if os.path.exists(job_path):
+            os.remove(job_path)
+    return exit_code, time.time() - start
+
+
+def start_export_worker(export_job, log_path, mayapy):
+    """
+    Start a mayapy process running deferred exports without waiting for it
+    :param export_job: {"scene": scene to open, "exports": list of deferred exports}
+    :param log_path
+    :param mayapy
+    :return: the process
+    """
+    cmd = [mayapy, "-m", _PACKAGE_NAME + ".batch_publish", "--export-job-file", write_job_file(export_job, log_path)]
+    log = open(log_path, "w")
+    try:
+        return subprocess.Popen(cmd, stdout=log, stderr=subprocess.STDOUT, env=_worker_env())
+    finally:
+        # The child process has its own handle
+        log.close()
+
+
+def run_export_worker(export_job):
+    """
+    Run deferred exports in the current mayapy process, the scene is deleted afterwards unless keep_scene is set
+    :param export_job
+    :return: the exit code
+    """
+    import maya.standalone
+    maya.standalone.initialize(name="python")
+    try:
+        import pymel.core as pm
+        from .PublishCore import PublishCore
+
+        from .PublishTelemetry import PublishTelemetry
+        from .PublishUploader import PublishUploader
+
+        _load_plugins()
+        pm.openFile(export_job["scene"], force=True)
+        telemetry = PublishTelemetry()
+        try:
+            for export in export_job["exports"]:
+                start = time.time()
+                PublishCore.run_exports([export], telemetry)
+                print("Export %s done in %.2fs" % (export["type"], time.time() - start))
+            if any("upload" in export for export in export_job["exports"]):
+                # The process uploads its staged files before exiting
+                with telemetry.span("Upload"):
+                    done, failed = PublishUploader().process_queue(wait=True)
+                if failed > 0:
+                    print("%s uploads failed, retry them with the PublishUploader command" % failed)
+                    return EXIT_PUBLISH_FAILED
+        finally:
+            if export_job.get("telemetry"):
+                PublishTelemetry.append_spans(export_job["telemetry"], telemetry.get_spans())
+        return EXIT_OK
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        print("Export failed : %s" % e)
+        return EXIT_PUBLISH_FAILED
+    finally:
+        maya.standalone.uninitialize()
+        if not export_job.get("keep_scene", False):
+            try:
+                os.remove(export_job["scene"])
+            except OSError:
+                pass
+
+
+def run_worker(job):
+    """
+    Publish a job in the current mayapy process
+    :param job
+    :return: the exit code
+    """
+    import maya.standalone
+    maya.standalone.initialize(name="python")
+    try:
+        import pymel.core as pm
+        from .PublishCore import PublishCore
+        from .PublishUploader import PublishUploader
+
+        _load_plugins()
+
+        print("Opening %s" % job["scene"])
+        pm.openFile(job["scene"], force=True)
+        asset_dir, asset_name = PublishCore.retrieve_dir_and_asset_from_scene_name(pm.system.sceneName())
+        if asset_name is None:
+            print("Retrieving the asset directory and asset name has failed for %s" % job["scene"])
+            return EXIT_BAD_SCENE
+
+        publish_core = PublishCore(asset_dir, asset_name)
+        publish_core.set_selection([pm.PyNode(root) for root in job["roots"]])
+        publish_core.set_publish_uv(job["model"])
+        publish_core.set_publish_look(job["look"])
+        publish_core.set_looks(PublishCore.parse_looks(job["look_name"]))
+        publish_core.set_ass_encoding(job["ass_encoding"], job["ass_compressed"])
+        publish_core.set_shader_library(job["shader_library"])
+        publish_core.set_model_chunks(job["model_chunks"])
+        publish_core.set_direct_operators(job["direct_operators"])
+        publish_core.set_texture_budget(job["texture_budget"])
+        publish_core.set_optimize_ass(job["optimize_ass"])
+        publish_core.set_staging(job["staging"])
+        publish_core.set_render_cost_thresholds(job["max_mesh_polygons"], job["max_polygons"])
+        publish_core.publish()
+        if job["staging"]:
+            # The upload thread doesn't outlive the process
+            done, failed = PublishUploader().process_queue(wait=True)
+            if failed > 0:
+                print("%s uploads failed, retry them with the PublishUploader command" % failed)
+                return EXIT_PUBLISH_FAILED
+        return EXIT_OK
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        print("Publish failed : %s" % e)
+        return EXIT_PUBLISH_FAILED
+    finally:
+        maya.standalone.uninitialize()
+
+
+def run_batch(jobs, mayapy, workers, log_dir, state_path, retry_failed=False, force=False):
+    """
+    Run the jobs across a pool of mayapy workers
+    :param jobs
+    :param mayapy
+    :param workers
+    :param log_dir
+    :param state_path
+    :param retry_failed
+    :param force
+    :return: the exit code (0 if all the jobs succeeded)
+    """
+    os.makedirs(log_dir, exist_ok=True)
+    state = load_state(state_path)
+    jobs_to_run = []
+    for job in jobs:
+        status = state.get(job_key(job), {}).get("status")
+        if not force and (status == "done" or (status == "failed" and not retry_failed)):
+            print("Skip %s (%s)" % (job_key(job), status))
+            continue
+        jobs_to_run.append(job)
+
+    failed = 0
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {}
+        for i, job in enumerate(jobs_to_run):
+            log_name = "%03d_%s.log" % (i, os.path.splitext(os.path.basename(job["scene"]))[0])
+            log_path = os.path.join(log_dir, log_name)
+            futures[executor.submit(run_job, job, mayapy, log_path)] = (job, log_path)
+        for done, future in enumerate(as_completed(futures), start=1):
+            job, log_path = futures[future]
+            exit_code, duration = future.result()
+            status = "done" if exit_code == EXIT_OK else "failed"
+            if exit_code != EXIT_OK:
+                failed += 1
+            state[job_key(job)] = {"status": status, "exit_code": exit_code, "log": log_path,
+                                   "duration": round(duration, 2)}
+            save_state(state_path, state)
+            print("[%s/%s] %s %s in %.1fs (exit code %s, log %s)"
+                  % (done, len(jobs_to_run), job_key(job), status, duration, exit_code, log_path))
+    print("%s jobs run, %s failed" % (len(jobs_to_run), failed))
+    return EXIT_OK if failed == 0 else EXIT_PUBLISH_FAILED
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch publish of character models and looks")
+    parser.add_argument("jobs_file", nargs="?", help="json list of jobs")
+    parser.add_argument("--scene", action="append", default=[], help="scene to publish (repeatable)")
+    parser.add_argument("--root", action="append", default=[], help="root node to publish (repeatable)")
+    parser.add_argument("--no-model", action="store_true", help="don't publish the model")
+    parser.add_argument("--no-look", action="store_true", help="don't publish the look")
+    parser.add_argument("--look-name", default="", help="look name (default if empty) or \"look, look=layer, ...\"")
+    parser.add_argument("--ass-encoding", choices=["ascii", "binary"], default="ascii", help="encoding of the look")
+    parser.add_argument("--ass-compressed", action="store_true", help="gzip the look file")
+    parser.add_argument("--shader-library", action="store_true", help="share the shaders through the asset library")
+    parser.add_argument("--model-chunks", type=int, default=1, help="split the model by group into N files")
+    parser.add_argument("--direct-operators", action="store_true",
+                        help="write the operators to the look file without creating scene nodes")
+    parser.add_argument("--no-optimize-ass", action="store_true",
+                        help="keep the look file as exported (unreachable nodes, defaults, identical subgraphs)")
+    parser.add_argument("--no-staging", action="store_true",
+                        help="write the publish files directly to the asset folder instead of uploading them")
+    parser.add_argument("--texture-budget", type=float, default=None,
+                        help="texture memory budget of a look in GB (default 16, see the README)")
+    parser.add_argument("--max-mesh-polygons", type=int, default=None,
+                        help="polygons of a mesh after subdivision over which the publish warns (see the README)")
+    parser.add_argument("--max-polygons", type=int, default=None,
+                        help="polygons of the character after subdivision over which the publish warns")
+    parser.add_argument("--workers", type=int, default=2, help="number of mayapy processes")
+    parser.add_argument("--mayapy", default=None, help="mayapy executable (default from MAYA_LOCATION)")
+    parser.add_argument("--log-dir", default=None, help="directory of the job logs")
+    parser.add_argument("--retry-failed", action="store_true", help="rerun the failed jobs of the state file")
+    parser.add_argument("--force", action="store_true", help="rerun all the jobs")
+    parser.add_argument("--worker-job-file", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--export-job-file", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.export_job_file is not None:
+        return run_export_worker(read_job_file(args.export_job_file))
+
+    if args.shader_library and args.ass_encoding == "binary":
+        parser.error("--shader-library needs the ascii encoding, binary look files can't be shared")
+    if args.worker_job_file is not None:
+        return run_worker(normalize_job(read_job_file(args.worker_job_file)))
+
+    if args.jobs_file:
+        with open(args.jobs_file, "r") as f:
+            jobs = [normalize_job(job) for job in json.load(f)]
+        state_path = args.jobs_file + ".state.json"
+        default_log_dir = os.path.splitext(args.jobs_file)[0] + "_logs"
+    elif args.scene and args.root:
+        jobs = [normalize_job({"scene": scene, "roots": args.root, "model": not args.no_model,
+                               "look": not args.no_look, "look_name": args.look_name,
+                               "ass_encoding": args.ass_encoding, "ass_compressed": args.ass_compressed,
+                               "shader_library": args.shader_library, "model_chunks": args.model_chunks,
+                               "direct_operators": args.direct_operators, "texture_budget": args.texture_budget,
+                               "optimize_ass": not args.no_optimize_ass, "staging": not args.no_staging,
+                               "max_mesh_polygons": args.max_mesh_polygons, "max_polygons": args.max_polygons})
+                for scene in args.scene]
+        state_path = None
+        default_log_dir = os.path.join(os.getcwd(), "batch_publish_logs")
+    else:
+        parser.print_usage()
+        print("A jobs file or at least one --scene and one --root are needed")
+        return EXIT_USAGE
+
+    mayapy = args.mayapy or find_mayapy()
+    if mayapy is None:
+        print("mayapy not found, use --mayapy or set MAYA_LOCATION")
+        return EXIT_USAGE
+    return run_batch(jobs, mayapy, args.workers, args.log_dir or default_log_dir, state_path,
+                     args.retry_failed, args.force)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
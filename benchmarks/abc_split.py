@@ -0,0 +1,116 @@
+"""
+Compare the single file and the split model export of a scene : export time, and every shape as Arnold loads it.
+The single file and the split files (base file and its layers, like the abcLayers of the standin) are expanded by the
+alembic procedural with kick, and the expanded shapes are compared parameter by parameter : points, topology,
+normals, UVs, color sets (user data) and matrices
+
+Run with mayapy and MtoA, the package being importable and kick in the PATH (or --kick) :
+    mayapy benchmarks/abc_split.py path/to/char.ma --root char_GRP [--chunks 4] [--out-dir DIR]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import maya.standalone
+
+# ######################################################################################################################
+
+_DEFAULT_CHUNKS = 4
+# Node types produced by the alembic procedural for the shapes
+_SHAPE_TYPES = {"polymesh", "curves", "nurbs", "points"}
+
+
+# ######################################################################################################################
+
+
+def expand_shape_hashes(ass_file, kick, out_dir, label, base_path, layer_paths):
+    """
+    Expand an alembic file and its layers with the alembic procedural of Arnold and hash each shape
+    :param ass_file: the AssFile class
+    :param kick: path of kick
+    :param out_dir
+    :param label: name of the files written
+    :param base_path
+    :param layer_paths
+    :return: dict shape name -> hash
+    """
+    scene_path = os.path.join(out_dir, label + ".ass")
+    expanded_path = os.path.join(out_dir, label + "_expanded.ass")
+    layers = "".join(' "%s"' % path for path in layer_paths)
+    with open(scene_path, "w") as f:
+        f.write("options\n{\n name options\n camera \"camera\"\n xres 16\n yres 16\n}\n\n")
+        f.write("persp_camera\n{\n name camera\n}\n\n")
+        f.write("alembic\n{\n name model\n filename \"%s\"\n" % base_path)
+        if len(layer_paths) > 0:
+            f.write(" layers %s 1 STRING%s\n" % (len(layer_paths), layers))
+        f.write("}\n")
+    subprocess.check_call([kick, "-i", scene_path, "-forceexpand", "-resave", expanded_path, "-dw", "-dp"])
+    return {node.name: node.content_hash() for node in ass_file.read(expanded_path).nodes
+            if node.type in _SHAPE_TYPES}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the single file and the split model export")
+    parser.add_argument("scene")
+    parser.add_argument("--root", action="append", required=True, help="root node of the model (repeatable)")
+    parser.add_argument("--chunks", type=int, default=_DEFAULT_CHUNKS)
+    parser.add_argument("--out-dir", default=None, help="directory of the exported files (default temp)")
+    parser.add_argument("--kick", default="kick", help="path of kick")
+    args = parser.parse_args(argv)
+
+    maya.standalone.initialize(name="python")
+    try:
+        import pymel.core as pm
+        from character_publisher.PublishCore import PublishCore
+        from character_publisher.AssFile import AssFile
+
+        for plugin in ("AbcExport",):
+            if not pm.pluginInfo(plugin, query=True, loaded=True):
+                pm.loadPlugin(plugin, quiet=True)
+        out_dir = args.out_dir or tempfile.mkdtemp(prefix="abc_split_")
+        os.makedirs(out_dir, exist_ok=True)
+        pm.openFile(args.scene, force=True)
+        roots = [pm.PyNode(root) for root in args.root]
+
+        single_path = os.path.join(out_dir, "single.abc").replace("\\", "/")
+        start = time.time()
+        PublishCore.run_abc_export(PublishCore.abc_job([root.longName() for root in roots], single_path))
+        single_duration = time.time() - start
+
+        chunks = PublishCore.plan_model_chunks(roots, args.chunks)
+        if len(chunks) == 0:
+            print("Not enough top level groups to split the model")
+            return 1
+        chunk_paths = [os.path.join(out_dir, "split.layer%02d.abc" % i).replace("\\", "/") for i in range(len(chunks))]
+        start = time.time()
+        PublishCore.run_abc_chunk_exports({"chunks": [
+            {"type": "abc_chunk", "job": PublishCore.abc_job(chunk["roots"], path), "prune": chunk["prune"],
+             "path": path} for chunk, path in zip(chunks, chunk_paths)]})
+        split_duration = time.time() - start
+
+        single_hashes = expand_shape_hashes(AssFile, args.kick, out_dir, "single", single_path, [])
+        split_hashes = expand_shape_hashes(AssFile, args.kick, out_dir, "split", chunk_paths[0], chunk_paths[1:])
+        missing = sorted(set(single_hashes) - set(split_hashes))
+        extra = sorted(set(split_hashes) - set(single_hashes))
+        different = sorted(path for path in set(single_hashes) & set(split_hashes)
+                           if single_hashes[path] != split_hashes[path])
+        for label, paths in (("Missing from the split export", missing), ("Only in the split export", extra),
+                             ("Different", different)):
+            for path in paths:
+                print("%s : %s" % (label, path))
+
+        print("Single file : %.2fs, %s bytes" % (single_duration, os.path.getsize(single_path)))
+        print("Split in %s files : %.2fs, %s bytes" % (len(chunk_paths), split_duration,
+                                                       sum(os.path.getsize(path) for path in chunk_paths)))
+        print("%s shapes compared, %s mismatches" % (len(single_hashes), len(missing) + len(extra) + len(different)))
+        return 1 if missing or extra or different else 0
+    finally:
+        maya.standalone.uninitialize()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
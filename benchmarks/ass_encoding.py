@@ -0,0 +1,128 @@
+"""
+Compare the size, write time and parse time of look files in each encoding
+
+Needs the Arnold python module (from MtoA or the Arnold SDK) :
+    python benchmarks/ass_encoding.py path/to/char_operator.v004.ass [more .ass] [--repeat 5] [--json out.json]
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import arnold as ai
+
+# ######################################################################################################################
+
+# Label -> (binary encoding, gzip)
+_ENCODINGS = {
+    "ascii": (False, False),
+    "binary": (True, False),
+    "ascii gzip": (False, True),
+    "binary gzip": (True, True),
+}
+
+
+# ######################################################################################################################
+
+
+def begin():
+    """
+    Start an Arnold session (the signature of AiBegin changed in Arnold 7)
+    :return:
+    """
+    try:
+        ai.AiBegin(ai.AI_SESSION_BATCH)
+    except (AttributeError, TypeError):
+        ai.AiBegin()
+    ai.AiMsgSetConsoleFlags(None, ai.AI_LOG_NONE)
+
+
+def load(path):
+    """
+    Load an ass file in a new universe
+    :param path
+    :return: (universe, duration)
+    """
+    universe = ai.AiUniverse()
+    params = ai.AiParamValueMap()
+    ai.AiParamValueMapSetInt(params, "mask", ai.AI_NODE_ALL)
+    start = time.perf_counter()
+    ai.AiSceneLoad(universe, path, params)
+    duration = time.perf_counter() - start
+    ai.AiParamValueMapDestroy(params)
+    return universe, duration
+
+
+def write(universe, path, binary):
+    """
+    Write a universe to an ass file (gzipped if the path ends with .gz)
+    :param universe
+    :param path
+    :param binary
+    :return: the duration
+    """
+    params = ai.AiParamValueMap()
+    ai.AiParamValueMapSetInt(params, "mask", ai.AI_NODE_ALL)
+    ai.AiParamValueMapSetBool(params, "binary", binary)
+    start = time.perf_counter()
+    ai.AiSceneWrite(universe, path, params)
+    duration = time.perf_counter() - start
+    ai.AiParamValueMapDestroy(params)
+    return duration
+
+
+def benchmark(path, out_dir, repeat):
+    """
+    Benchmark the encodings of one look file
+    :param path
+    :param out_dir
+    :param repeat
+    :return: dict of the results by encoding
+    """
+    results = {}
+    source, _ = load(path)
+    name = os.path.splitext(os.path.basename(path))[0]
+    for label, (binary, compressed) in _ENCODINGS.items():
+        out_path = os.path.join(out_dir, "%s_%s.ass%s" % (name, label.replace(" ", "_"), ".gz" if compressed else ""))
+        write_time = min(write(source, out_path, binary) for _ in range(repeat))
+        parse_times = []
+        for _ in range(repeat):
+            universe, duration = load(out_path)
+            parse_times.append(duration)
+            ai.AiUniverseDestroy(universe)
+        results[label] = {"size": os.path.getsize(out_path), "write_time": write_time,
+                          "parse_time": min(parse_times)}
+    ai.AiUniverseDestroy(source)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark of the look file encodings")
+    parser.add_argument("ass_files", nargs="+")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", default=None, help="write the results to a json file")
+    args = parser.parse_args(argv)
+
+    begin()
+    all_results = {}
+    with tempfile.TemporaryDirectory() as out_dir:
+        for path in args.ass_files:
+            results = benchmark(path, out_dir, args.repeat)
+            all_results[path] = results
+            print(path)
+            print("    %-12s %12s %12s %12s" % ("encoding", "size (KB)", "write (ms)", "parse (ms)"))
+            for label, result in results.items():
+                print("    %-12s %12.1f %12.1f %12.1f" % (label, result["size"] / 1024.0,
+                                                          result["write_time"] * 1000, result["parse_time"] * 1000))
+    ai.AiEnd()
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(all_results, f, indent=4)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
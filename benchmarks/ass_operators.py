@@ -0,0 +1,171 @@
+"""
+Compare the operators of a look built as scene nodes (aiMerge and aiSetParameter) with the ones written directly to
+the look file by AssOperatorWriter, on synthetic characters of the fake scene of fake_maya : same selections and
+assignments, duration and scene nodes created by each path
+
+    python benchmarks/ass_operators.py [--sizes 100 1000 10000] [--repeat 3] [--json out.json]
+"""
+
+import argparse
+import json
+import os
+import shlex
+import shutil
+import sys
+import tempfile
+import time
+
+import fake_maya
+from publish_core import import_package, best_time
+from synthetic_character import build_character
+
+# ######################################################################################################################
+
+# Name of the empty displacement shader in the compared assignments, it differs between both paths
+_EMPTY_DISPLACEMENT = "<empty displacement>"
+
+
+# ######################################################################################################################
+
+
+def unquote(value):
+    """
+    Read the quoted strings of an ass parameter value
+    :param value
+    :return: list of strings
+    """
+    return shlex.split(value, posix=True)
+
+
+def node_operators(pm, standin, empty_displacement):
+    """
+    Read the operators created in the scene for a standin
+    :param pm
+    :param standin
+    :param empty_displacement: name of the empty displacement shader created, None if none
+    :return: sorted list of (selection, assignments)
+    """
+    merge = pm.listConnections(standin + ".operators")[0]
+    operators = []
+    for node in pm.listConnections(merge + ".inputs"):
+        if pm.objectType(node) != "aiSetParameter":
+            continue
+        assignments = []
+        for index in range(8):
+            assignment = pm.getAttr(node + ".assignment[%s]" % index)
+            if assignment is not None:
+                if empty_displacement is not None:
+                    assignment = assignment.replace(empty_displacement, _EMPTY_DISPLACEMENT)
+                assignments.append(assignment)
+        operators.append((pm.getAttr(node + ".selection"), tuple(assignments)))
+    return sorted(operators)
+
+
+def file_operators(ass_file_class, path, empty_displacement):
+    """
+    Read the operators written in a look file
+    :param ass_file_class
+    :param path
+    :param empty_displacement: name of the empty displacement shader written, None if none
+    :return: sorted list of (selection, assignments)
+    """
+    operators = []
+    for node in ass_file_class.read(path).nodes:
+        if node.type != "set_parameter":
+            continue
+        # assignment <count> 1 STRING "..." "..."
+        assignments = unquote(node.get_param("assignment"))[3:]
+        if empty_displacement is not None:
+            assignments = [assignment.replace(empty_displacement, _EMPTY_DISPLACEMENT) for assignment in assignments]
+        operators.append((unquote(node.get_param("selection"))[0], tuple(assignments)))
+    return sorted(operators)
+
+
+def bench_size(scene, pm, modules, mesh_count, repeat):
+    """
+    Build the operators of a synthetic character both ways and compare them
+    :param scene
+    :param pm
+    :param modules: (PublishCore module, AssFile module)
+    :param mesh_count
+    :param repeat
+    :return: dict of the results
+    """
+    publish_core_module, ass_file_module = modules
+    scene.reset()
+    shading_engine_count = max(10, mesh_count // 20)
+    root = build_character(pm, mesh_count, shading_engine_count, shading_engine_count * 3, multi_assignment_ratio=0.2)
+    out_dir = tempfile.mkdtemp(prefix="ass_operators_")
+    try:
+        core = publish_core_module.PublishCore(out_dir, "char")
+        core.set_selection([root])
+        results = {"meshes": mesh_count}
+
+        # Direct path first : the node path connects its empty displacement shader to the shadingEngines
+        direct_standin = pm.createNode("aiStandIn", n="directStandInShape")
+        path = os.path.join(out_dir, "char_operator.ass")
+
+        def write_direct():
+            graph, shaders_used = core.collect_shader_operator(direct_standin, [root])
+            publish_core_module.PublishCore.run_ass_export(shaders_used, path, operators=graph)
+            return graph, shaders_used
+
+        node_count = len(scene.nodes)
+        start = time.perf_counter()
+        graph, direct_shaders = write_direct()
+        results["direct_first"] = time.perf_counter() - start
+        results["direct_nodes_created"] = len(scene.nodes) - node_count
+        results["direct"] = best_time(write_direct, repeat)
+        results["direct_file_size"] = os.path.getsize(path)
+        direct = file_operators(ass_file_module.AssFile, path, graph["empty_displacement"])
+
+        node_count = len(scene.nodes)
+        standin = pm.createNode("aiStandIn", n="nodeStandInShape")
+        start = time.perf_counter()
+        node_shaders = core.build_shader_operator(standin, [root])
+        results["node"] = time.perf_counter() - start
+        results["node_nodes_created"] = len(scene.nodes) - node_count - 2
+        empty_displacements = [name for name in node_shaders if pm.objectType(name) == "displacementShader"
+                               and not pm.listConnections(name + ".displacement", destination=False)
+                               and name not in direct_shaders]
+        empty_displacement = empty_displacements[0] if len(empty_displacements) > 0 else None
+        nodes = node_operators(pm, standin, empty_displacement)
+
+        results["operators"] = len(nodes)
+        results["mismatches"] = len(set(nodes) ^ set(direct))
+        results["shader_mismatches"] = len((set(node_shaders) ^ set(direct_shaders)) - {empty_displacement})
+        return results
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the node and the direct operator paths")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000], help="mesh counts")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", default=None, help="write the results to a json file")
+    args = parser.parse_args(argv)
+
+    scene = fake_maya.install()
+    publish_core_module, _ = import_package()
+    modules = (publish_core_module, sys.modules[publish_core_module.__package__ + ".AssFile"])
+    pm = sys.modules["pymel.core"]
+
+    results = []
+    print("%8s %10s %12s %12s %12s %12s %10s" % ("meshes", "operators", "nodes (s)", "direct (s)", "nodes made",
+                                                 "direct made", "mismatch"))
+    for size in args.sizes:
+        result = bench_size(scene, pm, modules, size, args.repeat)
+        results.append(result)
+        print("%8s %10s %12.4f %12.4f %12s %12s %10s" % (
+            size, result["operators"], result["node"], result["direct"], result["node_nodes_created"],
+            result["direct_nodes_created"], result["mismatches"] + result["shader_mismatches"]))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=4)
+    return 1 if any(result["mismatches"] + result["shader_mismatches"] > 0 for result in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
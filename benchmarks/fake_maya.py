@@ -0,0 +1,899 @@
+"""
+In-memory stand-in of the pymel and OpenMaya (API 1.0) surface used by the publisher, to run and time the publish
+logic outside of Maya. Nodes, attributes and connections live in a FakeScene, DG callbacks are fired on node and
+connection changes, and the file commands (AbcExport, arnoldExportAss, exportAll) only record their arguments.
+
+    import fake_maya
+    scene = fake_maya.install()  # before importing the package
+    ...
+    scene.calls  # [(command, args, kwargs)]
+
+Only what the publisher calls is implemented, with the behaviour it relies on
+"""
+
+import re
+import sys
+import types
+from collections import deque
+
+# ######################################################################################################################
+
+_DAG_TYPES = {"transform", "mesh", "nurbsCurve", "aiStandIn"}
+_SHAPE_TYPES = {"mesh", "nurbsCurve", "aiStandIn"}
+
+# Attributes of each node type with their default value. Multi attributes are used with an index : inputs[0]
+_TYPE_ATTRS = {
+    "transform": {"visibility": True},
+    "mesh": {"intermediateObject": False, "castsShadows": True, "aiSubdivType": 0, "aiSubdivIterations": 0,
+             "aiDispHeight": 1.0, "ai_sss_setname": "", "instObjGroups": None, "faceCount": 0, "colorSets": ()},
+    "shadingEngine": {"surfaceShader": None, "aiSurfaceShader": None, "displacementShader": None,
+                      "dagSetMembers": None},
+    "aiStandardSurface": {"outColor": None, "baseColor": None},
+    "lambert": {"outColor": None, "color": None},
+    "file": {"fileTextureName": "", "computedFileTextureNamePattern": "", "uvTilingMode": 0, "colorSpace": "sRGB",
+             "ignoreColorSpaceFileRules": 0, "outColor": None, "outAlpha": None, "uvCoord": None},
+    "aiImage": {"filename": "", "colorSpace": "sRGB", "ignoreColorSpaceFileRules": 0, "outColor": None,
+                "uvcoords": None},
+    "place2dTexture": {"outUV": None},
+    "aiColorCorrect": {"input": None, "outColor": None},
+    "layeredTexture": {"inputs": None, "outColor": None},
+    "displacementShader": {"displacement": None, "aiDisplacementAutoBump": False},
+    "aiStandIn": {"dso": "", "abcLayers": "", "operators": None},
+    "aiMerge": {"inputs": None, "out": None},
+    "aiSetParameter": {"selection": "", "assignment": None, "out": None},
+    "aiIncludeGraph": {"filename": "", "out": None},
+}
+_COMMON_ATTRS = {"message": None}
+
+
+# ######################################################################################################################
+
+
+class FakeNode:
+    """
+    Node of the fake scene, also used as pymel PyNode
+    """
+
+    def __init__(self, scene, name, node_type, parent=None):
+        self._scene = scene
+        self._name = name
+        self._type = node_type
+        self._parent = parent
+        self._children = []
+        self._values = {}
+        self._dynamic_attrs = {}
+        # dst attribute -> (src node, src attribute)
+        self._inputs = {}
+        # src attribute -> list of (dst node, dst attribute)
+        self._outputs = {}
+        self._alive = True
+
+    # Pymel interface
+
+    def name(self):
+        return self._name
+
+    def nodeName(self):
+        return self._name
+
+    def longName(self):
+        if self._type not in _DAG_TYPES:
+            return self._name
+        names = []
+        node = self
+        while node is not None:
+            names.append(node._name)
+            node = node._parent
+        return "|" + "|".join(reversed(names))
+
+    def fullPath(self):
+        return self.longName()
+
+    def type(self):
+        return self._type
+
+    def nodeType(self):
+        return self._type
+
+    def getParent(self):
+        return self._parent
+
+    def getChildren(self, type=None):
+        return [child for child in self._children if type is None or child._type == type]
+
+    def getShape(self):
+        shapes = [child for child in self._children if child._type in _SHAPE_TYPES]
+        return shapes[0] if shapes else None
+
+    def hasAttr(self, attr):
+        base = re.split(r"[\[.]", attr)[0]
+        return base in _TYPE_ATTRS.get(self._type, {}) or base in self._dynamic_attrs or base in _COMMON_ATTRS
+
+    def attr(self, attr):
+        if not self.hasAttr(attr):
+            raise AttributeError("%s has no attribute %s" % (self._name, attr))
+        return FakeAttribute(self, attr)
+
+    def listConnections(self, **kwargs):
+        return _list_connections([self], **kwargs)
+
+    def __getattr__(self, attr):
+        if attr.startswith("_"):
+            raise AttributeError(attr)
+        return self.attr(attr)
+
+    # Fake scene internals
+
+    def _get_value(self, attr):
+        if self._scene.layer_overrides:
+            override = self._scene.layer_overrides.get((self._scene.render_layer, self._name, attr))
+            if override is not None:
+                return override
+        if attr in self._values:
+            return self._values[attr]
+        base = re.split(r"[\[.]", attr)[0]
+        if base in self._dynamic_attrs:
+            return self._dynamic_attrs[base]
+        return _TYPE_ATTRS.get(self._type, {}).get(base)
+
+    def __str__(self):
+        return self._name
+
+    def __repr__(self):
+        return "FakeNode(%r)" % self._name
+
+    def __add__(self, other):
+        return str(self) + other
+
+    def __radd__(self, other):
+        return other + str(self)
+
+
+class FakeAttribute:
+    """
+    Attribute of a fake node, also used as pymel Attribute
+    """
+
+    def __init__(self, node, attr):
+        self._node = node
+        self._attr = attr
+
+    def node(self):
+        return self._node
+
+    def name(self):
+        return "%s.%s" % (self._node, self._attr)
+
+    def attrName(self):
+        return self._attr
+
+    def get(self):
+        return self._node._get_value(self._attr)
+
+    def set(self, value, **kwargs):
+        self._node._values[self._attr] = value
+
+    def __matching(self, connections):
+        return [item for attr, item in connections if attr == self._attr or attr.startswith(self._attr + "[")]
+
+    def isConnected(self):
+        return len(self.inputs()) > 0 or len(self.outputs()) > 0
+
+    def inputs(self):
+        return [src for src, _ in self.__matching(self._node._inputs.items())]
+
+    def outputs(self):
+        return [dst for dsts in self.__matching(self._node._outputs.items()) for dst, _ in dsts]
+
+    def __str__(self):
+        return self.name()
+
+    def __repr__(self):
+        return "FakeAttribute(%r)" % self.name()
+
+    def __add__(self, other):
+        return str(self) + other
+
+    def __radd__(self, other):
+        return other + str(self)
+
+
+# ######################################################################################################################
+
+
+class FakeScene:
+    """
+    Nodes and connections of the fake Maya session
+    """
+
+    def __init__(self):
+        self.nodes = {}
+        self.selection = []
+        self.calls = []
+        self.render_layer = "defaultRenderLayer"
+        # (render layer, node name, attribute) -> value overridden in the layer
+        self.layer_overrides = {}
+        self.scene_name = ""
+        self.callbacks = {}
+        self.__next_callback_id = 1
+        self.__long_names = None
+
+    def reset(self):
+        """
+        Empty the scene, the callbacks are kept
+        :return:
+        """
+        for node in self.nodes.values():
+            node._alive = False
+        self.nodes = {}
+        self.selection = []
+        self.calls = []
+        self.render_layer = "defaultRenderLayer"
+        self.layer_overrides = {}
+        self.__long_names = None
+
+    def unique_name(self, name):
+        """
+        Get a free node name, a number is appended or incremented like Maya does
+        :param name
+        :return:
+        """
+        if name not in self.nodes:
+            return name
+        base = re.sub(r"[0-9]+$", "", name)
+        i = 1
+        while "%s%s" % (base, i) in self.nodes:
+            i += 1
+        return "%s%s" % (base, i)
+
+    def create_node(self, node_type, name=None, parent=None):
+        """
+        Create a node, shapes created without parent get a transform like in Maya
+        :param node_type
+        :param name
+        :param parent
+        :return:
+        """
+        if node_type in _SHAPE_TYPES and parent is None:
+            parent = self.create_node("transform", "transform1")
+        node = FakeNode(self, self.unique_name(name or node_type + "1"), node_type, parent)
+        self.nodes[node._name] = node
+        if parent is not None:
+            parent._children.append(node)
+        self.__long_names = None
+        self.fire("node_added", node)
+        return node
+
+    def delete(self, node):
+        """
+        Delete a node, its children and its connections
+        :param node
+        :return:
+        """
+        for child in list(node._children):
+            self.delete(child)
+        for dst_attr, (src, src_attr) in list(node._inputs.items()):
+            self.disconnect(src, src_attr, node, dst_attr)
+        for src_attr, dsts in list(node._outputs.items()):
+            for dst, dst_attr in list(dsts):
+                self.disconnect(node, src_attr, dst, dst_attr)
+        if node._parent is not None:
+            node._parent._children.remove(node)
+        self.fire("node_removed", node)
+        node._alive = False
+        del self.nodes[node._name]
+        self.__long_names = None
+
+    def rename(self, node, name):
+        """
+        Rename a node
+        :param node
+        :param name
+        :return:
+        """
+        del self.nodes[node._name]
+        node._name = self.unique_name(name)
+        self.nodes[node._name] = node
+        self.__long_names = None
+        return node
+
+    def find(self, name):
+        """
+        Find a node by name or full path
+        :param name
+        :return: the node or None
+        """
+        if name.startswith("|"):
+            if self.__long_names is None:
+                self.__long_names = {node.longName(): node for node in self.nodes.values() if node._type in _DAG_TYPES}
+            return self.__long_names.get(name)
+        if "|" in name:
+            return self.find("|" + name.lstrip("|"))
+        return self.nodes.get(name)
+
+    def connect(self, src, src_attr, dst, dst_attr, force=False):
+        """
+        Connect two attributes
+        :param src
+        :param src_attr
+        :param dst
+        :param dst_attr
+        :param force: replace the existing input of the destination
+        :return:
+        """
+        if dst_attr in dst._inputs:
+            if not force:
+                raise RuntimeError("%s.%s is already connected" % (dst, dst_attr))
+            self.disconnect(*dst._inputs[dst_attr], dst, dst_attr)
+        dst._inputs[dst_attr] = (src, src_attr)
+        src._outputs.setdefault(src_attr, []).append((dst, dst_attr))
+        self.fire("connection", src, src_attr, dst, dst_attr, True)
+
+    def disconnect(self, src, src_attr, dst, dst_attr):
+        """
+        Break a connection
+        :param src
+        :param src_attr
+        :param dst
+        :param dst_attr
+        :return:
+        """
+        del dst._inputs[dst_attr]
+        src._outputs[src_attr].remove((dst, dst_attr))
+        if len(src._outputs[src_attr]) == 0:
+            del src._outputs[src_attr]
+        self.fire("connection", src, src_attr, dst, dst_attr, False)
+
+    def add_callback(self, kind, function, node_type=None):
+        """
+        Register a DG callback
+        :param kind: node_added, node_removed or connection
+        :param function
+        :param node_type
+        :return: the callback id
+        """
+        callback_id = self.__next_callback_id
+        self.__next_callback_id += 1
+        self.callbacks[callback_id] = (kind, function, node_type)
+        return callback_id
+
+    def fire(self, kind, *args):
+        """
+        Call the callbacks of an event
+        :param kind
+        :param args
+        :return:
+        """
+        for callback_kind, function, node_type in list(self.callbacks.values()):
+            if callback_kind != kind:
+                continue
+            if kind == "connection":
+                src, src_attr, dst, dst_attr, made = args
+                function(MPlug(src, src_attr), MPlug(dst, dst_attr), made, None)
+            elif node_type is None or args[0]._type == node_type:
+                function(MObject(args[0]), None)
+
+    def record(self, command, *args, **kwargs):
+        """
+        Record a file command
+        :param command
+        :param args
+        :param kwargs
+        :return:
+        """
+        self.calls.append((command, args, kwargs))
+
+
+_scene = FakeScene()
+
+
+# ######################################################################################################################
+# pymel.core
+
+
+class MayaNodeError(Exception):
+    pass
+
+
+def _to_node(item):
+    if isinstance(item, FakeNode):
+        return item
+    if isinstance(item, FakeAttribute):
+        return item.node()
+    node = _scene.find(str(item).split(".")[0])
+    if node is None:
+        raise MayaNodeError(str(item))
+    return node
+
+
+def _to_plug(item):
+    if isinstance(item, FakeAttribute):
+        return item.node(), item.attrName()
+    node_name, _, attr = str(item).partition(".")
+    node = _to_node(node_name)
+    if not node.hasAttr(attr):
+        raise RuntimeError("No attribute %s on %s" % (attr, node))
+    return node, attr
+
+
+def _flatten(items):
+    if isinstance(items, (list, tuple, set)):
+        return [item for sub_items in items for item in _flatten(sub_items)]
+    return [items]
+
+
+def PyNode(name):
+    if isinstance(name, (FakeNode, FakeAttribute)):
+        return name
+    if "." in str(name):
+        return FakeAttribute(*_to_plug(name))
+    return _to_node(name)
+
+
+def ls(*args, selection=False, type=None, long=False, **kwargs):
+    nodes = list(_scene.selection) if selection else \
+        [_to_node(item) for item in _flatten(list(args))] if args else list(_scene.nodes.values())
+    types_filter = _flatten(type) if type is not None else None
+    return [node for node in nodes if types_filter is None or node._type in types_filter]
+
+
+def select(*args, **kwargs):
+    _scene.selection = [_to_node(item) for item in _flatten(list(args))]
+
+
+def listRelatives(nodes, allDescendents=False, shapes=False, children=False, parent=False, type=None, **kwargs):
+    result = []
+    for node in [_to_node(item) for item in _flatten(nodes)]:
+        if parent:
+            related = [node._parent] if node._parent is not None else []
+        elif allDescendents:
+            related = []
+            stack = list(reversed(node._children))
+            while stack:
+                child = stack.pop()
+                related.append(child)
+                stack.extend(reversed(child._children))
+        else:
+            related = node._children
+        result += [n for n in related if (not shapes or n._type in _SHAPE_TYPES) and (type is None or n._type == type)]
+    return result
+
+
+def _list_connections(items, type=None, source=True, destination=True, plugs=False, **kwargs):
+    result = []
+    for item in _flatten(items):
+        if isinstance(item, FakeAttribute) or (isinstance(item, str) and "." in item):
+            node, attr = _to_plug(item)
+            matches = (lambda a, attr=attr: a == attr or a.startswith(attr + "["))
+        else:
+            node = _to_node(item)
+            matches = (lambda a: True)
+        if source:
+            result += [(src, src_attr) for dst_attr, (src, src_attr) in node._inputs.items() if matches(dst_attr)]
+        if destination:
+            result += [(dst, dst_attr) for src_attr, dsts in node._outputs.items() if matches(src_attr)
+                       for dst, dst_attr in dsts]
+    return [FakeAttribute(node, attr) if plugs else node for node, attr in result
+            if type is None or node._type == type]
+
+
+def listConnections(items, **kwargs):
+    return _list_connections(items, **kwargs)
+
+
+def listHistory(items, **kwargs):
+    result = []
+    visited = set()
+    pending = deque(_to_node(item) for item in _flatten(items))
+    while pending:
+        node = pending.popleft()
+        if id(node) in visited:
+            continue
+        visited.add(id(node))
+        result.append(node)
+        pending.extend(src for src, _ in node._inputs.values())
+    return result
+
+
+def createNode(node_type, n=None, name=None, parent=None, **kwargs):
+    return _scene.create_node(node_type, n or name, _to_node(parent) if parent is not None else None)
+
+
+def shadingNode(node_type, asShader=False, asTexture=False, asUtility=False, n=None, name=None, **kwargs):
+    return createNode(node_type, n=n or name)
+
+
+def addAttr(node, ln=None, longName=None, attributeType=None, dataType=None, defaultValue=None, **kwargs):
+    _to_node(node)._dynamic_attrs[ln or longName] = defaultValue
+
+
+def connectAttr(src, dst, f=False, force=False):
+    src_node, src_attr = _to_plug(src)
+    dst_node, dst_attr = _to_plug(dst)
+    _scene.connect(src_node, src_attr, dst_node, dst_attr, f or force)
+
+
+def disconnectAttr(src, dst):
+    src_node, src_attr = _to_plug(src)
+    dst_node, dst_attr = _to_plug(dst)
+    _scene.disconnect(src_node, src_attr, dst_node, dst_attr)
+
+
+def setAttr(plug, *values, type=None, **kwargs):
+    node, attr = _to_plug(plug)
+    node._values[attr] = values[0] if len(values) == 1 else values
+
+
+def getAttr(plug, **kwargs):
+    return FakeAttribute(*_to_plug(plug)).get()
+
+
+def objectType(node, isType=None):
+    node_type = _to_node(node)._type
+    return node_type == isType if isType is not None else node_type
+
+
+def delete(items):
+    for node in [_to_node(item) for item in _flatten(items)]:
+        if node._alive:
+            _scene.delete(node)
+
+
+def rename(node, name):
+    return _scene.rename(_to_node(node), name)
+
+
+def polyEvaluate(node, face=False, **kwargs):
+    meshes = [n for n in [_to_node(node)] + listRelatives(node, allDescendents=True) if n._type == "mesh"]
+    if len(meshes) == 0:
+        return "Nothing counted : no polygonal object is selected."
+    return sum(mesh._get_value("faceCount") for mesh in meshes)
+
+
+def warning(message):
+    print("Warning: %s" % message)
+
+
+def about(version=False, **kwargs):
+    return "fake"
+
+
+def editRenderLayerGlobals(query=False, currentRenderLayer=None, **kwargs):
+    if query:
+        return _scene.render_layer
+    _scene.render_layer = currentRenderLayer
+
+
+def AbcExport(j=None, **kwargs):
+    _scene.record("AbcExport", j=j)
+
+
+def exportAll(path, **kwargs):
+    _scene.record("exportAll", path, **kwargs)
+
+
+def arnoldExportAss(*args, **kwargs):
+    _scene.record("arnoldExportAss", *args, **kwargs)
+
+
+# ######################################################################################################################
+# maya.OpenMaya (API 1.0)
+
+
+class MFn:
+    kInvalid = 0
+    kDagNode = 1
+    kTransform = 2
+    kMesh = 3
+    kShadingEngine = 4
+    kShape = 5
+
+
+_FN_TYPES = {
+    MFn.kDagNode: _DAG_TYPES,
+    MFn.kTransform: {"transform"},
+    MFn.kMesh: {"mesh"},
+    MFn.kShadingEngine: {"shadingEngine"},
+    MFn.kShape: _SHAPE_TYPES,
+}
+
+
+def _has_fn(node, fn):
+    return fn == MFn.kInvalid or node._type in _FN_TYPES.get(fn, ())
+
+
+class MObject:
+    def __init__(self, node=None):
+        self._node = node
+
+    def hasFn(self, fn):
+        return self._node is not None and _has_fn(self._node, fn)
+
+    def isNull(self):
+        return self._node is None
+
+
+class MObjectHandle:
+    def __init__(self, obj):
+        self._node = obj._node
+
+    def hashCode(self):
+        return id(self._node)
+
+    def isValid(self):
+        return self._node is not None and self._node._alive
+
+    def object(self):
+        return MObject(self._node)
+
+
+class MDagPath:
+    def __init__(self, node=None):
+        self._node = node
+
+    def fullPathName(self):
+        return self._node.longName()
+
+    def node(self):
+        return MObject(self._node)
+
+    def instanceNumber(self):
+        return 0
+
+    def hasFn(self, fn):
+        return _has_fn(self._node, fn)
+
+
+class MSelectionList:
+    def __init__(self):
+        self.__nodes = []
+
+    def add(self, name):
+        node = _scene.find(name)
+        if node is None:
+            raise RuntimeError("(kInvalidParameter): Object does not exist : %s" % name)
+        self.__nodes.append(node)
+
+    def length(self):
+        return len(self.__nodes)
+
+    def getDependNode(self, i, obj):
+        obj._node = self.__nodes[i]
+
+    def getDagPath(self, i, path):
+        if self.__nodes[i]._type not in _DAG_TYPES:
+            raise RuntimeError("(kInvalidParameter): not a dag node")
+        path._node = self.__nodes[i]
+
+
+class MStringArray(list):
+    def length(self):
+        return len(self)
+
+
+class MPlug:
+    def __init__(self, node, attr):
+        self._node = node
+        self._attr = attr
+
+    def node(self):
+        return MObject(self._node)
+
+    def name(self):
+        return "%s.%s" % (self._node, self._attr)
+
+    def connectedTo(self, plugs, as_dst, as_src):
+        plugs.clear()
+        if as_dst and self._attr in self._node._inputs:
+            plugs.append(MPlug(*self._node._inputs[self._attr]))
+        if as_src:
+            plugs.extend(MPlug(dst, dst_attr) for dst, dst_attr in self._node._outputs.get(self._attr, []))
+
+    def asString(self):
+        return str(self._node._get_value(self._attr))
+
+    def asFloat(self):
+        return float(self._node._get_value(self._attr))
+
+    def asInt(self):
+        return int(self._node._get_value(self._attr))
+
+    def asBool(self):
+        return bool(self._node._get_value(self._attr))
+
+
+class MPlugArray(list):
+    def length(self):
+        return len(self)
+
+
+class MFnDependencyNode:
+    def __init__(self, obj=None):
+        self._node = obj._node if obj is not None else None
+
+    def setObject(self, obj):
+        self._node = obj._node
+
+    def name(self):
+        return self._node._name
+
+    def typeName(self):
+        return self._node._type
+
+    def findPlug(self, attr, want_networked=False):
+        if not self._node.hasAttr(attr):
+            raise RuntimeError("(kInvalidParameter): No attribute %s" % attr)
+        return MPlug(self._node, attr)
+
+    def getConnections(self, plugs):
+        plugs.clear()
+        attrs = list(self._node._inputs) + [attr for attr in self._node._outputs if attr not in self._node._inputs]
+        plugs.extend(MPlug(self._node, attr) for attr in attrs)
+
+
+class MFnDagNode(MFnDependencyNode):
+    def fullPathName(self):
+        return self._node.longName()
+
+    def parentNamespace(self):
+        return self._node._name.rpartition(":")[0]
+
+
+class MFnMesh(MFnDagNode):
+    def isIntermediateObject(self):
+        return bool(self._node._get_value("intermediateObject"))
+
+    def getColorSetNames(self, names):
+        names.clear()
+        names.extend(self._node._get_value("colorSets") or ())
+
+    def numPolygons(self):
+        return int(self._node._get_value("faceCount"))
+
+    def numFaceVertices(self):
+        # Meshes of quads
+        return 4 * int(self._node._get_value("faceCount"))
+
+
+class MItDag:
+    kDepthFirst = 0
+    kBreadthFirst = 1
+
+    def __init__(self, traversal=kDepthFirst, fn=MFn.kInvalid):
+        self.__paths = []
+        self.__index = 0
+
+    def reset(self, root_path, traversal=kDepthFirst, fn=MFn.kInvalid):
+        self.__paths = []
+        self.__index = 0
+        stack = [root_path._node]
+        while stack:
+            node = stack.pop()
+            if _has_fn(node, fn):
+                self.__paths.append(node)
+            stack.extend(reversed(node._children))
+
+    def isDone(self):
+        return self.__index >= len(self.__paths)
+
+    def next(self):
+        self.__index += 1
+
+    def getPath(self, path):
+        path._node = self.__paths[self.__index]
+
+    def currentItem(self):
+        return MObject(self.__paths[self.__index])
+
+
+class MItDependencyGraph:
+    kDownstream = 0
+    kUpstream = 1
+    kDepthFirst = 0
+    kBreadthFirst = 1
+    kNodeLevel = 0
+    kPlugLevel = 1
+
+    def __init__(self, root, fn=MFn.kInvalid, direction=kDownstream, traversal=kDepthFirst, level=kNodeLevel):
+        self.__fn = fn
+        self.__upstream = direction == MItDependencyGraph.kUpstream
+        self.__breadth_first = traversal == MItDependencyGraph.kBreadthFirst
+        self.__pending = deque([root._node])
+        self.__visited = {id(root._node)}
+        self.__current = None
+        self.__pruned = False
+        self.__advance()
+
+    def __expand(self, node):
+        if self.__upstream:
+            neighbours = [src for src, _ in node._inputs.values()]
+        else:
+            neighbours = [dst for dsts in node._outputs.values() for dst, _ in dsts]
+        for neighbour in neighbours:
+            if id(neighbour) not in self.__visited:
+                self.__visited.add(id(neighbour))
+                self.__pending.append(neighbour)
+
+    def __advance(self):
+        while self.__pending:
+            node = self.__pending.popleft() if self.__breadth_first else self.__pending.pop()
+            self.__current = node
+            if _has_fn(node, self.__fn):
+                return
+            self.__expand(node)
+        self.__current = None
+
+    def isDone(self):
+        return self.__current is None
+
+    def currentItem(self):
+        return MObject(self.__current)
+
+    def prune(self):
+        self.__pruned = True
+
+    def next(self):
+        if not self.__pruned:
+            self.__expand(self.__current)
+        self.__pruned = False
+        self.__advance()
+
+
+class MDGMessage:
+    @staticmethod
+    def addNodeAddedCallback(function, node_type="dependNode", client_data=None):
+        return _scene.add_callback("node_added", function, None if node_type == "dependNode" else node_type)
+
+    @staticmethod
+    def addNodeRemovedCallback(function, node_type="dependNode", client_data=None):
+        return _scene.add_callback("node_removed", function, None if node_type == "dependNode" else node_type)
+
+    @staticmethod
+    def addConnectionCallback(function, client_data=None):
+        return _scene.add_callback("connection", function)
+
+
+class MMessage:
+    @staticmethod
+    def removeCallback(callback_id):
+        _scene.callbacks.pop(callback_id, None)
+
+
+# ######################################################################################################################
+
+
+def install():
+    """
+    Register the fake pymel.core, maya.OpenMaya and maya.api.OpenMaya modules
+    :return: the fake scene
+    """
+    this_module = sys.modules[__name__]
+
+    pymel_core = types.ModuleType("pymel.core")
+    for name in ("MayaNodeError", "PyNode", "ls", "select", "listRelatives", "listConnections", "listHistory",
+                 "createNode", "shadingNode", "addAttr", "connectAttr", "disconnectAttr", "setAttr", "getAttr",
+                 "objectType", "delete", "rename", "polyEvaluate", "warning", "about", "editRenderLayerGlobals",
+                 "AbcExport", "exportAll"):
+        setattr(pymel_core, name, getattr(this_module, name))
+    pymel_core.other = types.SimpleNamespace(arnoldExportAss=arnoldExportAss)
+    pymel_core.system = types.SimpleNamespace(sceneName=lambda: _scene.scene_name)
+    pymel_core.mel = types.SimpleNamespace(eval=lambda command: 0)
+    pymel = types.ModuleType("pymel")
+    pymel.core = pymel_core
+
+    open_maya = types.ModuleType("maya.OpenMaya")
+    for name in ("MFn", "MObject", "MObjectHandle", "MDagPath", "MSelectionList", "MStringArray", "MPlug",
+                 "MPlugArray", "MFnDependencyNode", "MFnDagNode", "MFnMesh", "MItDag", "MItDependencyGraph",
+                 "MDGMessage", "MMessage"):
+        setattr(open_maya, name, getattr(this_module, name))
+    # API 2.0 is only used to hash the meshes before an alembic export
+    open_maya_2 = types.ModuleType("maya.api.OpenMaya")
+    maya_api = types.ModuleType("maya.api")
+    maya_api.OpenMaya = open_maya_2
+    maya = types.ModuleType("maya")
+    maya.OpenMaya = open_maya
+    maya.api = maya_api
+
+    sys.modules.update({"pymel": pymel, "pymel.core": pymel_core, "maya": maya, "maya.OpenMaya": open_maya,
+                        "maya.api": maya_api, "maya.api.OpenMaya": open_maya_2})
+    return _scene
@@ -0,0 +1,167 @@
+"""
+Publish the looks of a synthetic character in two render layers of the fake scene of fake_maya, the second layer
+overriding the subdivision and the shadows of some meshes. The operators of each look file must match the ones built
+from the meshes read in its layer : the meshes read for the first look must not be reused by the other layer
+
+    python benchmarks/look_layers.py [--sizes 100 1000] [--overrides 0.2] [--json out.json]
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+
+import fake_maya
+from ass_operators import file_operators
+from publish_core import import_package
+from synthetic_character import build_character
+
+# ######################################################################################################################
+
+_BASE_LAYER = "defaultRenderLayer"
+_HERO_LAYER = "heroLayer"
+# Empty displacement shader of the operators, named after the standin
+_EMPTY_DISPLACEMENT_PREFIX = "emptyDisplacement_"
+
+
+# ######################################################################################################################
+
+
+def override_meshes(scene, pm, root, ratio, seed=0):
+    """
+    Override the subdivision and the shadows of some meshes in the hero layer
+    :param scene
+    :param pm
+    :param root
+    :param ratio: ratio of meshes overridden
+    :param seed
+    :return: number of meshes overridden
+    """
+    rng = random.Random(seed)
+    meshes = pm.listRelatives(root, allDescendents=True, type="mesh")
+    overridden = 0
+    for mesh in meshes:
+        if rng.random() >= ratio:
+            continue
+        scene.layer_overrides[(_HERO_LAYER, mesh.name(), "aiSubdivType")] = 1
+        scene.layer_overrides[(_HERO_LAYER, mesh.name(), "aiSubdivIterations")] = 3
+        scene.layer_overrides[(_HERO_LAYER, mesh.name(), "castsShadows")] = False
+        overridden += 1
+    return overridden
+
+
+def read_look_operators(ass_file_class, path, empty_displacement=None):
+    """
+    Read the operators of a look file
+    :param ass_file_class
+    :param path
+    :param empty_displacement: name of the empty displacement shader, found in the file if None
+    :return: sorted list of (selection, assignments)
+    """
+    if empty_displacement is None:
+        names = [node.name for node in ass_file_class.read(path).nodes
+                 if node.name.startswith(_EMPTY_DISPLACEMENT_PREFIX)]
+        empty_displacement = names[0] if len(names) > 0 else None
+    return file_operators(ass_file_class, path, empty_displacement)
+
+
+def expected_operators(scene, publish_core_module, ass_file_class, out_dir, root, render_layer):
+    """
+    Build the operators of a look from the meshes read in its render layer by a new publish
+    :param scene
+    :param publish_core_module
+    :param ass_file_class
+    :param out_dir
+    :param root
+    :param render_layer
+    :return: sorted list of (selection, assignments)
+    """
+    previous_layer = scene.render_layer
+    scene.render_layer = render_layer
+    try:
+        core = publish_core_module.PublishCore(out_dir, "char")
+        standin = sys.modules["pymel.core"].createNode("aiStandIn", n="expectedStandInShape")
+        graph, shaders_used = core.collect_shader_operator(standin, [root])
+        path = os.path.join(out_dir, "expected_%s.ass" % render_layer)
+        publish_core_module.PublishCore.run_ass_export(shaders_used, path, operators=graph)
+        return read_look_operators(ass_file_class, path, graph["empty_displacement"])
+    finally:
+        scene.render_layer = previous_layer
+
+
+def bench_size(scene, pm, modules, mesh_count, override_ratio):
+    """
+    Publish the looks of both layers on a synthetic character and compare their operators with the expected ones
+    :param scene
+    :param pm
+    :param modules: (PublishCore module, AssFile module)
+    :param mesh_count
+    :param override_ratio
+    :return: dict of the results
+    """
+    publish_core_module, ass_file_module = modules
+    scene.reset()
+    shading_engine_count = max(10, mesh_count // 20)
+    root = build_character(pm, mesh_count, shading_engine_count, shading_engine_count * 3)
+    overridden = override_meshes(scene, pm, root, override_ratio)
+    out_dir = tempfile.mkdtemp(prefix="look_layers_")
+    try:
+        core = publish_core_module.PublishCore(out_dir, "char")
+        core.set_selection([root])
+        core.set_publish_uv(False)
+        core.set_publish_look(True)
+        core.set_direct_operators(True)
+        core.set_staging(False)
+        core.set_looks([("base", _BASE_LAYER), ("hero", _HERO_LAYER)])
+        assert core.publish(), "Publish aborted"
+        timings = core.get_look_timings()
+
+        results = {"meshes": mesh_count, "overridden": overridden, "mismatches": 0}
+        for look_name, render_layer in (("base", _BASE_LAYER), ("hero", _HERO_LAYER)):
+            look_paths = [os.path.join(dir_path, file_name) for dir_path, _, file_names in os.walk(out_dir)
+                          for file_name in file_names if file_name.startswith("char_%s_operator" % look_name)
+                          and file_name.endswith(".ass")]
+            assert len(look_paths) == 1, "Look files of %s : %s" % (look_name, look_paths)
+            published = read_look_operators(ass_file_module.AssFile, look_paths[0])
+            expected = expected_operators(scene, publish_core_module, ass_file_module.AssFile, out_dir, root,
+                                          render_layer)
+            results[look_name] = timings[look_name]
+            results["mismatches"] += len(set(published) ^ set(expected))
+            results["%s_operators" % look_name] = published
+        # The overrides must change the operators of the hero look
+        results["layers_differ"] = results.pop("base_operators") != results.pop("hero_operators")
+        return results
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check the looks published in two render layers")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000], help="mesh counts")
+    parser.add_argument("--overrides", type=float, default=0.2, help="ratio of meshes overridden in the hero layer")
+    parser.add_argument("--json", default=None, help="write the results to a json file")
+    args = parser.parse_args(argv)
+
+    scene = fake_maya.install()
+    publish_core_module, _ = import_package()
+    modules = (publish_core_module, sys.modules[publish_core_module.__package__ + ".AssFile"])
+    pm = sys.modules["pymel.core"]
+
+    results = [bench_size(scene, pm, modules, size, args.overrides) for size in args.sizes]
+    print("%8s %12s %12s %12s %14s %10s" % ("meshes", "overridden", "base (s)", "hero (s)", "layers differ",
+                                            "mismatch"))
+    for result in results:
+        print("%8s %12s %12.4f %12.4f %14s %10s" % (result["meshes"], result["overridden"], result["base"],
+                                                    result["hero"], result["layers_differ"], result["mismatches"]))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=4)
+    return 0 if all(result["mismatches"] == 0 and result["layers_differ"] for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
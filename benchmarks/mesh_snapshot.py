@@ -0,0 +1,139 @@
+"""
+Time the mesh snapshot (one OpenMaya pass over the shapes) against the per-mesh pymel attribute reads it replaced,
+on synthetic characters of the fake scene of fake_maya. Both must give the same attributes. The fake pymel calls
+cost about as much as the fake API calls, the pymel calls counted give the per-mesh cost in Maya
+
+    python benchmarks/mesh_snapshot.py [--sizes 1000 10000] [--repeat 3] [--json out.json]
+"""
+
+import argparse
+import functools
+import importlib
+import json
+import sys
+
+import fake_maya
+from publish_core import import_package, best_time, _PACKAGE_NAME
+from synthetic_character import build_character
+
+
+# ######################################################################################################################
+
+
+def read_per_mesh(pm, root):
+    """
+    Read the attributes of the meshes with a pymel call per attribute, as the operators build did
+    :param pm
+    :param root
+    :return: dict long name -> attributes
+    """
+    meshes = pm.listRelatives(root, allDescendents=True, type="mesh", fullPath=True)
+    attributes = {}
+    for mesh in meshes:
+        if "ShapeOrig" in mesh.name():
+            continue
+        attributes[mesh.longName()] = (
+            mesh.attr("ai_sss_setname").get() if mesh.hasAttr("ai_sss_setname") else "",
+            float(mesh.attr("aiDispHeight").get()) if mesh.hasAttr("aiDispHeight") else 1.0,
+            bool(mesh.attr("castsShadows").get()),
+            int(mesh.attr("aiSubdivType").get()) if mesh.hasAttr("aiSubdivType") else 0,
+            int(mesh.attr("aiSubdivIterations").get()) if mesh.hasAttr("aiSubdivIterations") else 0,
+            tuple(sorted(set(str(sg) for sg in pm.listConnections(mesh, type="shadingEngine")))),
+        )
+    return attributes
+
+
+def count_pymel_calls(pm, function):
+    """
+    Count the pymel calls made by a function : attribute reads and connection queries
+    :param pm
+    :param function
+    :return:
+    """
+    calls = [0]
+
+    def counted(method):
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            calls[0] += 1
+            return method(*args, **kwargs)
+        return wrapper
+
+    patched = [(fake_maya.FakeNode, "hasAttr"), (fake_maya.FakeNode, "longName"), (fake_maya.FakeAttribute, "get"),
+               (pm, "listConnections")]
+    originals = [getattr(owner, name) for owner, name in patched]
+    for (owner, name), original in zip(patched, originals):
+        setattr(owner, name, counted(original))
+    try:
+        function()
+    finally:
+        for (owner, name), original in zip(patched, originals):
+            setattr(owner, name, original)
+    return calls[0]
+
+
+def read_snapshot(mesh_snapshot_module, shading_index, root):
+    """
+    Read the attributes of the meshes with a snapshot
+    :param mesh_snapshot_module
+    :param shading_index
+    :param root
+    :return: dict long name -> attributes
+    """
+    snapshot = mesh_snapshot_module.MeshSnapshot([root.longName()], shading_index)
+    return {record.long_name: (record.sss_set_name, record.disp_height, record.casts_shadows, record.subdiv_type,
+                               record.subdiv_iterations, tuple(sorted(set(record.sg_names))))
+            for record in snapshot.get_records()}
+
+
+def bench_size(scene, pm, mesh_count, repeat):
+    """
+    Time both reads on a synthetic character
+    :param scene
+    :param pm
+    :param mesh_count
+    :param repeat
+    :return: dict of the results
+    """
+    mesh_snapshot_module = importlib.import_module(_PACKAGE_NAME + ".MeshSnapshot")
+    index_module = importlib.import_module(_PACKAGE_NAME + ".ShadingNetworkIndex")
+    scene.reset()
+    shading_engine_count = max(10, mesh_count // 20)
+    root = build_character(pm, mesh_count, shading_engine_count, shading_engine_count * 3)
+    shading_index = index_module.ShadingNetworkIndex()
+    per_mesh = read_per_mesh(pm, root)
+    snapshot = read_snapshot(mesh_snapshot_module, shading_index, root)
+    return {
+        "meshes": mesh_count,
+        "mismatch": len(set(per_mesh.items()) ^ set(snapshot.items())),
+        "pymel_calls": count_pymel_calls(pm, lambda: read_per_mesh(pm, root)),
+        "per_mesh": best_time(lambda: read_per_mesh(pm, root), repeat),
+        "snapshot": best_time(lambda: read_snapshot(mesh_snapshot_module, shading_index, root), repeat),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the mesh snapshot on synthetic characters")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000], help="mesh counts")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", default=None, help="write the results to a json file")
+    args = parser.parse_args(argv)
+
+    scene = fake_maya.install()
+    import_package()
+    pm = sys.modules["pymel.core"]
+
+    results = [bench_size(scene, pm, size, args.repeat) for size in args.sizes]
+    print("%8s %12s %14s %14s %10s" % ("meshes", "pymel calls", "per mesh", "snapshot", "mismatch"))
+    for result in results:
+        print("%8s %12s %13.4fs %13.4fs %10s" % (result["meshes"], result["pymel_calls"], result["per_mesh"],
+                                                result["snapshot"], result["mismatch"]))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=4)
+    return 0 if all(result["mismatch"] == 0 for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
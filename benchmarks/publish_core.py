@@ -0,0 +1,166 @@
+"""
+Time the publish logic on synthetic characters outside of Maya, with the in-memory scene of fake_maya :
+data retrieval (cold and with a warm shading index), operators build and version resolution
+
+    python benchmarks/publish_core.py [--sizes 100 1000 10000] [--repeat 3] [--versions 200] [--json out.json]
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import fake_maya
+from synthetic_character import build_character
+
+# ######################################################################################################################
+
+_PACKAGE_NAME = "character_publisher"
+_PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# ######################################################################################################################
+
+
+def import_package():
+    """
+    Import the package from this checkout, whatever the name of its directory
+    :return:
+    """
+    if _PACKAGE_NAME not in sys.modules:
+        spec = importlib.util.spec_from_file_location(_PACKAGE_NAME, os.path.join(_PACKAGE_DIR, "__init__.py"),
+                                                      submodule_search_locations=[_PACKAGE_DIR])
+        package = importlib.util.module_from_spec(spec)
+        sys.modules[_PACKAGE_NAME] = package
+        spec.loader.exec_module(package)
+    return importlib.import_module(_PACKAGE_NAME + ".PublishCore"), importlib.import_module(
+        _PACKAGE_NAME + ".PublishIndex")
+
+
+def best_time(function, repeat):
+    """
+    Best duration of several runs of a function
+    :param function
+    :param repeat
+    :return:
+    """
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start)
+    return min(durations)
+
+
+def bench_size(scene, pm, publish_core_module, mesh_count, repeat):
+    """
+    Time the retrieval and the operators build on a synthetic character
+    :param scene
+    :param pm
+    :param publish_core_module
+    :param mesh_count
+    :param repeat
+    :return: dict of the results
+    """
+    scene.reset()
+    shading_engine_count = max(10, mesh_count // 20)
+    root = build_character(pm, mesh_count, shading_engine_count, shading_engine_count * 3)
+    asset_dir = tempfile.mkdtemp(prefix="publish_bench_")
+    try:
+        results = {"meshes": mesh_count, "shading_engines": shading_engine_count,
+                   "texture_nodes": shading_engine_count * 3, "nodes": len(scene.nodes)}
+
+        def retrieve_cold():
+            core = publish_core_module.PublishCore(asset_dir, "char")
+            core.set_selection([root])
+            core.retrieve_datas()
+
+        core = publish_core_module.PublishCore(asset_dir, "char")
+        core.set_selection([root])
+        core.add_callbacks()
+        core.retrieve_datas()
+        results["retrieve_datas_cold"] = best_time(retrieve_cold, repeat)
+        results["retrieve_datas_warm"] = best_time(core.retrieve_datas, repeat)
+
+        standin = pm.createNode("aiStandIn", n="benchStandInShape")
+        results["build_shader_operator"] = best_time(lambda: core.build_shader_operator(standin, [root]), repeat)
+        results["operators"] = len(pm.listConnections(pm.listConnections(standin + ".operators")[0] + ".inputs"))
+        core.remove_callbacks()
+        return results
+    finally:
+        shutil.rmtree(asset_dir, ignore_errors=True)
+
+
+def bench_versions(publish_core_module, publish_index_module, version_count, repeat):
+    """
+    Time the version resolution of an asset with a publish history
+    :param publish_core_module
+    :param publish_index_module
+    :param version_count
+    :param repeat
+    :return: dict of the results
+    """
+    asset_dir = tempfile.mkdtemp(prefix="publish_bench_")
+    try:
+        abc_dir = os.path.join(asset_dir, "abc")
+        os.makedirs(abc_dir)
+        for version in range(1, version_count + 1):
+            open(os.path.join(abc_dir, "char_mod.v%03d.abc" % version), "w").close()
+        publish_index = publish_index_module.PublishIndex(asset_dir)
+        results = {"versions": version_count,
+                   "index_rebuild": best_time(publish_index.rebuild, repeat)}
+
+        def load_latest():
+            index = publish_index_module.PublishIndex(asset_dir)
+            index.load()
+            index.get_latest(publish_index_module.KIND_MODEL)
+
+        results["index_load_latest"] = best_time(load_latest, repeat)
+        results["reserve_version"] = best_time(lambda: publish_index.reserve_version(
+            publish_index_module.KIND_MODEL, "", lambda v: os.path.join(abc_dir, "char_mod.v%03d.abc" % v)), repeat)
+        results["scene_name_resolution"] = best_time(
+            lambda: publish_core_module.PublishCore.retrieve_dir_and_asset_from_scene_name(
+                "/projects/bench/assets/character/char/maya/scenes/char_lookdev.v012.ma"), repeat)
+        return results
+    finally:
+        shutil.rmtree(asset_dir, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the publish logic on synthetic characters")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000], help="mesh counts")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--versions", type=int, default=200, help="published versions of the history")
+    parser.add_argument("--json", default=None, help="write the results to a json file")
+    args = parser.parse_args(argv)
+
+    scene = fake_maya.install()
+    publish_core_module, publish_index_module = import_package()
+    pm = sys.modules["pymel.core"]
+
+    results = {"sizes": [], "versions": None}
+    print("%8s %10s %12s %12s %12s %10s" % ("meshes", "nodes", "retrieve", "retrieve", "operators", "operator"))
+    print("%8s %10s %12s %12s %12s %10s" % ("", "", "cold (s)", "warm (s)", "build (s)", "nodes"))
+    for size in args.sizes:
+        result = bench_size(scene, pm, publish_core_module, size, args.repeat)
+        results["sizes"].append(result)
+        print("%8s %10s %12.4f %12.4f %12.4f %10s" % (
+            size, result["nodes"], result["retrieve_datas_cold"], result["retrieve_datas_warm"],
+            result["build_shader_operator"], result["operators"]))
+
+    results["versions"] = bench_versions(publish_core_module, publish_index_module, args.versions, args.repeat)
+    print("\n%s versions : " % args.versions + ", ".join(
+        "%s %.4fs" % (key, value) for key, value in results["versions"].items() if key != "versions"))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=4)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""
+Time the render cost precheck on synthetic characters of the fake scene of fake_maya : the mesh snapshot (one API
+pass), the NumPy estimate of the polygons after subdivision and the whole check as run by the publish
+
+    python benchmarks/render_cost.py [--sizes 100 1000 10000] [--repeat 3] [--json out.json]
+"""
+
+import argparse
+import importlib
+import json
+import shutil
+import sys
+import tempfile
+
+import fake_maya
+from publish_core import import_package, best_time, _PACKAGE_NAME
+from synthetic_character import build_character
+
+
+# ######################################################################################################################
+
+
+def bench_size(scene, pm, publish_core_module, mesh_count, repeat):
+    """
+    Time the precheck on a synthetic character
+    :param scene
+    :param pm
+    :param publish_core_module
+    :param mesh_count
+    :param repeat
+    :return: dict of the results
+    """
+    mesh_snapshot_module = importlib.import_module(_PACKAGE_NAME + ".MeshSnapshot")
+    render_cost_module = importlib.import_module(_PACKAGE_NAME + ".RenderCostReport")
+    index_module = importlib.import_module(_PACKAGE_NAME + ".ShadingNetworkIndex")
+    scene.reset()
+    shading_engine_count = max(10, mesh_count // 20)
+    root = build_character(pm, mesh_count, shading_engine_count, shading_engine_count * 3)
+    asset_dir = tempfile.mkdtemp(prefix="render_cost_bench_")
+    try:
+        shading_index = index_module.ShadingNetworkIndex()
+        root_names = [root.longName()]
+        snapshot = mesh_snapshot_module.MeshSnapshot(root_names, shading_index)
+        records = snapshot.get_records()
+        max_mesh_polygons, max_polygons = render_cost_module.RenderCostReport.get_default_thresholds()
+        report = render_cost_module.RenderCostReport.build(records, set(), max_mesh_polygons, max_polygons)
+        results = {"meshes": mesh_count, "faces": report["faces"], "polygons": report["polygons"],
+                   "over_mesh": len(report["over_mesh"])}
+        results["snapshot"] = best_time(lambda: mesh_snapshot_module.MeshSnapshot(root_names, shading_index), repeat)
+        results["estimate"] = best_time(lambda: render_cost_module.RenderCostReport.build(
+            records, set(), max_mesh_polygons, max_polygons), repeat)
+
+        def check():
+            core = publish_core_module.PublishCore(asset_dir, "char")
+            core.set_selection([root])
+            core.check_render_cost()
+
+        results["check_render_cost"] = best_time(check, repeat)
+        return results
+    finally:
+        shutil.rmtree(asset_dir, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the render cost precheck on synthetic characters")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000], help="mesh counts")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", default=None, help="write the results to a json file")
+    args = parser.parse_args(argv)
+
+    scene = fake_maya.install()
+    publish_core_module, _ = import_package()
+    pm = sys.modules["pymel.core"]
+    if not importlib.import_module(_PACKAGE_NAME + ".RenderCostReport").RenderCostReport.is_available():
+        print("NumPy is needed by the render cost precheck")
+        return 1
+
+    results = [bench_size(scene, pm, publish_core_module, size, args.repeat) for size in args.sizes]
+    print("%8s %14s %16s %10s %12s %12s %12s" % ("meshes", "faces", "polygons", "over", "snapshot", "estimate",
+                                                 "check"))
+    for result in results:
+        print("%8s %14s %16s %10s %11.4fs %11.4fs %11.4fs" % (
+            result["meshes"], format(result["faces"], ","), format(result["polygons"], ","), result["over_mesh"],
+            result["snapshot"], result["estimate"], result["check_render_cost"]))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=4)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
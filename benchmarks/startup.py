@@ -0,0 +1,119 @@
+"""
+Time the startup of the tool : import of the dialog module in a fresh mayapy, then time until the dialog is painted
+and until the scene is analysed. Fails if the dialog module imports the publish logic or pymel
+
+Run with mayapy, the package and common being importable (QT_QPA_PLATFORM=offscreen without display) :
+    mayapy benchmarks/startup.py path/to/char.ma [--select char_GRP] [--repeat 3] [--json out.json]
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+import maya.standalone
+
+# ######################################################################################################################
+
+# Modules that must only be imported once the dialog is painted
+_DEFERRED_MODULES = ("pymel.core", "character_publisher.PublishCore", "character_publisher.ShadingNetworkIndex")
+
+_IMPORT_CODE = """
+import json, sys, time
+start = time.perf_counter()
+import character_publisher.CharacterPublisher
+duration = time.perf_counter() - start
+print(json.dumps({"duration": duration, "deferred_modules": [m for m in %r if m in sys.modules]}))
+"""
+
+_ANALYSIS_TIMEOUT = 600
+
+
+# ######################################################################################################################
+
+
+def time_import():
+    """
+    Import the dialog module in a fresh interpreter
+    :return: dict of the duration and of the deferred modules imported anyway
+    """
+    output = subprocess.check_output([sys.executable, "-c", _IMPORT_CODE % (_DEFERRED_MODULES,)])
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+def time_dialog(character_publisher_class):
+    """
+    Open the dialog and time its first paint and the end of the scene analysis
+    :param character_publisher_class
+    :return: dict of the durations since the creation of the dialog
+    """
+    from PySide2.QtCore import QObject, QEvent
+    from PySide2.QtWidgets import QApplication, QWidget
+
+    app = QApplication.instance() or QApplication([])
+    times = {}
+
+    class PaintWatcher(QObject):
+        def eventFilter(self, watched, event):
+            if event.type() == QEvent.Paint and "first_paint" not in times:
+                times["first_paint"] = time.perf_counter() - start
+            return False
+
+    parent = QWidget()
+    watcher = PaintWatcher()
+    start = time.perf_counter()
+    dialog = character_publisher_class(parent)
+    times["construct"] = time.perf_counter() - start
+    dialog.installEventFilter(watcher)
+    dialog.show()
+    times["show"] = time.perf_counter() - start
+    # The analysis is scheduled by the show, the dialog has its PublishCore once it is done
+    while dialog._CharacterPublisher__publish_core is None and time.perf_counter() - start < _ANALYSIS_TIMEOUT:
+        app.processEvents()
+    times["analysed"] = time.perf_counter() - start
+    dialog.close()
+    app.processEvents()
+    parent.deleteLater()
+    return times
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the startup of the Character Publisher")
+    parser.add_argument("scene", help="scene of an asset")
+    parser.add_argument("--select", action="append", default=[], help="node to select (repeatable)")
+    parser.add_argument("--repeat", type=int, default=3, help="dialogs opened after the first one")
+    parser.add_argument("--json", default=None, help="write the results to a json file")
+    args = parser.parse_args(argv)
+
+    results = {"import": time_import()}
+    print("Import of the dialog module : %.3fs" % results["import"]["duration"])
+    for module in results["import"]["deferred_modules"]:
+        print("Imported with the dialog module : %s" % module)
+
+    maya.standalone.initialize(name="python")
+    try:
+        import maya.cmds as cmds
+        cmds.file(args.scene, open=True, force=True)
+        if len(args.select) > 0:
+            cmds.select(args.select, replace=True)
+        start = time.perf_counter()
+        from character_publisher.CharacterPublisher import CharacterPublisher
+        results["import_in_session"] = time.perf_counter() - start
+
+        results["dialogs"] = [time_dialog(CharacterPublisher) for _ in range(1 + max(0, args.repeat))]
+        print("%8s %12s %12s %12s" % ("", "first paint", "analysed", "construct"))
+        for i, times in enumerate(results["dialogs"]):
+            print("%8s %12.3f %12.3f %12.3f" % ("cold" if i == 0 else "warm", times.get("first_paint", -1),
+                                              times["analysed"], times["construct"]))
+    finally:
+        maya.standalone.uninitialize()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=4)
+    return 1 if len(results["import"]["deferred_modules"]) > 0 else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
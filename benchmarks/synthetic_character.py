@@ -0,0 +1,93 @@
+"""
+Generate a synthetic character : meshes under groups assigned to shadingEngines whose shaders read texture nodes.
+Works with the fake scene of fake_maya and in a Maya session with MtoA loaded
+"""
+
+import random
+
+# ######################################################################################################################
+
+_TEXTURE_DIR = "/projects/bench/assets/character/textures"
+
+
+# ######################################################################################################################
+
+
+def build_character(pm, mesh_count, shading_engine_count, texture_count, group_count=10, name="char",
+                    multi_assignment_ratio=0.05, displacement_ratio=0.2, udim_ratio=0.3, seed=0):
+    """
+    Build a synthetic character
+    :param pm: pymel.core or the fake one
+    :param mesh_count
+    :param shading_engine_count
+    :param texture_count: texture nodes spread over the shaders
+    :param group_count: number of top level groups
+    :param name
+    :param multi_assignment_ratio: ratio of meshes with per face assignments (two shadingEngines)
+    :param displacement_ratio: ratio of shadingEngines with a displacement shader
+    :param udim_ratio: ratio of file nodes in UV tiling mode
+    :param seed
+    :return: the root group
+    """
+    rng = random.Random(seed)
+    root = pm.createNode("transform", n="%s_GRP" % name)
+    groups = [pm.createNode("transform", n="part%02d_GRP" % i, parent=root) for i in range(max(1, group_count))]
+
+    shading_engines = []
+    layers = []
+    for i in range(max(1, shading_engine_count)):
+        shader = pm.shadingNode("aiStandardSurface", asShader=True, n="mtl%04d" % i)
+        shading_engine = pm.createNode("shadingEngine", n="mtl%04dSG" % i)
+        pm.connectAttr(shader + ".outColor", shading_engine + ".aiSurfaceShader")
+        layer = pm.shadingNode("layeredTexture", asTexture=True, n="layer%04d" % i)
+        pm.connectAttr(layer + ".outColor", shader + ".baseColor")
+        if rng.random() < displacement_ratio:
+            displacement = pm.shadingNode("displacementShader", asShader=True, n="disp%04d" % i)
+            pm.connectAttr(displacement + ".displacement", shading_engine + ".displacementShader")
+        layers.append(layer)
+        shading_engines.append(shading_engine)
+
+    # Texture chains layered per shader : place2d -> file -> colour correct -> layered texture
+    for i in range(texture_count):
+        layer_index = i // len(layers)
+        place2d = pm.shadingNode("place2dTexture", asUtility=True, n="place2d%05d" % i)
+        texture = pm.shadingNode("file", asTexture=True, n="tex%05d" % i)
+        color_correct = pm.shadingNode("aiColorCorrect", asUtility=True, n="cc%05d" % i)
+        pm.connectAttr(place2d + ".outUV", texture + ".uvCoord")
+        pm.connectAttr(texture + ".outColor", color_correct + ".input")
+        pm.connectAttr(color_correct + ".outColor", layers[i % len(layers)] + ".inputs[%s].color" % layer_index)
+        if rng.random() < udim_ratio:
+            texture.uvTilingMode.set(3)
+            texture.fileTextureName.set("%s/tex%05d.1001.exr" % (_TEXTURE_DIR, i))
+            try:
+                texture.computedFileTextureNamePattern.set("%s/tex%05d.<UDIM>.exr" % (_TEXTURE_DIR, i))
+            except RuntimeError:
+                # Computed by Maya
+                pass
+        else:
+            texture.fileTextureName.set("%s/tex%05d.exr" % (_TEXTURE_DIR, i))
+
+    members = {}
+    for i in range(mesh_count):
+        transform = pm.createNode("transform", n="geo%05d" % i, parent=groups[i % len(groups)])
+        mesh = pm.createNode("mesh", n="geo%05dShape" % i, parent=transform)
+        if hasattr(mesh, "faceCount"):
+            # Face count of the fake meshes
+            mesh.faceCount.set(rng.choice((500, 2000, 8000, 40000)))
+        if rng.random() < 0.3:
+            mesh.aiSubdivType.set(1)
+            mesh.aiSubdivIterations.set(rng.choice((1, 2, 3)))
+        if rng.random() < 0.1:
+            mesh.castsShadows.set(False)
+        shading_engine = shading_engines[rng.randrange(len(shading_engines))]
+        if rng.random() < multi_assignment_ratio and len(shading_engines) > 1:
+            second = shading_engines[(shading_engines.index(shading_engine) + 1) % len(shading_engines)]
+            for j, sg in enumerate((shading_engine, second)):
+                index = members.setdefault(sg.name(), 0)
+                pm.connectAttr(mesh + ".instObjGroups[0].objectGroups[%s]" % j, sg + ".dagSetMembers[%s]" % index)
+                members[sg.name()] += 1
+        else:
+            index = members.setdefault(shading_engine.name(), 0)
+            pm.connectAttr(mesh + ".instObjGroups[0]", shading_engine + ".dagSetMembers[%s]" % index)
+            members[shading_engine.name()] += 1
+    return root
@@ -0,0 +1,191 @@
+"""
+Count and time the filesystem calls of the TX resolution of a synthetic UDIM texture set : per-file isfile calls
+against the directory index of TextureResolver. The resolver must list each directory once on a cold pass, only stat
+it on a warm pass and list again a directory whose mtime changed. The TX up to date check of the tiles must only stat
+the existing TX and their source, once per pass
+
+    python benchmarks/texture_resolver.py [--dirs 10] [--textures 20] [--tiles 10] [--repeat 3] [--json out.json]
+"""
+
+import argparse
+import glob
+import importlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+import fake_maya
+from publish_core import import_package, best_time, _PACKAGE_NAME
+
+# ######################################################################################################################
+
+_COLOR_SPACE = "sRGB"
+_RENDER_COLOR_SPACE = "ACEScg"
+
+
+# ######################################################################################################################
+
+
+def build_texture_set(root, dir_count, texture_count, tile_count):
+    """
+    Write a texture set : UDIM tiles of each texture with the TX of every other tile (colorspace naming) and the
+    legacy TX of the others
+    :param root
+    :param dir_count
+    :param texture_count: textures per directory
+    :param tile_count: UDIM tiles per texture
+    :return: list of the tokenized texture paths
+    """
+    patterns = []
+    for i in range(dir_count):
+        dir_path = os.path.join(root, "dir%03d" % i)
+        os.makedirs(dir_path)
+        for j in range(texture_count):
+            name = "tex%03d" % j
+            for tile in range(1001, 1001 + tile_count):
+                names = ["%s.%s.exr" % (name, tile)]
+                if tile % 2 == 0:
+                    names.append("%s.%s_%s_%s.exr.tx" % (name, tile, _COLOR_SPACE, _RENDER_COLOR_SPACE))
+                else:
+                    names.append("%s.%s.tx" % (name, tile))
+                for file_name in names:
+                    open(os.path.join(dir_path, file_name), "w").close()
+            patterns.append(os.path.join(dir_path, "%s.<UDIM>.exr" % name))
+    return patterns
+
+
+def resolve_per_file(publish_core_class, patterns):
+    """
+    Resolve the TX of every tile with a listing per texture and an isfile per TX candidate
+    :param publish_core_class
+    :param patterns
+    :return: (resolved TX paths, filesystem calls)
+    """
+    calls = 0
+    resolved = []
+    for pattern in patterns:
+        calls += 1
+        for tile_path in sorted(glob.glob(pattern.replace("<UDIM>", "[0-9]" * 4))):
+            tx_path, tx_path_legacy = publish_core_class.texture_path_to_output_tx_path(
+                tile_path, _COLOR_SPACE, _RENDER_COLOR_SPACE)
+            calls += 1
+            if os.path.isfile(tx_path):
+                resolved.append(tx_path)
+                continue
+            calls += 1
+            if os.path.isfile(tx_path_legacy):
+                resolved.append(tx_path_legacy)
+    return resolved, calls
+
+
+def resolve_indexed(publish_core_class, resolver, patterns):
+    """
+    Resolve the TX of every tile against the directory index
+    :param publish_core_class
+    :param resolver
+    :param patterns
+    :return: (resolved TX paths, filesystem calls)
+    """
+    resolver.new_pass()
+    resolved = []
+    for pattern in patterns:
+        for tile_path in resolver.expand_tiles(pattern):
+            tx_path, tx_path_legacy = publish_core_class.texture_path_to_output_tx_path(
+                tile_path, _COLOR_SPACE, _RENDER_COLOR_SPACE)
+            tx = resolver.resolve_tx(tx_path, tx_path_legacy)
+            if tx is not None:
+                resolved.append(tx)
+    return resolved, resolver.get_stat_count()
+
+
+def check_up_to_date(publish_core_class, tx_converter_class, resolver, patterns):
+    """
+    Check if the TX of every tile is up to date as the TX generation does, the mtimes read through the resolver
+    :param publish_core_class
+    :param tx_converter_class
+    :param resolver
+    :param patterns
+    :return: (number of TX up to date, filesystem calls)
+    """
+    resolver.new_pass()
+    up_to_date = 0
+    for pattern in patterns:
+        for tile_path in resolver.expand_tiles(pattern):
+            tx_path, _ = publish_core_class.texture_path_to_output_tx_path(tile_path, _COLOR_SPACE, _RENDER_COLOR_SPACE)
+            # Checked twice : the mtimes are read once
+            for _ in range(2):
+                up_to_date += tx_converter_class.is_up_to_date(tile_path, tx_path, resolver)
+    return up_to_date // 2, resolver.get_stat_count()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the TX resolution on a synthetic UDIM texture set")
+    parser.add_argument("--dirs", type=int, default=10, help="texture directories")
+    parser.add_argument("--textures", type=int, default=20, help="textures per directory")
+    parser.add_argument("--tiles", type=int, default=10, help="UDIM tiles per texture")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", default=None, help="write the results to a json file")
+    args = parser.parse_args(argv)
+
+    fake_maya.install()
+    publish_core_module, _ = import_package()
+    publish_core_class = publish_core_module.PublishCore
+    resolver_class = importlib.import_module(_PACKAGE_NAME + ".TextureResolver").TextureResolver
+    tx_converter_class = importlib.import_module(_PACKAGE_NAME + ".TxConverter").TxConverter
+
+    root = tempfile.mkdtemp(prefix="texture_resolver_bench_")
+    try:
+        patterns = build_texture_set(root, args.dirs, args.textures, args.tiles)
+        tile_count = args.dirs * args.textures * args.tiles
+
+        per_file, per_file_calls = resolve_per_file(publish_core_class, patterns)
+        resolver = resolver_class()
+        cold, cold_calls = resolve_indexed(publish_core_class, resolver, patterns)
+        warm, warm_calls = resolve_indexed(publish_core_class, resolver, patterns)
+        # A TX written in a directory : only this one is listed again
+        changed_dir = os.path.dirname(patterns[0])
+        open(os.path.join(changed_dir, "new.tx"), "w").close()
+        os.utime(changed_dir, (0, os.stat(changed_dir).st_mtime + 10))
+        changed, changed_calls = resolve_indexed(publish_core_class, resolver, patterns)
+        up_to_date, up_to_date_calls = check_up_to_date(publish_core_class, tx_converter_class, resolver, patterns)
+
+        assert len(per_file) == tile_count, "%s TX resolved for %s tiles" % (len(per_file), tile_count)
+        assert sorted(cold) == sorted(per_file) and warm == cold and changed == cold, "Resolutions differ"
+        # A stat and a listing per directory, then a stat per directory
+        assert cold_calls == 2 * args.dirs, "Cold pass : %s calls for %s directories" % (cold_calls, args.dirs)
+        assert warm_calls == args.dirs, "Warm pass : %s calls for %s directories" % (warm_calls, args.dirs)
+        assert changed_calls == args.dirs + 1, "Changed pass : %s calls for %s directories" % (changed_calls,
+                                                                                                args.dirs)
+        # Every other tile has a colorspace TX, newer than its source
+        assert up_to_date == tile_count // 2, "%s TX up to date for %s tiles" % (up_to_date, tile_count)
+        # A stat per directory, then a stat per existing TX and per source
+        assert up_to_date_calls == args.dirs + 2 * up_to_date, "Up to date check : %s calls for %s TX" % (
+            up_to_date_calls, up_to_date)
+
+        results = {"dirs": args.dirs, "textures": args.dirs * args.textures, "tiles": tile_count,
+                   "per_file_calls": per_file_calls, "cold_calls": cold_calls, "warm_calls": warm_calls,
+                   "changed_calls": changed_calls, "up_to_date_calls": up_to_date_calls,
+                   "per_file": best_time(lambda: resolve_per_file(publish_core_class, patterns), args.repeat),
+                   "cold": best_time(lambda: resolve_indexed(publish_core_class, resolver_class(), patterns),
+                                     args.repeat),
+                   "warm": best_time(lambda: resolve_indexed(publish_core_class, resolver, patterns), args.repeat)}
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    print("%s tiles of %s textures in %s directories" % (results["tiles"], results["textures"], results["dirs"]))
+    print("%10s %18s %10s" % ("", "filesystem calls", "time"))
+    for label, calls, duration in (("per file", results["per_file_calls"], results["per_file"]),
+                                   ("cold", results["cold_calls"], results["cold"]),
+                                   ("warm", results["warm_calls"], results["warm"])):
+        print("%10s %18s %9.4fs" % (label, calls, duration))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=4)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,9 @@
-import importlib
-from common import utils
+import os
 
-utils.unload_packages(silent=True, package="character_publisher")
-importlib.import_module("character_publisher")
+# Set CHARACTER_PUBLISHER_RELOAD to reload the package after editing it, a launch reuses the loaded modules otherwise
+if os.environ.get("CHARACTER_PUBLISHER_RELOAD"):
+    from common import utils
+    utils.unload_packages(silent=True, package="character_publisher")
 from character_publisher.CharacterPublisher import CharacterPublisher
 try:
     char_publisher.close()